@@ -1,5 +1,7 @@
 """This is executed by `python -m cms_perf` and similar"""
 
+import sys
+
 from .report import main
 
-main()
+sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Enforcement of a CPU budget for ``cms_perf`` itself
+
+Every sensor call records how much CPU time it takes. If ``cms_perf`` uses more
+CPU than its budget, the most expensive sensor call is evaluated less often,
+reusing its previous value in between. Once usage is well within the budget,
+throttled calls are evaluated more often again.
+"""
+
+from typing import Dict, List, Tuple
+import logging
+import resource
+import time
+
+from .export import call_labeler
+from .sensors import transform
+from .sensors.self_usage import SelfMonitor
+from .sensors.snapshot import SNAPSHOT
+from .setup.cli_parser import CallInfo, CLICall
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CallCost:
+    """CPU time and sampling period of a sensor call"""
+
+    def __init__(self):
+        #: average CPU seconds of an evaluation
+        self.cpu_time = 0.0
+        #: number of reports between evaluations
+        self.period = 1
+        #: tick at which the call is evaluated next
+        self.due = 0
+        #: tick at which the call was last requested
+        self.requested = 0
+        self.value = 0.0
+
+    @property
+    def cost(self) -> float:
+        """Average CPU seconds per report"""
+        return self.cpu_time / self.period
+
+
+def _rusage_thread_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_THREAD)
+    return usage.ru_utime + usage.ru_stime
+
+
+# time.thread_time is available only since Python 3.7
+_thread_time = getattr(time, "thread_time", _rusage_thread_time)
+
+
+#: cost of each sensor call, by its label such as ``xrd.nfds(data)``
+CALL_COSTS: Dict[str, CallCost] = {}
+
+
+def _call_costs() -> List[Tuple[str, CallCost]]:
+    # calls of concurrently evaluated fields may add labels at any time
+    return list(CALL_COSTS.items())
+
+
+def throttle_calls(call_info: CallInfo, call: CLICall) -> CLICall:
+    """
+    Wrap the ``call`` of a sensor to record its cost and allow throttling it
+
+    Transformations only combine the values of sensors and are not throttled.
+    """
+    if call_info.call.__module__ == transform.__name__:
+        return call
+    label = call_labeler(call_info)
+
+    def throttled_call(*args: object) -> float:
+        tick = SNAPSHOT.tick
+        cost = CALL_COSTS.setdefault(label(args), CallCost())
+        cost.requested = tick
+        if tick < cost.due:
+            return cost.value
+        started = _thread_time()
+        cost.value = call(*args)
+        cpu_time = _thread_time() - started
+        if cost.due == 0:
+            cost.cpu_time = cpu_time
+        else:
+            cost.cpu_time += (cpu_time - cost.cpu_time) / 4
+        cost.due = tick + cost.period
+        return cost.value
+
+    return throttled_call
+
+
+class CpuBudget:
+    """
+    Budget of ``limit`` percent of one CPU core for the current process
+
+    After each report, :py:meth:`update` compares the CPU usage to the budget.
+    If the usage exceeds the budget, the sampling period of the most expensive
+    call is doubled, up to ``max_period`` reports. If the usage is below half
+    the budget, the period of the cheapest throttled call is halved.
+    Each change takes effect for ``patience`` reports before the next change.
+    """
+
+    def __init__(self, limit: float, max_period: int = 16, patience: int = 2):
+        self.limit = limit
+        self.max_period = max_period
+        self.patience = patience
+        #: percentage of one core used during the latest report
+        self.usage = 0.0
+        self._monitor = SelfMonitor()
+        self._settled = 0
+
+    def update(self) -> None:
+        """Measure the usage since the previous update and adjust throttling"""
+        self.usage = self._monitor.measure().pcpu
+        self._settled += 1
+        if self._settled < self.patience:
+            return
+        # calls not requested recently are not in use anymore, e.g. after a reload
+        for label, cost in _call_costs():
+            if cost.requested < SNAPSHOT.tick - 1:
+                del CALL_COSTS[label]
+        if self.usage > self.limit:
+            self._stretch()
+        elif self.usage < self.limit / 2:
+            self._relax()
+
+    def _stretch(self):
+        candidates = [
+            (cost.cost, label)
+            for label, cost in _call_costs()
+            if cost.period < self.max_period
+        ]
+        if not candidates:
+            return
+        _, label = max(candidates)
+        cost = CALL_COSTS[label]
+        cost.period *= 2
+        self._settled = 0
+        LOGGER.warning(
+            "CPU usage %.2f%% exceeds budget of %.2f%%: evaluating %s every %d ticks",
+            self.usage,
+            self.limit,
+            label,
+            cost.period,
+        )
+
+    def _relax(self):
+        candidates = [
+            (cost.cost, label) for label, cost in _call_costs() if cost.period > 1
+        ]
+        if not candidates:
+            return
+        _, label = min(candidates)
+        cost = CALL_COSTS[label]
+        cost.period //= 2
+        self._settled = 0
+        LOGGER.warning(
+            "CPU usage %.2f%% is within budget of %.2f%%: evaluating %s every %d ticks",
+            self.usage,
+            self.limit,
+            label,
+            cost.period,
+        )
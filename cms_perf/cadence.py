@@ -0,0 +1,88 @@
+"""
+Adaptive reporting interval, driven by the volatility of the reported values
+
+While reports change rapidly, the interval is shortened to react quickly.
+While reports are stable, the interval is extended to save resources.
+Sensors depend on the interval, e.g. to select a load average or sampling window,
+so they are compiled again for every new interval.
+"""
+
+from typing import Callable, List, Optional, Sequence
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AdaptiveInterval:
+    """
+    Interval between ``minimum`` and ``maximum`` adapted to the reported values
+
+    If any value changes by ``volatile`` or more between two reports,
+    the interval is halved. If all values change by at most ``stable``
+    for ``patience`` reports in a row, the interval is doubled.
+    On every change of interval, the sensors are recreated via ``compile``.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        minimum: float,
+        maximum: float,
+        compile: Callable[[float], List[Callable[[], float]]],
+        volatile: int = 10,
+        stable: int = 2,
+        patience: int = 3,
+    ):
+        assert minimum <= maximum, "minimum interval must not exceed maximum"
+        self.minimum = minimum
+        self.maximum = maximum
+        #: the interval currently in effect
+        self.interval = min(max(interval, minimum), maximum)
+        self.compile = compile
+        self.volatile = volatile
+        self.stable = stable
+        self.patience = patience
+        self._previous: Optional[Sequence[int]] = None
+        self._stable_reports = 0
+
+    def __call__(self) -> float:
+        return self.interval
+
+    def adapt(
+        self, values: Sequence[int], sensors: Sequence[Callable[[], float]]
+    ) -> Sequence[Callable[[], float]]:
+        """Adapt to the latest report ``values`` and provide the sensors to use"""
+        previous, self._previous = self._previous, values
+        if previous is None:
+            return sensors
+        change = max(map(abs, map(int.__sub__, values, previous)), default=0)
+        interval = self.interval
+        if change >= self.volatile:
+            self._stable_reports = 0
+            interval = max(interval / 2, self.minimum)
+        elif change <= self.stable:
+            self._stable_reports += 1
+            if self._stable_reports >= self.patience:
+                self._stable_reports = 0
+                interval = min(interval * 2, self.maximum)
+        else:
+            self._stable_reports = 0
+        if interval == self.interval:
+            return sensors
+        LOGGER.warning("changing interval from %gs to %gs", self.interval, interval)
+        self.interval = interval
+        return self.compile(interval)
+
+    def resume(
+        self,
+        interval: float,
+        values: Sequence[int],
+        sensors: Sequence[Callable[[], float]],
+    ) -> Sequence[Callable[[], float]]:
+        """Continue from a previous ``interval`` and report ``values``"""
+        self._previous = values
+        interval = min(max(interval, self.minimum), self.maximum)
+        if interval == self.interval:
+            return sensors
+        self.interval = interval
+        return self.compile(interval)
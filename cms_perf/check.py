@@ -0,0 +1,174 @@
+"""
+Static check of sensor expressions and their estimated cost per tick
+
+The cost of each tick is estimated from the metadata of every CLI call,
+namely its cost class and the time it blocks for sampling.
+Constant subexpressions are evaluated only once and do not count.
+Calls sampled in the background, via ``every`` or the ``--every`` option,
+count only by the share of ticks in which they are evaluated.
+"""
+
+from typing import Dict, Iterator, List, NamedTuple, TextIO
+import argparse
+import ast
+import sys
+
+from .explain import render
+from .setup import cli_parser
+from .setup.cli import SENSOR_FIELDS, compile_options
+
+
+class CallEstimate(NamedTuple):
+    """Estimated cost of a CLI call in each tick"""
+
+    label: str
+    cost: cli_parser.Cost
+    #: CPU seconds spent on the call
+    cpu_time: float
+    #: wall seconds the call delays the report
+    wall_time: float
+    #: whether the call is evaluated in the background
+    background: bool
+
+    def describe(self) -> str:
+        where = "in the background" if self.background else "per tick"
+        blocking = self.wall_time - self.cpu_time
+        blocks = f", blocks {_duration(blocking)}" if blocking > 1e-9 else ""
+        return (
+            f"{self.label}: {self.cost.name}, {_duration(self.cpu_time)} CPU"
+            f" {where}{blocks}"
+        )
+
+
+def _duration(seconds: float) -> str:
+    return f"{seconds:.2f} s" if seconds >= 1 else f"{seconds * 1000:.2f} ms"
+
+
+def estimate_calls(
+    source: str, interval: float, periods: Dict[str, float]
+) -> List[CallEstimate]:
+    """
+    Estimate the cost of all calls of the CLI ``source`` in each tick
+
+    ``periods`` are the sampling periods of calls evaluated in the background,
+    by their CLI name.
+    """
+    node = ast.parse(cli_parser.parse(source), mode="eval").body
+    return list(_estimate(node, interval, periods))
+
+
+def _estimate(
+    node: ast.AST,
+    interval: float,
+    periods: Dict[str, float],
+    share: float = 1.0,
+    background: bool = False,
+) -> Iterator[CallEstimate]:
+    # constants are evaluated once, when the expression is compiled
+    if cli_parser.is_constant(node) and not _is_lazy(node):
+        return
+    elif isinstance(node, ast.BinOp):
+        yield from _estimate(node.left, interval, periods, share, background)
+        yield from _estimate(node.right, interval, periods, share, background)
+    elif _is_lazy(node):
+        assert isinstance(node, ast.Call)
+        lazy_source = cli_parser.literal_value(node.args[0])
+        assert isinstance(lazy_source, str)
+        lazy = ast.parse(lazy_source, mode="eval").body
+        yield from _estimate(lazy, interval, periods, share, background=True)
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        call_info = cli_parser.KNOWN_CALLABLES[node.func.id]
+        label, cost = render(node), call_info.cost
+        period = periods.get(call_info.cli_name)
+        # the call and its arguments are evaluated in the background
+        if period is not None:
+            cpu_time = cost.cpu_time * share * min(interval / period, 1.0)
+            yield CallEstimate(label, cost, cpu_time, 0.0, True)
+            return
+        wall_time = 0.0 if background else cost.cpu_time + call_info.blocks(interval)
+        yield CallEstimate(
+            label, cost, cost.cpu_time * share, wall_time * share, background
+        )
+        # lazy arguments are evaluated every period, not every tick
+        period = _lazy_period(node)
+        if period is not None:
+            share *= min(interval / period, 1.0)
+        for arg in node.args:
+            yield from _estimate(arg, interval, periods, share, background)
+
+
+def _is_lazy(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "LAZY"
+    )
+
+
+def _lazy_period(node: ast.Call) -> "float | None":
+    """The period of a call evaluating a lazy argument, as for ``every``"""
+    if not any(map(_is_lazy, node.args)):
+        return None
+    for arg in node.args:
+        if (
+            isinstance(arg, ast.Call)
+            and isinstance(arg.func, ast.Name)
+            and arg.func.id == "DURATION"
+        ):
+            literal = cli_parser.literal_value(arg.args[0])
+            assert isinstance(literal, str)
+            return cli_parser.Duration(literal).seconds
+    return None
+
+
+def run_check(options: argparse.Namespace, output: TextIO = sys.stdout) -> bool:
+    """
+    Check the expressions of ``options`` and show their estimated cost per tick
+
+    Provides whether the expressions are likely to keep within the interval
+    and, if one is configured, the CPU budget.
+    Since the expressions are evaluated concurrently, each tick takes as long
+    as the slowest expression but uses the CPU time of all of them.
+    """
+    # compiling evaluates constants, which may fail
+    compile_options(options)
+    interval = options.interval
+    periods = dict(options.every)
+    total_cpu = tick_wall = 0.0
+    for field in SENSOR_FIELDS:
+        source = getattr(options, field).cli_source
+        estimates = estimate_calls(source, interval, periods)
+        cpu_time = sum(estimate.cpu_time for estimate in estimates)
+        wall_time = sum(estimate.wall_time for estimate in estimates)
+        total_cpu += cpu_time
+        tick_wall = max(tick_wall, wall_time)
+        print(
+            f"{field} = {source}: {_duration(cpu_time)} CPU,"
+            f" {_duration(wall_time)} wall",
+            file=output,
+        )
+        for estimate in estimates:
+            if estimate.cost is not cli_parser.Cost.free:
+                print(f"  {estimate.describe()}", file=output)
+    usage = 100.0 * total_cpu / interval
+    print(
+        f"per tick: {_duration(total_cpu)} CPU, {_duration(tick_wall)} wall"
+        f" of {_duration(interval)} interval, {usage:.2f}% of one core",
+        file=output,
+    )
+    success = True
+    if tick_wall >= interval:
+        print(
+            f"warning: sensors take {_duration(tick_wall)}"
+            f" per tick, exceeding the interval of {_duration(interval)}",
+            file=output,
+        )
+        success = False
+    if options.budget is not None and usage > options.budget:
+        print(
+            f"warning: sensors use {usage:.2f}% of one core,"
+            f" exceeding the budget of {options.budget:.2f}%",
+            file=output,
+        )
+        success = False
+    return success
@@ -0,0 +1,133 @@
+"""
+Evaluation of sensors within a deadline
+
+Each sensor is evaluated in its own worker thread, so a hanging sensor
+can neither delay the report nor other sensors. If a sensor misses the
+deadline, its last known value is used instead. If a sensor stays stale
+for too long, a conservative value is used to signal the server is busy.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import logging
+import queue
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+class SensorWorker:
+    """
+    Worker to evaluate a single ``sensor`` in a background thread
+
+    The worker is idle while no evaluation is requested. If a previous
+    evaluation has not finished yet, no new evaluation is started;
+    instead, the pending result is awaited again. The result of an evaluation
+    that finished too late is used as the last known value.
+    """
+
+    def __init__(self, sensor: Callable[[], float], stale_value: float):
+        self.sensor = sensor
+        #: last value provided by the sensor, or the stale value if there is none
+        self.value = stale_value
+        #: number of consecutive results that were not provided in time
+        self.stale = 0
+        self._future: "Optional[Future[float]]" = None
+        self._requests: "queue.Queue[Optional[Future[float]]]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._evaluate_forever, name=f"sensor {sensor!r}", daemon=True
+        )
+        self._thread.start()
+
+    def _evaluate_forever(self):
+        while True:
+            future = self._requests.get()
+            if future is None:
+                return
+            try:
+                future.set_result(self.sensor())
+            except Exception as err:
+                future.set_exception(err)
+
+    def start(self):
+        """Start evaluating the sensor unless it is still busy"""
+        previous = self._future
+        if previous is None or previous.done():
+            # a late result is still more recent than the last known value
+            if previous is not None and previous.exception() is None:
+                self.value = previous.result()
+            self._future = Future()
+            self._requests.put(self._future)
+
+    def result(self, deadline: float) -> Optional[float]:
+        """Get the result of the evaluation until `deadline` or `None` if it is late"""
+        assert self._future is not None, "sensor evaluation must be started first"
+        try:
+            value = self._future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self.stale += 1
+            return None
+        self.value, self.stale = value, 0
+        return value
+
+    def stop(self):
+        """Stop the worker once any ongoing evaluation is finished"""
+        self._requests.put(None)
+
+
+class SensorDeadline:
+    """
+    Evaluate sensors concurrently, each within a common ``timeout``
+
+    A sensor that misses the deadline provides its last known value.
+    If it misses the deadline more than ``max_stale`` times in a row,
+    it provides the conservative ``stale_value`` instead.
+    """
+
+    def __init__(self, timeout: float, max_stale: int = 3, stale_value: float = 100.0):
+        self.timeout = timeout
+        self.max_stale = max_stale
+        self.stale_value = stale_value
+        self._workers: Dict[Callable[[], float], SensorWorker] = {}
+
+    def __call__(
+        self, sensors: Sequence[Callable[[], float]], names: Sequence[str] = ()
+    ) -> List[float]:
+        """Evaluate all ``sensors``, optionally identified by ``names`` for logging"""
+        deadline = time.monotonic() + self.timeout
+        workers = self._prepare_workers(sensors)
+        for worker in workers:
+            worker.start()
+        values: List[float] = []
+        for index, worker in enumerate(workers):
+            value = worker.result(deadline)
+            if value is None:
+                name = names[index] if index < len(names) else f"#{index}"
+                value = (
+                    worker.value if worker.stale <= self.max_stale else self.stale_value
+                )
+                LOGGER.warning(
+                    "sensor %s missed its deadline %d times, reporting %s",
+                    name,
+                    worker.stale,
+                    value,
+                )
+            values.append(value)
+        return values
+
+    def _prepare_workers(
+        self, sensors: Sequence[Callable[[], float]]
+    ) -> List[SensorWorker]:
+        # discard workers of sensors that were replaced, e.g. after a reload
+        for sensor in self._workers.keys() - set(sensors):
+            self._workers.pop(sensor).stop()
+        workers: List[SensorWorker] = []
+        for sensor in sensors:
+            try:
+                workers.append(self._workers[sensor])
+            except KeyError:
+                worker = SensorWorker(sensor, self.stale_value)
+                self._workers[sensor] = worker
+                workers.append(worker)
+        return workers
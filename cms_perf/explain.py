@@ -0,0 +1,265 @@
+"""
+Dry-run explanation of sensor expressions
+
+Every subexpression, be it a call or a math operation, is instrumented to
+record its value, the wall time spent on it and how often it was evaluated.
+This shows both which part of an expression drives its result and which
+sensors take up the time of each tick.
+Expressions are instrumented as they are evaluated when reporting,
+so constant subexpressions are not probed and skipped arguments are not evaluated.
+"""
+
+from typing import Callable, Iterator, List, Optional, Sequence, TextIO
+import argparse
+import ast
+import copy
+import sys
+import time
+
+from .sensors.self_usage import SelfMonitor
+from .sensors.snapshot import SNAPSHOT
+from .setup import cli_parser
+from .setup.cli import SENSOR_FIELDS, call_decorator
+
+
+class Probe:
+    """Measurements of a subexpression displayed as ``label``"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.children: List[Probe] = []
+        #: the latest value of the subexpression, if it was evaluated
+        self.value: Optional[float] = None
+        #: the total wall time spent on the subexpression, in seconds
+        self.time = 0.0
+        #: the number of times the subexpression was evaluated
+        self.calls = 0
+
+    def __call__(self, evaluate: Callable[[], float]) -> float:
+        started = time.perf_counter()
+        try:
+            self.value = evaluate()
+        finally:
+            self.time += time.perf_counter() - started
+            self.calls += 1
+        return self.value
+
+    def reset(self):
+        """Reset the measurements of this and all child probes"""
+        self.value, self.time, self.calls = None, 0.0, 0
+        for child in self.children:
+            child.reset()
+
+    def lines(self, depth: int = 0) -> Iterator[str]:
+        """Display the measurements as a tree of lines"""
+        value = "not evaluated" if self.value is None else f"{self.value:.2f}"
+        calls = "call" if self.calls == 1 else "calls"
+        yield (
+            f"{'  ' * depth}{self.label} = {value}"
+            f" ({self.time * 1000:.3f} ms, {self.calls} {calls})"
+        )
+        for child in self.children:
+            yield from child.lines(depth + 1)
+
+
+# precedence of operators, to display only the required parentheses
+_PRECEDENCE = {ast.Add: 1, ast.Sub: 1, ast.Mult: 2, ast.Div: 2}
+_SYMBOLS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+
+
+def _is_sensor_call(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in cli_parser.KNOWN_CALLABLES
+    )
+
+
+def _is_short_circuit(node: ast.AST) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in cli_parser.SHORT_CIRCUITS
+    )
+
+
+def render(node: ast.AST) -> str:
+    """Render a node of a transpiled expression in the CLI language"""
+    if isinstance(node, ast.BinOp):
+        precedence = _PRECEDENCE[type(node.op)]
+        left, right = render(node.left), render(node.right)
+        if isinstance(node.left, ast.BinOp):
+            if _PRECEDENCE[type(node.left.op)] < precedence:
+                left = f"({left})"
+        if isinstance(node.right, ast.BinOp):
+            if _PRECEDENCE[type(node.right.op)] <= precedence:
+                right = f"({right})"
+        return f"{left} {_SYMBOLS[type(node.op)]} {right}"
+    elif _is_sensor_call(node):
+        assert isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+        name = cli_parser.KNOWN_CALLABLES[node.func.id].cli_name
+        arguments = [
+            render(arg)
+            for arg in node.args
+            if not (isinstance(arg, ast.Name) and arg.id == "interval")
+        ]
+        return f"{name}({', '.join(arguments)})" if arguments else name
+    # short-circuited calls, as in ``_short_max(max, lambda: a, lambda: b)``
+    elif _is_short_circuit(node):
+        assert isinstance(node, ast.Call)
+        func, *thunks = node.args
+        return render(ast.Call(func, [thunk.body for thunk in thunks], []))  # type: ignore
+    # literals of domains, as in ``INSTANCE('data')`` or ``LAZY('pcpu', ...)``
+    elif isinstance(node, ast.Call):
+        literal = cli_parser.literal_value(node.args[0])
+        if isinstance(node.func, ast.Name) and node.func.id == "LAZY":
+            assert isinstance(literal, str)
+            return render(ast.parse(literal, mode="eval").body)
+        return str(literal)
+    # cases of enum domains, as in ``CPUSTAT['max']``
+    elif isinstance(node, ast.Subscript):
+        case = node.slice
+        # Python 3.8 wraps the subscript in an Index node
+        if not isinstance(case, cli_parser.LITERAL_NODES):
+            case = case.value  # type: ignore
+        return str(cli_parser.literal_value(case))
+    elif isinstance(node, cli_parser.LITERAL_NODES):
+        return str(cli_parser.literal_value(node))
+    elif isinstance(node, ast.UnaryOp):  # negative number literals
+        return f"-{render(node.operand)}"
+    raise ValueError(f"cannot render {ast.dump(node)}")
+
+
+class _Unhoister(ast.NodeTransformer):
+    """Replace the names of hoisted ``constants`` by their expression"""
+
+    def __init__(self, constants: Sequence[ast.expr]):
+        self.constants = constants
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:
+        if node.id.startswith("_const"):
+            return self.constants[int(node.id[6:])]
+        return self.generic_visit(node)  # type: ignore
+
+
+class _Instrumenter:
+    """Wrap every subexpression in a call to its probe, as ``PROBE(3, lambda: ...)``"""
+
+    def __init__(self, constants: Sequence[ast.expr] = ()):
+        self.probes: List[Probe] = []
+        self._unhoister = _Unhoister(constants)
+
+    def instrument(self, node: ast.AST, parent: Optional[Probe] = None) -> ast.AST:
+        if isinstance(node, ast.BinOp):
+            probe = self._add_probe(node, parent)
+            node.left = self.instrument(node.left, probe)  # type: ignore
+            node.right = self.instrument(node.right, probe)  # type: ignore
+        elif _is_sensor_call(node):
+            assert isinstance(node, ast.Call)
+            probe = self._add_probe(node, parent)
+            node.args = [self.instrument(arg, probe) for arg in node.args]  # type: ignore
+        # arguments of short-circuited calls are evaluated, if at all, in their lambda
+        elif _is_short_circuit(node):
+            assert isinstance(node, ast.Call)
+            probe = self._add_probe(node, parent)
+            for thunk in node.args[1:]:
+                assert isinstance(thunk, ast.Lambda)
+                thunk.body = self.instrument(thunk.body, probe)  # type: ignore
+        # plain literals, such as ``0``, are probed only on their own
+        elif parent is None:
+            probe = self._add_probe(node, parent)
+        # literals, constants and lazy expressions of domains are not evaluated in place
+        else:
+            return node
+        wrapper = ast.parse("PROBE(0, lambda: 0)", mode="eval").body
+        assert isinstance(wrapper, ast.Call) and isinstance(wrapper.args[1], ast.Lambda)
+        wrapper.args[0] = ast.Constant(self.probes.index(probe))
+        wrapper.args[1].body = node  # type: ignore
+        return ast.copy_location(wrapper, node)
+
+    def _add_probe(self, node: ast.AST, parent: Optional[Probe]) -> Probe:
+        probe = Probe(render(self._unhoister.visit(copy.deepcopy(node))))
+        if parent is not None:
+            parent.children.append(probe)
+        self.probes.append(probe)
+        return probe
+
+
+class Explanation:
+    """A sensor expression of ``field`` and the probe of its outermost expression"""
+
+    def __init__(self, field: str, sensor: Callable[[], float], root: Probe):
+        self.field = field
+        self.sensor = sensor
+        self.root = root
+
+    def __call__(self) -> float:
+        self.root.reset()
+        return self.sensor()
+
+    def lines(self) -> Iterator[str]:
+        yield f"{self.field}:"
+        yield from self.root.lines(depth=1)
+
+
+def instrument_sensor(
+    source: str,
+) -> "tuple[Callable[..., Callable[[], float]], Probe]":
+    """Parse the CLI ``source`` to an instrumented factory and its root probe"""
+    body, constants = cli_parser.optimize(cli_parser.parse(source))
+    instrumenter = _Instrumenter(constants)
+    instrumented = instrumenter.instrument(body)
+    probes = instrumenter.probes
+
+    def dispatch(index: int, evaluate: Callable[[], float]) -> float:
+        return probes[index](evaluate)
+
+    factory = cli_parser.build_factory(
+        instrumented,  # type: ignore
+        constants,
+        filename=f"<cms_perf.explain code {source!r}>",
+        PROBE=dispatch,
+    )
+    return factory, probes[0]
+
+
+def explain_options(
+    options: argparse.Namespace, fields: Sequence[str] = SENSOR_FIELDS
+) -> List[Explanation]:
+    """Compile the sensor expressions of parsed ``options`` with instrumentation"""
+    explanations: List[Explanation] = []
+    for field in fields:
+        factory, root = instrument_sensor(getattr(options, field).cli_source)
+        (sensor,) = cli_parser.compile_sensors(
+            options.interval, factory, decorate=call_decorator(options)
+        )
+        explanations.append(Explanation(field, sensor, root))
+    return explanations
+
+
+def run_explain(
+    options: argparse.Namespace, ticks: int, output: TextIO = sys.stdout
+) -> None:
+    """Evaluate the expressions of ``options`` for ``ticks`` and explain them"""
+    explanations = explain_options(options)
+    monitor = SelfMonitor()
+    for tick in range(1, ticks + 1):
+        started = time.monotonic()
+        SNAPSHOT.advance()
+        print(f"tick {tick}/{ticks}", file=output)
+        for explanation in explanations:
+            try:
+                explanation()
+            except Exception as err:
+                print(f"{explanation.field}: failed with {err!r}", file=output)
+            for line in explanation.lines():
+                print(line, file=output)
+        usage = monitor.measure()
+        resident = usage.rss / 2**20
+        print(
+            f"self: {usage.pcpu:.2f}% of one core, {resident:.1f} MiB resident",
+            file=output,
+        )
+        output.flush()
+        if tick < ticks:
+            time.sleep(max(0.0, options.interval - (time.monotonic() - started)))
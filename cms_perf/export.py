@@ -0,0 +1,231 @@
+"""
+Export of the latest values to a memory-mapped file for local agents
+
+Local agents may read the values that ``cms_perf`` collected anyway,
+instead of collecting the same information again. The export is a file of
+fixed layout, usually in ``/run``, that readers ``mmap`` once and then read
+without any further system calls. All numbers are little-endian.
+
+The file starts with a header of 48 bytes:
+
+======  ====  ===========================================================
+offset  type  content
+======  ====  ===========================================================
+0       8s    magic bytes ``CMSPERF\\0``
+8       u32   layout version, currently ``1``
+12      u32   capacity, the number of entry slots in the file
+16      u32   count, the number of valid entries
+20      u32   reserved
+24      u64   sequence counter for consistent reads
+32      f64   UNIX time of the values
+40      f64   reporting interval in seconds
+======  ====  ===========================================================
+
+It is followed by ``capacity`` entries of 56 bytes each, of which the first
+``count`` are valid. Each entry consists of the name as 48 bytes of UTF-8,
+padded with NUL bytes, followed by the value as f64.
+Entries provide each report field as reported, such as ``report.pcpu``,
+and as a raw value before clamping, such as ``raw.pcpu``,
+as well as the value of every sensor call in the expressions,
+such as ``pcpu`` or ``xrd.nfds(data)``, and the resources used by ``cms_perf``
+itself since the previous report as ``self.pcpu`` and ``self.rss``.
+
+The sequence counter is odd while the values are updated.
+To read a consistent snapshot, a reader reads the counter, copies the values
+and reads the counter again: if both counts are equal and even,
+the copy is consistent; otherwise, the reader tries again.
+Each start of ``cms_perf`` replaces the file, so long-running readers should
+check whether the file they mapped is still the one at its path.
+"""
+
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+import enum
+import inspect
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .sensors import transform
+from .sinks import Report, Sink
+from .sensors.self_usage import SelfMonitor
+from .sensors.snapshot import SNAPSHOT
+from .setup.cli_parser import CallInfo, CLICall, Lazy
+
+MAGIC = b"CMSPERF\0"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<8sIIII Q d d")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = 24
+ENTRY = struct.Struct("<48s d")
+
+
+#: latest value and tick of each recorded sensor call
+RECORDED_CALLS: Dict[str, Tuple[int, float]] = {}
+#: guard of the recorded calls, which are recorded by concurrent field workers
+RECORDED_LOCK = threading.Lock()
+
+
+def _render_argument(argument: object) -> str:
+    if isinstance(argument, enum.Enum):
+        return argument.name
+    elif isinstance(argument, Lazy):
+        return argument.source
+    elif isinstance(argument, float):
+        return f"{argument:g}"
+    return str(argument)
+
+
+def call_labeler(call_info: CallInfo) -> Callable[[Sequence[object]], str]:
+    """
+    Create a function to label calls of ``call_info`` by their arguments
+
+    Labels use the CLI syntax, such as ``pcpu(pctl, 90)`` or ``pmem``.
+    """
+    cli_name = call_info.cli_name
+    # the interval is implicit and not shown as an argument
+    shown = 1 if "interval" in inspect.signature(call_info.call).parameters else 0
+
+    def label(args: Sequence[object]) -> str:
+        arguments = args[shown:]
+        if not arguments:
+            return cli_name
+        return f"{cli_name}({', '.join(map(_render_argument, arguments))})"
+
+    return label
+
+
+def record_calls(call_info: CallInfo, call: CLICall) -> CLICall:
+    """
+    Wrap the ``call`` of a sensor to record its latest value for exporting
+
+    Transformations only combine the values of sensors and are not recorded.
+    """
+    if call_info.call.__module__ == transform.__name__:
+        return call
+    label = call_labeler(call_info)
+
+    def recorded_call(*args: object) -> float:
+        value = call(*args)
+        with RECORDED_LOCK:
+            RECORDED_CALLS[label(args)] = SNAPSHOT.tick, value
+        return value
+
+    return recorded_call
+
+
+class ValueExport(Sink):
+    """
+    Writer of the latest values to the memory-mapped file at ``path``
+
+    The file provides room for ``capacity`` entries; surplus entries are dropped.
+    """
+
+    def __init__(self, path: str, capacity: int = 64):
+        self.path = os.path.abspath(path)
+        self.capacity = capacity
+        self._sequence = 0
+        self._monitor = SelfMonitor()
+        size = HEADER.size + capacity * ENTRY.size
+        # prepare the file aside so readers never see an incomplete file
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, capacity, 0, 0, 0, 0, 0)
+        os.replace(temp_path, self.path)
+
+    def publish(self, entries: Iterable[Tuple[str, float]], interval: float):
+        """Replace all entries by new ``entries`` of names and values"""
+        data = bytearray()
+        count = 0
+        for name, value in entries:
+            if count >= self.capacity:
+                break
+            data += ENTRY.pack(name.encode()[:48], value)
+            count += 1
+        mapped = self._map
+        self._sequence += 1
+        SEQUENCE.pack_into(mapped, SEQUENCE_OFFSET, self._sequence)
+        HEADER.pack_into(
+            mapped,
+            0,
+            MAGIC,
+            LAYOUT_VERSION,
+            self.capacity,
+            count,
+            0,
+            self._sequence,
+            time.time(),
+            interval,
+        )
+        start, end = HEADER.size, HEADER.size + len(data)
+        mapped[start:end] = data
+        self._sequence += 1
+        SEQUENCE.pack_into(mapped, SEQUENCE_OFFSET, self._sequence)
+
+    def send(self, report: Report):
+        """Publish a report, the sensor calls of this tick and the own usage"""
+        tick = SNAPSHOT.tick
+        fields = report.fields
+        entries: List[Tuple[str, float]] = [
+            (f"report.{field}", value) for field, value in zip(fields, report.values)
+        ]
+        entries.extend(
+            (f"raw.{field}", raw) for field, raw in zip(fields, report.raw_values)
+        )
+        usage = self._monitor.measure()
+        entries.extend([("self.pcpu", usage.pcpu), ("self.rss", usage.rss)])
+        with RECORDED_LOCK:
+            recorded = sorted(RECORDED_CALLS.items())
+            # forget calls that are not used anymore, e.g. after a reload
+            for label, (call_tick, _) in recorded:
+                if call_tick < tick - 1:
+                    del RECORDED_CALLS[label]
+        entries.extend(
+            (label, value)
+            for label, (call_tick, value) in recorded
+            if call_tick == tick
+        )
+        self.publish(entries, report.interval)
+
+    def close(self):
+        """Stop exporting and remove the file"""
+        self._map.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ExportSnapshot(NamedTuple):
+    """Consistent content of an export"""
+
+    timestamp: float
+    interval: float
+    values: Dict[str, float]
+
+
+def read_export(mapped: "mmap.mmap | bytes", retries: int = 1000) -> ExportSnapshot:
+    """Read a consistent snapshot from the ``mapped`` content of an export file"""
+    for _ in range(retries):
+        magic, version, _, count, _, sequence, timestamp, interval = HEADER.unpack_from(
+            mapped, 0
+        )
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError("not a cms_perf export of a known layout")
+        if sequence % 2 == 0:
+            start, end = HEADER.size, HEADER.size + count * ENTRY.size
+            data = bytes(mapped[start:end])
+            if SEQUENCE.unpack_from(mapped, SEQUENCE_OFFSET)[0] == sequence:
+                values = {
+                    name.rstrip(b"\0").decode(errors="replace"): value
+                    for name, value in ENTRY.iter_unpack(data)
+                }
+                return ExportSnapshot(timestamp, interval, values)
+        time.sleep(0)
+    raise TimeoutError("export was not consistent for any read")
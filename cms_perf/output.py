@@ -0,0 +1,117 @@
+"""
+Writing of reports without blocking on the consumer
+
+Each line is written with a single ``write`` call. If the consumer of a pipe
+does not keep up, lines are not queued up: newer lines replace older ones
+that could not be written yet, so that only the latest report is delivered.
+"""
+
+from typing import Callable, Optional
+import functools
+import os
+import socket
+import stat
+
+
+def same_file(fd_a: int, fd_b: int) -> bool:
+    """Check whether two file descriptors refer to the same file"""
+    try:
+        stat_a, stat_b = os.fstat(fd_a), os.fstat(fd_b)
+    except OSError:
+        return False
+    return (stat_a.st_dev, stat_a.st_ino) == (stat_b.st_dev, stat_b.st_ino)
+
+
+class LineWriter:
+    """
+    Non-blocking writer of lines to a file descriptor ``fd``
+
+    Pipes and sockets are written without blocking, but ``fd`` itself is left
+    in blocking mode: its open file description may be shared, e.g. with
+    *stderr* used for logging or with other processes writing to the same pipe.
+    Instead, pipes are reopened as a non-blocking description of their own
+    and sockets are sent to with ``MSG_DONTWAIT``. Other files, such as
+    terminals, are written to as usual. Lines that cannot be written right away
+    are kept until the next write and replaced by any newer line.
+    """
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        #: number of lines replaced before they could be written
+        self.dropped = 0
+        self._pending: Optional[bytes] = None
+        # remainder of a partially written line, which must be completed
+        self._partial = b""
+        self._write: Callable[[bytes], int] = functools.partial(os.write, fd)
+        self._close: Callable[[], None] = lambda: None
+        mode = os.fstat(fd).st_mode
+        if stat.S_ISSOCK(mode):
+            sock = socket.socket(fileno=os.dup(fd))
+            self._write = lambda data: sock.send(data, socket.MSG_DONTWAIT)
+            self._close = sock.close
+        elif stat.S_ISFIFO(mode):
+            try:
+                private_fd = os.open(
+                    f"/proc/self/fd/{fd}", os.O_WRONLY | os.O_NONBLOCK | os.O_CLOEXEC
+                )
+            except OSError:  # without procfs, the pipe is written to as usual
+                pass
+            else:
+                self._write = functools.partial(os.write, private_fd)
+                self._close = functools.partial(os.close, private_fd)
+
+    def write(self, line: bytes) -> bool:
+        """Write a ``line`` or keep it for later, and report whether all is written"""
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = line
+        return self.flush()
+
+    def flush(self) -> bool:
+        """Write any outstanding data and report whether all is written"""
+        try:
+            if self._partial:
+                written = self._write(self._partial)
+                self._partial = self._partial[written:]
+                if self._partial:
+                    return False
+            if self._pending is not None:
+                written = self._write(self._pending)
+                self._partial, self._pending = self._pending[written:], None
+        except BlockingIOError:
+            return False
+        return not self._partial
+
+    def close(self):
+        """Release the means of writing without blocking, but not ``fd`` itself"""
+        self._close()
+
+
+class ReportWriter:
+    """
+    Writer of reports for ``cms.perf`` and the summaries of ``cms.sched`` emulation
+
+    Reports are written to ``report_fd``, by default *stdout*, and summaries
+    to ``summary_fd``, by default *stderr*. If both refer to the same file,
+    each summary is appended to its report in the same line.
+    """
+
+    def __init__(self, report_fd: int = 1, summary_fd: int = 2):
+        self.reports = LineWriter(report_fd)
+        self.summaries = (
+            self.reports if same_file(report_fd, summary_fd) else LineWriter(summary_fd)
+        )
+
+    def write(self, report: str, summary: Optional[str] = None):
+        if summary is None:
+            self.reports.write(f"{report}\n".encode())
+        elif self.summaries is self.reports:
+            self.reports.write(f"{report} {summary}\n".encode())
+        else:
+            self.reports.write(f"{report}\n".encode())
+            self.summaries.write(f"{summary}\n".encode())
+
+    def close(self):
+        self.reports.close()
+        if self.summaries is not self.reports:
+            self.summaries.close()
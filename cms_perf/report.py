@@ -2,12 +2,26 @@
 The main loop collecting and reporting values
 """
 
-from typing import Callable
+from typing import Callable, List, Optional, Sequence, Union
+import argparse
+import logging
+import signal
 import sys
 import time
 
-from .setup.cli import CLI
-from .setup import cli_parser
+from .budget import CpuBudget
+from .cadence import AdaptiveInterval
+from .check import run_check
+from .deadline import SensorDeadline
+from .export import ValueExport
+from .explain import run_explain
+from .sinks import CmsdSink, Report, Sink, sink_from_spec
+from .sensors.snapshot import SNAPSHOT
+from .state import Checkpoint, StateCheckpoint, config_digest, load_checkpoint
+from .setup.cli import CLI, SENSOR_FIELDS, compile_options
+from .setup.reload import ConfigReloader, config_paths
+
+LOGGER = logging.getLogger(__name__)
 
 
 class PseudoSched:
@@ -56,18 +70,20 @@ class PseudoSched:
         return load, load > self.maxload
 
 
-def every(interval: float):
+def every(interval: Union[float, Callable[[], float]]):
     """
     Iterable that wakes up roughly every ``interval`` seconds
 
     The iterable pauses so that the time spent between iterations
     plus the pause time equals ``interval`` as closely as possible.
+    If ``interval`` is callable, it is queried for the current interval.
     """
+    current_interval = interval if callable(interval) else lambda: interval
     while True:
         suspended = time.monotonic()
         yield
         duration = time.monotonic() - suspended
-        time.sleep(max(0.1, interval - duration))
+        time.sleep(max(0.1, current_interval() - duration))
 
 
 def clamp_percentages(value: float) -> int:
@@ -75,6 +91,23 @@ def clamp_percentages(value: float) -> int:
     return 0 if value < 0.0 else 100 if value > 100.0 else int(value)
 
 
+def sample(
+    sensors: Sequence[Callable[[], float]], deadline: "SensorDeadline | None" = None
+) -> "list[int]":
+    """Sample all ``sensors`` as percentages, if given within a ``deadline``"""
+    return [clamp_percentages(value) for value in sample_raw(sensors, deadline)]
+
+
+def sample_raw(
+    sensors: Sequence[Callable[[], float]], deadline: "SensorDeadline | None" = None
+) -> "list[float]":
+    """Sample all ``sensors`` as-is, if given within a ``deadline``"""
+    SNAPSHOT.advance()
+    if deadline is not None:
+        return deadline(sensors, SENSOR_FIELDS)
+    return [sensor() for sensor in sensors]
+
+
 def run_forever(
     interval: float,
     rampup: float,
@@ -84,15 +117,65 @@ def run_forever(
     ppag: Callable[[], float],
     pio: Callable[[], float],
     sched: "PseudoSched | None" = None,
+    reloader: "ConfigReloader | None" = None,
+    deadline: "SensorDeadline | None" = None,
+    cadence: "AdaptiveInterval | None" = None,
+    sinks: "Sequence[Sink] | None" = None,
+    budget: "CpuBudget | None" = None,
+    resumed: float = 0.0,
 ):
-    """Write sensor information to stdout every ``interval`` seconds"""
+    """
+    Report sensor information to all ``sinks`` every ``interval`` seconds
+
+    If ``cadence`` is given, it adapts the interval instead.
+    If ``resumed`` is given, the rampup continues after this many seconds.
+    If ``budget`` is given, sensors are throttled to keep within the budget.
+    By default, reports are only written to stdout for ``cmsd``.
+    """
     sensors = (prunq, pcpu, pmem, ppag, pio)
+    sinks = sinks if sinks is not None else [CmsdSink()]
     try:
-        if rampup > 1.0:
-            report_rampup(interval, rampup, sched, *sensors)
-        report_forever(interval, sched, *sensors)
+        if rampup > resumed + 1.0:
+            sensors, sched = report_rampup(
+                interval,
+                rampup,
+                sched,
+                *sensors,
+                reloader=reloader,
+                sinks=sinks,
+                deadline=deadline,
+                cadence=cadence,
+                budget=budget,
+                resumed=resumed,
+            )
+        report_forever(
+            interval,
+            sched,
+            *sensors,
+            reloader=reloader,
+            sinks=sinks,
+            deadline=deadline,
+            cadence=cadence,
+            budget=budget,
+        )
     except KeyboardInterrupt:
         pass
+    finally:
+        for sink in sinks:
+            sink.close()
+
+
+def reload_config(
+    reloader: "ConfigReloader | None",
+    sensors: Sequence[Callable[[], float]],
+    sched: "PseudoSched | None",
+):
+    """Provide the sensors and sched of the latest configuration, if any"""
+    if reloader is None or not reloader.reload():
+        return sensors, sched
+    options = reloader.options
+    sched = PseudoSched.from_directive(options.sched) if options.sched else None
+    return reloader.sensors, sched
 
 
 def report_rampup(
@@ -100,51 +183,177 @@ def report_rampup(
     rampup: float,
     sched: "PseudoSched | None",
     *sensors: Callable[[], float],
-) -> None:
-    start_time = time.monotonic()
-    for _ in every(interval):
-        values = [clamp_percentages(sensor()) for sensor in sensors]
-        weight = min((time.monotonic() - start_time) / rampup, 1.0)
-        report_one(
-            [int(value * weight + (1 - weight) * 100) for value in values], sched
-        )
-        if weight >= 1:
+    reloader: "ConfigReloader | None" = None,
+    sinks: "Sequence[Sink] | None" = None,
+    deadline: "SensorDeadline | None" = None,
+    cadence: "AdaptiveInterval | None" = None,
+    budget: "CpuBudget | None" = None,
+    resumed: float = 0.0,
+):
+    start_time = time.monotonic() - resumed
+    for _ in every(cadence if cadence is not None else interval):
+        # stop only once the next report is due, to keep the interval
+        if time.monotonic() - start_time >= rampup:
             break
+        sensors, sched = reload_config(reloader, sensors, sched)
+        raw_values = sample_raw(sensors, deadline)
+        values = [clamp_percentages(value) for value in raw_values]
+        if cadence is not None:
+            sensors = cadence.adapt(values, sensors)
+        weight = min((time.monotonic() - start_time) / rampup, 1.0)
+        values = [int(value * weight + (1 - weight) * 100) for value in values]
+        report_one(values, sched, sinks, raw_values, cadence() if cadence else interval)
+        if budget is not None:
+            budget.update()
+    return sensors, sched
 
 
 def report_forever(
-    interval: float, sched: "PseudoSched | None", *sensors: Callable[[], float]
+    interval: float,
+    sched: "PseudoSched | None",
+    *sensors: Callable[[], float],
+    reloader: "ConfigReloader | None" = None,
+    sinks: "Sequence[Sink] | None" = None,
+    deadline: "SensorDeadline | None" = None,
+    cadence: "AdaptiveInterval | None" = None,
+    budget: "CpuBudget | None" = None,
 ) -> None:
-    for _ in every(interval):
-        values = [clamp_percentages(sensor()) for sensor in sensors]
-        report_one(values, sched)
+    for _ in every(cadence if cadence is not None else interval):
+        sensors, sched = reload_config(reloader, sensors, sched)
+        raw_values = sample_raw(sensors, deadline)
+        values = [clamp_percentages(value) for value in raw_values]
+        if cadence is not None:
+            sensors = cadence.adapt(values, sensors)
+        report_one(values, sched, sinks, raw_values, cadence() if cadence else interval)
+        if budget is not None:
+            budget.update()
 
 
-def report_one(values: "list[int]", sched: "PseudoSched | None" = None) -> None:
-    print(*values, end="", flush=True)
+def report_one(
+    values: "list[int]",
+    sched: "PseudoSched | None" = None,
+    sinks: "Sequence[Sink] | None" = None,
+    raw_values: "Sequence[float] | None" = None,
+    interval: float = 0.0,
+) -> None:
+    """Send the report of ``values`` and, if ``sched`` is given, their total load"""
+    if sinks is None:
+        sink = CmsdSink()
+        try:
+            return report_one(values, sched, [sink], raw_values, interval)
+        finally:
+            sink.close()
+    summary = None
     if sched is not None:
         load, rejected = sched.weight(*values)
-        print(
-            f" {load}{'!' if rejected else ''}",
-            end="",
-            file=sys.stderr,
-            flush=True,
-        )
-    print(flush=True)
+        summary = f"{load}{'!' if rejected else ''}"
+    report = Report(
+        time.time(),
+        interval,
+        SENSOR_FIELDS,
+        values,
+        raw_values if raw_values is not None else values,
+        summary,
+    )
+    for sink in sinks:
+        sink.send(report)
 
 
-def main():
-    """Run the sensor based on CLI arguments"""
-    options = CLI.parse_args()
-    prunq, pcpu, pmem, ppag, pio = cli_parser.compile_sensors(
-        options.interval,
-        options.prunq,
-        options.pcpu,
-        options.pmem,
-        options.ppag,
-        options.pio,
+def adaptive_interval(
+    options: argparse.Namespace,
+    deadline: SensorDeadline,
+    reloader: "ConfigReloader | None" = None,
+) -> "AdaptiveInterval | None":
+    """Create the adaptive interval configured by ``options``, if any"""
+    minimum = options.min_interval
+    maximum = options.max_interval
+    minimum = min(
+        minimum if minimum is not None else options.interval, options.interval
     )
+    maximum = max(
+        maximum if maximum is not None else options.interval, options.interval
+    )
+    if minimum == maximum:
+        return None
+
+    def recompile(interval: float) -> List[Callable[[], float]]:
+        if options.deadline is None:
+            deadline.timeout = max(interval / 2, 1.0)
+        if reloader is not None:
+            return reloader.recompile(interval)
+        return compile_options(options, interval=interval)
+
+    return AdaptiveInterval(options.interval, minimum, maximum, compile=recompile)
+
+
+def create_sinks(options: argparse.Namespace) -> List[Sink]:
+    """Create the sinks configured by ``options``, starting with ``cmsd``"""
+    sinks: List[Sink] = [CmsdSink()]
+    try:
+        if options.export is not None:
+            sinks.append(ValueExport(options.export))
+        sinks.extend(map(sink_from_spec, options.sink))
+    except (OSError, ValueError) as err:
+        for sink in sinks:
+            sink.close()
+        CLI.error(f"cannot create sink: {err}")
+    return sinks
+
+
+def resume_checkpoint(
+    checkpoint: Checkpoint,
+    sensors: Sequence[Callable[[], float]],
+    cadence: "AdaptiveInterval | None" = None,
+) -> "tuple[Sequence[Callable[[], float]], float]":
+    """Resume from a ``checkpoint``, providing the sensors and rampup progress"""
+    if checkpoint.cpu_times is not None:
+        SNAPSHOT.resume_cpu(*checkpoint.cpu_times)
+    if cadence is not None:
+        values = [clamp_percentages(value) for value in checkpoint.raw_values]
+        sensors = cadence.resume(checkpoint.interval, values, sensors)
+    progress = checkpoint.rampup_progress()
+    LOGGER.info("resuming state with %.0fs of rampup completed", progress)
+    return sensors, progress
+
+
+def _terminate(signum: int, frame: object):
+    raise SystemExit(0)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """Run the sensor based on CLI arguments"""
+    logging.basicConfig(format="cms_perf: %(message)s", level=logging.WARNING)
+    argv = list(sys.argv[1:] if argv is None else argv)
+    options = CLI.parse_args(argv)
+    if options.check:
+        return 0 if run_check(options) else 1
+    if options.explain:
+        return run_explain(options, ticks=options.explain)
+    sensors = compile_options(options)
     sched = PseudoSched.from_directive(options.sched) if options.sched else None
+    deadline = SensorDeadline(
+        timeout=(
+            options.deadline
+            if options.deadline is not None
+            else max(options.interval / 2, 1.0)
+        ),
+        max_stale=options.max_stale,
+    )
+    # watch configuration files for changes
+    reloader = ConfigReloader(argv, options, sensors) if config_paths(argv) else None
+    cadence = adaptive_interval(options, deadline, reloader)
+    sinks = create_sinks(options)
+    resumed = 0.0
+    if options.state is not None:
+        checkpoint = load_checkpoint(options.state, config_digest(options))
+        if checkpoint is not None:
+            sensors, resumed = resume_checkpoint(checkpoint, sensors, cadence)
+        sinks.append(
+            StateCheckpoint(options.state, options, resumed, reloader=reloader)
+        )
+        # write a final checkpoint when being stopped
+        signal.signal(signal.SIGTERM, _terminate)
+    prunq, pcpu, pmem, ppag, pio = sensors
     run_forever(
         interval=options.interval,
         rampup=options.rampup,
@@ -154,4 +363,10 @@ def main():
         ppag=ppag,
         pio=pio,
         sched=sched,
+        reloader=reloader,
+        deadline=deadline,
+        cadence=cadence,
+        sinks=sinks,
+        budget=CpuBudget(options.budget) if options.budget is not None else None,
+        resumed=resumed,
     )
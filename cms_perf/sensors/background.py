@@ -0,0 +1,119 @@
+"""
+Sampling of expensive sensors in the background on their own cadence
+"""
+
+from typing import Callable, Optional, Tuple
+from types import TracebackType
+import threading
+import time
+
+from ..setup.cli_parser import cli_call, CallInfo, CLICall, Duration, Lazy, Purity
+
+
+@cli_call(name="every", purity=Purity.stateful)
+def sample_every(interval: float, expression: Lazy, period: Duration) -> float:
+    """
+    The latest value of ``expression`` evaluated every ``period`` in the background
+
+    The ``period`` is a duration such as ``30s`` or ``5m``.
+    Useful for expensive sensors that need not be updated every interval,
+    such as ``every(nsockets, 5m)``.
+    """
+    sampler = cached_sampler(expression, period.seconds, interval)
+    return sampler()
+
+
+def sample_calls(call_info: CallInfo, period: float, interval: float) -> CLICall:
+    """Wrap a CLI call so that each distinct call is sampled in the background"""
+    name, call = call_info.cli_name, call_info.call
+
+    def sampled_call(*args: object) -> float:
+        expression = Lazy(f"{name}{args!r}", lambda: call(*args))
+        return cached_sampler(expression, period, interval)()
+
+    return sampled_call
+
+
+def cached_sampler(
+    expression: Lazy, period: float, interval: float
+) -> "BackgroundSampler":
+    key = (expression.source, period, interval)
+    # fields are evaluated concurrently but must share one sampler per key
+    with SAMPLER_LOCK:
+        sampler = SAMPLER_CACHE.get(key)
+        if sampler is None or sampler.idle:
+            # release samplers that are not read anymore, e.g. after a reload
+            for idle in [name for name, cached in SAMPLER_CACHE.items() if cached.idle]:
+                del SAMPLER_CACHE[idle]
+            sampler = BackgroundSampler(
+                expression.call, period=period, idle_timeout=10 * max(period, interval)
+            )
+            SAMPLER_CACHE[key] = sampler
+        return sampler
+
+
+SAMPLER_CACHE: "dict[Tuple[str, float, float], BackgroundSampler]" = {}
+SAMPLER_LOCK = threading.Lock()
+
+
+# the value or error of an evaluation and the traceback of the error
+_Result = Tuple[float, Optional[Exception], Optional[TracebackType]]
+
+
+class BackgroundSampler:
+    """
+    Evaluate ``call`` every ``period`` seconds in a background thread
+
+    Calling the sampler provides the latest value without evaluating ``call``;
+    only the very first call waits for the first value to be available.
+    If ``call`` failed, its latest error is raised instead.
+    The sampler stops for good if it is not read for ``idle_timeout`` seconds.
+    """
+
+    def __init__(
+        self,
+        call: Callable[[], float],
+        period: float,
+        idle_timeout: float = float("inf"),
+    ):
+        self.call = call
+        self.period = period
+        self.idle_timeout = idle_timeout
+        self._stopped = False
+        # the latest result, replaced as a whole so that reading needs no lock
+        self._latest: Optional[_Result] = None
+        self._last_read = time.monotonic()
+        self._available = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample_forever, name=f"sampler {call!r}", daemon=True
+        )
+        self._thread.start()
+
+    def __call__(self) -> float:
+        self._last_read = time.monotonic()
+        latest = self._latest
+        if latest is None:
+            self._available.wait()
+            latest = self._latest
+            assert latest is not None
+        value, error, traceback = latest
+        if error is not None:
+            # raising the same error again would extend its traceback every time
+            raise error.with_traceback(traceback)
+        return value
+
+    @property
+    def idle(self) -> bool:
+        """Whether the sampler is stopped or will stop since it is not read"""
+        return self._stopped or time.monotonic() - self._last_read > self.idle_timeout
+
+    def _sample_forever(self):
+        while not self.idle:
+            started = time.monotonic()
+            try:
+                self._latest = (self.call(), None, None)
+            except Exception as err:
+                self._latest = (0.0, err, err.__traceback__)
+            self._available.set()
+            time.sleep(max(0.0, self.period - (time.monotonic() - started)))
+        self._stopped = True
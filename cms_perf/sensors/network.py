@@ -0,0 +1,77 @@
+"""
+Sensors for stress of the network path beyond the transmitted bytes
+
+A server may be congested well below the speed of its network interfaces,
+which shows as retransmitted TCP segments, packets dropped by the interfaces
+and connections dropped since the accept queue of a listening socket is full.
+The kernel counts these in ``/proc/net/snmp``, ``/proc/net/netstat`` and
+``/proc/net/dev``, which are read once per tick for all sensors.
+"""
+
+from typing import Dict
+import enum
+
+from ..setup.cli_parser import Purity, cli_call, cli_domain
+from .snapshot import SNAPSHOT
+
+
+@cli_domain(name="NETSTRESS")
+class NetStress(enum.Enum):
+    retrans = enum.auto()
+    drops = enum.auto()
+    overflows = enum.auto()
+    churn = enum.auto()
+    all = enum.auto()
+
+
+#: value of each kind of stress that is considered a full load
+THRESHOLDS: Dict[NetStress, float] = {
+    NetStress.retrans: 5,
+    NetStress.drops: 1,
+    NetStress.overflows: 10,
+    NetStress.churn: 1000,
+}
+
+
+def _network_stress(interval: float) -> Dict[NetStress, float]:
+    sample_interval = min(interval / 4, 1)
+    rates = SNAPSHOT.net_rates(sample_interval)
+    segments = rates.get("Tcp.OutSegs", 0.0)
+    packets = rates["rx_packets"] + rates["tx_packets"]
+    return {
+        NetStress.retrans: (
+            100.0 * rates.get("Tcp.RetransSegs", 0.0) / segments if segments else 0.0
+        ),
+        NetStress.drops: (
+            100.0 * (rates["rx_drop"] + rates["tx_drop"]) / packets if packets else 0.0
+        ),
+        NetStress.overflows: rates.get("TcpExt.ListenOverflows", 0.0),
+        NetStress.churn: (
+            rates.get("Tcp.ActiveOpens", 0.0) + rates.get("Tcp.PassiveOpens", 0.0)
+        ),
+    }
+
+
+@cli_call(name="pnet", purity=Purity.stateful)
+def network_stress(
+    interval: float, kind: NetStress = NetStress.all, *threshold: float
+) -> float:
+    """
+    Percentage of network stress since the previous report relative to a threshold
+
+    ``kind`` selects the stress, and may be one of
+    ``retrans`` for the percentage of sent TCP segments that were retransmitted,
+    ``drops`` for the percentage of packets dropped by the network interfaces,
+    ``overflows`` for connections per second dropped by full accept queues,
+    ``churn`` for TCP connections opened per second, or
+    ``all`` for the highest percentage of all of them by their default threshold.
+    It defaults to ``all``.
+    ``threshold`` selects the stress considered a full load,
+    as in ``pnet(retrans, 2)``.
+    The thresholds default to 5 for ``retrans``, 1 for ``drops``,
+    10 for ``overflows`` and 1000 for ``churn``.
+    """
+    stress = _network_stress(interval)
+    if kind is NetStress.all:
+        return max(100.0 * stress[each] / THRESHOLDS[each] for each in stress)
+    return 100.0 * stress[kind] / (threshold[0] if threshold else THRESHOLDS[kind])
@@ -0,0 +1,93 @@
+"""
+Sensors for memory pressure from the paging activity of the kernel
+
+Under memory pressure, the kernel reclaims the page cache, faults pages
+back in from disk and swaps, all of which slows down the server.
+The kernel counts this activity in ``/proc/vmstat``,
+which is read once per tick for all sensors.
+"""
+
+from typing import Dict, Tuple
+import enum
+
+from ..setup.cli_parser import Purity, cli_call, cli_domain
+from .snapshot import SNAPSHOT
+
+
+@cli_domain(name="PAGING")
+class PagingKind(enum.Enum):
+    scan = enum.auto()
+    steal = enum.auto()
+    majfault = enum.auto()
+    swap = enum.auto()
+    all = enum.auto()
+
+
+# counters of each kind, by prefix to include the counters of each memory zone
+_COUNTERS: Dict[PagingKind, Tuple[str, ...]] = {
+    PagingKind.scan: ("pgscan_direct",),
+    PagingKind.steal: ("pgsteal_kswapd", "pgsteal_direct", "pgsteal_khugepaged"),
+    PagingKind.majfault: ("pgmajfault",),
+    PagingKind.swap: ("pswpin", "pswpout"),
+}
+# counters sharing a prefix but counting something else
+_EXCLUDED = {"pgscan_direct_throttle"}
+
+#: pages per second of each kind that are considered a full load
+THRESHOLDS: Dict[PagingKind, float] = {
+    PagingKind.scan: 10000,
+    PagingKind.steal: 50000,
+    PagingKind.majfault: 1000,
+    PagingKind.swap: 1000,
+}
+
+
+def _paging_rates(interval: float) -> Dict[PagingKind, float]:
+    rates = SNAPSHOT.vmstat_rates(min(interval / 4, 1))
+    kinds = dict.fromkeys(_COUNTERS, 0.0)
+    for name, rate in rates.items():
+        if name in _EXCLUDED:
+            continue
+        for kind, prefixes in _COUNTERS.items():
+            if name.startswith(prefixes):
+                kinds[kind] += rate
+    return kinds
+
+
+@cli_call(name="npaging", purity=Purity.stateful)
+def paging_rate(interval: float, kind: PagingKind = PagingKind.scan) -> float:
+    """
+    Pages per second of paging activity since the previous report
+
+    ``kind`` selects the activity, and may be one of
+    ``scan`` for pages scanned by processes that had to reclaim memory themselves,
+    ``steal`` for pages reclaimed from the page cache and other memory,
+    ``majfault`` for page faults that had to read from disk,
+    ``swap`` for pages swapped in and out,
+    or ``all`` for the sum of all of them.
+    It defaults to ``scan``.
+    """
+    rates = _paging_rates(interval)
+    if kind is PagingKind.all:
+        return sum(rates.values())
+    return rates[kind]
+
+
+@cli_call(name="ppaging", purity=Purity.stateful)
+def paging_load(
+    interval: float, kind: PagingKind = PagingKind.all, *threshold: float
+) -> float:
+    """
+    Percentage of paging activity since the previous report relative to a threshold
+
+    ``kind`` selects the activity as for ``npaging``, and ``threshold`` the pages
+    per second considered a full load, as in ``ppaging(majfault, 500)``.
+    The thresholds default to 10000 for ``scan``, 50000 for ``steal``,
+    and 1000 for ``majfault`` and ``swap``.
+    The default ``all`` is the highest percentage of all kinds by their default
+    threshold, which is suitable as ``--ppag=ppaging``.
+    """
+    rates = _paging_rates(interval)
+    if kind is PagingKind.all:
+        return max(100.0 * rates[each] / THRESHOLDS[each] for each in rates)
+    return 100.0 * rates[kind] / (threshold[0] if threshold else THRESHOLDS[kind])
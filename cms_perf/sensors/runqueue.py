@@ -0,0 +1,138 @@
+"""
+High-frequency sampling of the run queue for the load over exact windows
+
+The kernel load averages decay exponentially over 1, 5 or 15 minutes and thus
+react slowly to bursts of load. Instead, the number of running and blocked
+processes is sampled several times per second in the background.
+The samples of a window, such as the reporting interval, provide the mean or
+a percentile of the load over exactly that window.
+"""
+
+from array import array
+from typing import List, Tuple
+import math
+import os
+import threading
+import time
+
+import psutil
+
+
+def _procstat_count(content: bytes, name: bytes) -> int:
+    start = content.index(name) + len(name)
+    end = content.index(b"\n", start)
+    return int(content[start:end])
+
+
+class ProcStatReader:
+    """
+    Reader of the running and blocked processes from ``/proc/stat``
+
+    The file is kept open and read into a reused buffer.
+    """
+
+    def __init__(self):
+        self._fd = os.open(os.path.join(psutil.PROCFS_PATH, "stat"), os.O_RDONLY)
+        self._buffer = bytearray(16384)
+
+    def read(self) -> int:
+        """Read the number of running and blocked processes, excluding the reader"""
+        buffer = self._buffer
+        while True:
+            # os.preadv would save a call but is available only since Python 3.7
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            size = os.readv(self._fd, [buffer])
+            if size < len(buffer):
+                break
+            # the content did not fit, so try again with more room
+            buffer.extend(bytes(len(buffer)))
+        content = bytes(memoryview(buffer)[:size])
+        running = _procstat_count(content, b"procs_running ")
+        blocked = _procstat_count(content, b"procs_blocked ")
+        # the reader itself is running while reading
+        return max(running - 1, 0) + blocked
+
+    def close(self):
+        os.close(self._fd)
+
+
+class RunQueueSampler:
+    """
+    Sample the run queue every ``period`` seconds for a ``window`` of seconds
+
+    Samples are kept in a ring buffer that holds just one ``window``.
+    The first sample is taken on creation; the sampler stops for good
+    if it is not read for ``idle_timeout`` seconds.
+    """
+
+    def __init__(
+        self, window: float, period: float, idle_timeout: float = float("inf")
+    ):
+        self.window = window
+        self.period = period
+        self.idle_timeout = idle_timeout
+        capacity = max(math.ceil(window / period), 1) + 1
+        self._times = array("d", [-math.inf] * capacity)
+        self._values = array("d", [0.0] * capacity)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._reader = ProcStatReader()
+        self._stopped = False
+        self._last_read = time.monotonic()
+        self._record()
+        self._thread = threading.Thread(
+            target=self._sample_forever, name="runqueue sampler", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def idle(self) -> bool:
+        """Whether the sampler is stopped or will stop since it is not read"""
+        return self._stopped or time.monotonic() - self._last_read > self.idle_timeout
+
+    def samples(self) -> List[float]:
+        """The samples of the most recent ``window``, at least the latest sample"""
+        now = self._last_read = time.monotonic()
+        with self._lock:
+            entries: List[Tuple[float, float]] = list(zip(self._times, self._values))
+            latest = self._values[self._next - 1]
+        since = now - self.window
+        return [value for when, value in entries if when >= since] or [latest]
+
+    def _record(self):
+        value = self._reader.read()
+        with self._lock:
+            index = self._next
+            self._times[index] = time.monotonic()
+            self._values[index] = value
+            self._next = (index + 1) % len(self._times)
+
+    def _sample_forever(self):
+        try:
+            while not self.idle:
+                time.sleep(self.period)
+                self._record()
+        finally:
+            self._stopped = True
+            self._reader.close()
+
+
+def cached_sampler(interval: float) -> RunQueueSampler:
+    # fields are evaluated concurrently but must share one sampler per interval
+    with SAMPLER_LOCK:
+        sampler = SAMPLER_CACHE.get(interval)
+        if sampler is None or sampler.idle:
+            # release samplers that are not read anymore, e.g. for an old interval
+            for idle in [key for key, cached in SAMPLER_CACHE.items() if cached.idle]:
+                del SAMPLER_CACHE[idle]
+            sampler = RunQueueSampler(
+                window=interval,
+                period=min(0.25, max(interval / 4, 0.05)),
+                idle_timeout=10 * max(interval, 1),
+            )
+            SAMPLER_CACHE[interval] = sampler
+        return sampler
+
+
+SAMPLER_CACHE: "dict[float, RunQueueSampler]" = {}
+SAMPLER_LOCK = threading.Lock()
@@ -0,0 +1,57 @@
+"""
+Sensors for the resources used by ``cms_perf`` itself
+"""
+
+from typing import NamedTuple
+import time
+
+import psutil
+
+from ..setup.cli_parser import Purity, cli_call
+from .snapshot import SNAPSHOT
+
+
+@cli_call(name="self.pcpu", purity=Purity.stateful)
+def self_pcpu(interval: float) -> float:
+    """
+    Percentage of one CPU core used by ``cms_perf`` since the previous report
+
+    This includes all threads, such as those sampling in the background.
+    """
+    return SNAPSHOT.read("self.usage", SELF_MONITOR.measure).pcpu
+
+
+@cli_call(name="self.rss")
+def self_rss(interval: float) -> float:
+    """Resident memory used by ``cms_perf`` in bytes"""
+    return SNAPSHOT.read("self.usage", SELF_MONITOR.measure).rss
+
+
+class SelfUsage(NamedTuple):
+    """Resources used by the current process"""
+
+    #: percentage of one core used since the previous measurement
+    pcpu: float
+    #: resident memory in bytes
+    rss: int
+
+
+class SelfMonitor:
+    """Resources used by the current process between consecutive measurements"""
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self._wall_time = time.monotonic()
+        self._cpu_time = time.process_time()
+
+    def measure(self) -> SelfUsage:
+        """Measure the resource usage since the previous measurement or creation"""
+        wall_time, cpu_time = time.monotonic(), time.process_time()
+        elapsed = wall_time - self._wall_time
+        pcpu = 100.0 * (cpu_time - self._cpu_time) / elapsed if elapsed > 0 else 0.0
+        self._wall_time, self._cpu_time = wall_time, cpu_time
+        return SelfUsage(pcpu, self._process.memory_info().rss)
+
+
+#: the monitor shared by all sensors
+SELF_MONITOR = SelfMonitor()
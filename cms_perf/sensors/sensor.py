@@ -5,6 +5,7 @@ Sensors for the canonical cms.perf and related measurements
 
     The paging load has no canonical meaning anymore.
     It exists for backwards compatibility but is assumed 0.
+    The memory pressure sensors of :py:mod:`~.paging` provide a modern alternative.
 """
 
 import time
@@ -13,28 +14,83 @@ import warnings
 
 import psutil
 
-from ..setup.cli_parser import cli_call, cli_domain
+from ..setup.cli_parser import Cost, Purity, cli_call, cli_domain
+from .snapshot import SNAPSHOT, numa_cpus, percentile
+from . import runqueue
+
+
+@cli_domain(name="LOADSTAT")
+class LoadStat(enum.Enum):
+    avg = enum.auto()
+    mean = enum.auto()
+    max = enum.auto()
+    pctl = enum.auto()
 
 
 # individual sensors for system state
 @cli_call(name="prunq")
-def system_prunq(interval: float) -> float:
-    """Percentage of system load per core, equivalent to ``100*nloadq/ncores``"""
-    loadavg_index = 0 if interval <= 60 else 1 if interval <= 300 else 2
-    return 100.0 * psutil.getloadavg()[loadavg_index] / psutil.cpu_count()
+def system_prunq(
+    interval: float, stat: LoadStat = LoadStat.avg, *option: float
+) -> float:
+    """
+    Percentage of system load per core, equivalent to ``100*nloadq/ncores``
+
+    ``stat`` selects how the load is measured as for ``nloadq``,
+    as in ``prunq(pctl, 90)``.
+    """
+    return 100.0 * system_loadq(interval, stat, *option) / SNAPSHOT.ncores
+
 
+@cli_domain(name="CPUSTAT")
+class CpuStat(enum.Enum):
+    mean = enum.auto()
+    max = enum.auto()
+    min = enum.auto()
+    pctl = enum.auto()
+    numa = enum.auto()
 
-@cli_call(name="pcpu")
-def cpu_utilization(interval: float) -> float:
-    """Percentage of cpu utilisation"""
+
+@cli_call(name="pcpu", purity=Purity.stateful)
+def cpu_utilization(
+    interval: float, stat: CpuStat = CpuStat.mean, *option: float
+) -> float:
+    """
+    Percentage of cpu utilisation since the previous report
+
+    ``stat`` selects how the utilisation of individual cores is combined,
+    and may be one of
+    ``mean`` for all cores,
+    ``max`` or ``min`` for the busiest or idlest core,
+    ``pctl`` for a percentile of the cores, as in ``pcpu(pctl, 90)``, or
+    ``numa`` for the cores of a NUMA node, as in ``pcpu(numa, 1)``.
+    It defaults to ``mean``.
+    The percentile defaults to 90 and the NUMA node to 0.
+    """
     sample_interval = min(interval / 4, 1)
-    return psutil.cpu_percent(interval=sample_interval)
+    utilisation = SNAPSHOT.cpu_utilisation(sample_interval)
+    fractions = utilisation.fractions
+    if stat is CpuStat.mean or not fractions:
+        return 100.0 * utilisation.overall
+    elif stat is CpuStat.max:
+        return 100.0 * max(fractions)
+    elif stat is CpuStat.min:
+        return 100.0 * min(fractions)
+    elif stat is CpuStat.pctl:
+        return 100.0 * percentile(fractions, option[0] if option else 90)
+    else:  # CpuStat.numa
+        node_cpus = numa_cpus(int(option[0]) if option else 0)
+        node_fractions = [
+            fraction
+            for cpu, fraction in zip(utilisation.ids, fractions)
+            if cpu in node_cpus
+        ]
+        return 100.0 * sum(node_fractions) / max(len(node_fractions), 1)
 
 
 @cli_call(name="pmem")
 def memory_utilization(interval: float) -> float:
     """Percentage of memory utilisation"""
-    return psutil.virtual_memory().percent
+    return SNAPSHOT.memory.pmem
 
 
 def _get_sent_bytes():
@@ -44,7 +100,7 @@ def _get_sent_bytes():
     }
 
 
-@cli_call(name="pio")
+@cli_call(name="pio", blocks=lambda interval: min(interval / 4, 1))
 def network_utilization(interval: float) -> float:
     """Percentage of network I/O utilisation"""
     sample_interval = min(interval / 4, 1)
@@ -76,10 +132,30 @@ def system_legacy_loadq(interval: float) -> float:
 
 
 @cli_call(name="nloadq")
-def system_loadq(interval: float) -> float:
-    """Absolute system load, the number of active processes"""
-    loadavg_index = 0 if interval <= 60 else 1 if interval <= 300 else 2
-    return psutil.getloadavg()[loadavg_index]
+def system_loadq(
+    interval: float, stat: LoadStat = LoadStat.avg, *option: float
+) -> float:
+    """
+    Absolute system load, the number of active processes
+
+    ``stat`` selects how the load is measured, and may be one of
+    ``avg`` for the kernel load average closest to the interval,
+    or ``mean``, ``max`` or ``pctl`` for the mean, maximum or a percentile
+    of the running and blocked processes sampled several times per second
+    over exactly the interval, as in ``nloadq(pctl, 90)``.
+    It defaults to ``avg``.
+    The percentile defaults to 90.
+    """
+    if stat is LoadStat.avg:
+        loadavg_index = 0 if interval <= 60 else 1 if interval <= 300 else 2
+        return SNAPSHOT.loadavg[loadavg_index]
+    samples = runqueue.cached_sampler(interval).samples()
+    if stat is LoadStat.mean:
+        return sum(samples) / len(samples)
+    elif stat is LoadStat.max:
+        return max(samples)
+    else:  # LoadStat.pctl
+        return percentile(samples, option[0] if option else 90)
 
 
 @cli_domain(name="CPU")
@@ -88,7 +164,7 @@ class CpuKind(enum.Enum):
     physical = enum.auto()
 
 
-@cli_call(name="ncores")
+@cli_call(name="ncores", purity=Purity.constant)
 def system_ncpu(kind: CpuKind = CpuKind.all) -> float:
     """
     Number of CPU cores, by default including logical cores as well
@@ -96,13 +172,13 @@ def system_ncpu(kind: CpuKind = CpuKind.all) -> float:
     ``kind`` selects which cores to count, and may be one of ``all`` or ``physical``.
     It defaults to ``all``.
     """
-    return float(psutil.cpu_count(logical=kind is CpuKind.all))
+    return float(SNAPSHOT.ncores if kind is CpuKind.all else SNAPSHOT.ncores_physical)
 
 
 @cli_call(name="pswap")
 def system_pswap(interval: float) -> float:
     """Percentage of swap utilisation"""
-    return psutil.swap_memory().percent
+    return SNAPSHOT.memory.pswap
 
 
 @cli_domain(name="NET")
@@ -120,7 +196,7 @@ class ConnectionKind(enum.Enum):
     all = enum.auto()
 
 
-@cli_call(name="nsockets")
+@cli_call(name="nsockets", cost=Cost.expensive)
 def num_sockets(kind: ConnectionKind = ConnectionKind.tcp) -> float:
     """
     Number of open sockets across all processes
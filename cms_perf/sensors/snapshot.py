@@ -0,0 +1,435 @@
+"""
+Snapshot of system information shared by all sensors of the same tick
+
+Several sensors derive their values from the same system sources,
+such as ``/proc/loadavg`` or ``/proc/meminfo``. The snapshot reads each
+source lazily and at most once per tick, no matter how many sensors
+and expressions use it. Each report starts a new tick via
+:py:meth:`SystemSnapshot.advance`.
+"""
+
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence, Tuple, TypeVar
+from array import array
+import functools
+import math
+import os
+import threading
+import time
+
+import psutil
+
+T = TypeVar("T")
+
+
+class MemoryInfo(NamedTuple):
+    """Utilisation of memory and swap, as percentages"""
+
+    pmem: float
+    pswap: float
+
+
+def read_loadavg() -> Tuple[float, float, float]:
+    """Read the 1, 5 and 15 minute load averages, preferably from ``/proc/loadavg``"""
+    try:
+        with open(os.path.join(psutil.PROCFS_PATH, "loadavg"), "rb") as loadavg:
+            one, five, fifteen = map(float, loadavg.read().split()[:3])
+    except (OSError, ValueError):
+        return psutil.getloadavg()
+    return one, five, fifteen
+
+
+def read_meminfo() -> Dict[str, int]:
+    """Read ``/proc/meminfo`` as a mapping of fields to their value in kB"""
+    fields: Dict[str, int] = {}
+    with open(os.path.join(psutil.PROCFS_PATH, "meminfo"), "rb") as meminfo:
+        for line in meminfo:
+            name, _, value = line.partition(b":")
+            fields[name.decode()] = int(value.split()[0])
+    return fields
+
+
+def read_memory() -> MemoryInfo:
+    """Read the memory and swap utilisation, preferably from ``/proc/meminfo``"""
+    try:
+        meminfo = read_meminfo()
+        total, available = meminfo["MemTotal"], meminfo["MemAvailable"]
+        swap_total, swap_free = meminfo["SwapTotal"], meminfo["SwapFree"]
+    except (OSError, KeyError, ValueError, IndexError):
+        return MemoryInfo(psutil.virtual_memory().percent, psutil.swap_memory().percent)
+    return MemoryInfo(
+        100.0 * (total - available) / total if total else 0.0,
+        100.0 * (swap_total - swap_free) / swap_total if swap_total else 0.0,
+    )
+
+
+def read_memory_total() -> int:
+    """Read the total memory in bytes, preferably from ``/proc/meminfo``"""
+    try:
+        return read_meminfo()["MemTotal"] * 1024
+    except (OSError, KeyError, ValueError, IndexError):
+        return psutil.virtual_memory().total
+
+
+class CpuTimes:
+    """
+    Busy and total time of each CPU, read into preallocated buffers
+
+    The times are read from ``/proc/stat`` if possible or via :py:mod:`psutil`.
+    Buffers are reused between readings and only grow if CPUs are added.
+    """
+
+    def __init__(self):
+        self.ids = array("l")
+        self.busy = array("d")
+        self.total = array("d")
+
+    def read(self) -> "CpuTimes":
+        try:
+            self._read_procstat()
+        except OSError:
+            self._read_psutil()
+        return self
+
+    def _resize(self, count: int):
+        for buffer in (self.ids, self.busy, self.total):
+            if len(buffer) < count:
+                buffer.extend([0] * (count - len(buffer)))
+            else:
+                del buffer[count:]
+
+    def _read_procstat(self):
+        with open(os.path.join(psutil.PROCFS_PATH, "stat"), "rb") as procstat:
+            lines = [line for line in procstat if line[:3] == b"cpu"][1:]
+        self._resize(len(lines))
+        ids, busy, total = self.ids, self.busy, self.total
+        for index, line in enumerate(lines):
+            name, *fields = line.split()
+            # user nice system idle iowait irq softirq steal; guest is part of user
+            times = list(map(int, fields[:8]))
+            ids[index] = int(name[3:])
+            total[index] = all_time = sum(times)
+            busy[index] = all_time - times[3] - times[4]
+
+    def _read_psutil(self):
+        cpus = psutil.cpu_times(percpu=True)
+        self._resize(len(cpus))
+        for index, times in enumerate(cpus):
+            all_time = sum(times) - getattr(times, "guest", 0)
+            all_time -= getattr(times, "guest_nice", 0)
+            self.ids[index] = index
+            self.total[index] = all_time
+            self.busy[index] = all_time - times.idle - getattr(times, "iowait", 0)
+
+
+class CpuUtilisation(NamedTuple):
+    """Utilisation of each CPU as a fraction, and all CPUs combined"""
+
+    #: the number of each CPU as used by the kernel
+    ids: "array[int]"
+    #: utilisation of each CPU, from 0 to 1
+    fractions: List[float]
+    #: utilisation of all CPUs, from 0 to 1
+    overall: float
+
+
+class CpuMonitor:
+    """Utilisation of each CPU between consecutive measurements"""
+
+    def __init__(self):
+        self._previous, self._current = CpuTimes(), CpuTimes()
+        self._measured = False
+
+    def measure(self, sample_interval: float) -> CpuUtilisation:
+        """
+        Measure the utilisation since the previous measurement
+
+        Without a previous measurement, the first one samples for ``sample_interval``.
+        """
+        if not self._measured:
+            self._previous.read()
+            time.sleep(sample_interval)
+            self._measured = True
+        previous, current = self._previous, self._current.read()
+        if previous.ids != current.ids:  # CPUs went on- or offline
+            previous.read()
+            time.sleep(sample_interval)
+            current.read()
+        busy = list(map(float.__sub__, current.busy, previous.busy))
+        total = list(map(float.__sub__, current.total, previous.total))
+        fractions = [
+            cpu_busy / cpu_total if cpu_total > 0 else 0.0
+            for cpu_busy, cpu_total in zip(busy, total)
+        ]
+        all_total = sum(total)
+        overall = sum(busy) / all_total if all_total > 0 else 0.0
+        # the current buffers are the baseline for the next measurement
+        self._previous, self._current = current, previous
+        return CpuUtilisation(array("l", current.ids), fractions, overall)
+
+    def baseline(self) -> "Tuple[List[int], List[float], List[float]] | None":
+        """The ids, busy and total times of the latest measurement, if any"""
+        if not self._measured:
+            return None
+        previous = self._previous
+        return list(previous.ids), list(previous.busy), list(previous.total)
+
+    def resume(self, ids: Sequence[int], busy: Sequence[float], total: Sequence[float]):
+        """Measure the next utilisation since a previous :py:meth:`baseline`"""
+        previous = self._previous
+        previous.ids, previous.busy, previous.total = (
+            array("l", ids),
+            array("d", busy),
+            array("d", total),
+        )
+        self._measured = True
+
+
+def read_vmstat() -> Dict[str, int]:
+    """Read ``/proc/vmstat`` as a mapping of counters to their value"""
+    counters: Dict[str, int] = {}
+    with open(os.path.join(psutil.PROCFS_PATH, "vmstat"), "rb") as vmstat:
+        for line in vmstat:
+            name, _, value = line.partition(b" ")
+            counters[name.decode()] = int(value)
+    return counters
+
+
+def read_net_snmp() -> Dict[str, int]:
+    """
+    Read ``/proc/net/snmp`` and ``/proc/net/netstat`` as a mapping of counters
+
+    Counters are named by protocol and field, such as ``Tcp.RetransSegs``.
+    """
+    counters: Dict[str, int] = {}
+    for source in ("net/snmp", "net/netstat"):
+        try:
+            with open(os.path.join(psutil.PROCFS_PATH, source), "rb") as stats:
+                lines = stats.read().splitlines()
+        except FileNotFoundError:
+            continue
+        # each protocol has a line of field names followed by a line of values
+        for header, values in zip(lines[::2], lines[1::2]):
+            protocol, *names = header.split()
+            prefix = protocol.rstrip(b":").decode()
+            for name, value in zip(names, values.split()[1:]):
+                counters[f"{prefix}.{name.decode()}"] = int(value)
+    return counters
+
+
+def read_net_dev() -> Dict[str, int]:
+    """
+    Read ``/proc/net/dev`` as counters of packets and drops of all interfaces
+
+    Counters are summed over all interfaces except loopback,
+    and named ``rx_packets``, ``rx_drop``, ``tx_packets`` and ``tx_drop``.
+    If there is no ``/proc/net/dev``, e.g. in some containers, all counters are 0.
+    """
+    counters = dict.fromkeys(("rx_packets", "rx_drop", "tx_packets", "tx_drop"), 0)
+    try:
+        with open(os.path.join(psutil.PROCFS_PATH, "net/dev"), "rb") as net_dev:
+            lines = net_dev.read().splitlines()
+    except FileNotFoundError:
+        return counters
+    # skip the two lines of headers
+    for line in lines[2:]:
+        interface, _, data = line.partition(b":")
+        if interface.strip() == b"lo":
+            continue
+        fields = data.split()
+        counters["rx_packets"] += int(fields[1])
+        counters["rx_drop"] += int(fields[3])
+        counters["tx_packets"] += int(fields[9])
+        counters["tx_drop"] += int(fields[11])
+    return counters
+
+
+def read_net_counters() -> Dict[str, int]:
+    """
+    Read the network protocol and interface counters as one mapping of counters
+
+    Both are read together so that their rates are sampled in the same window.
+    """
+    return {**read_net_snmp(), **read_net_dev()}
+
+
+class CounterRates:
+    """
+    Rates per second of the counters of ``reader`` between consecutive measurements
+
+    All counters are read by one call of ``reader``, e.g. by reading one file.
+    """
+
+    def __init__(self, reader: Callable[[], Dict[str, int]]):
+        self.reader = reader
+        self._previous: "Tuple[float, Dict[str, int]] | None" = None
+
+    def measure(self, sample_interval: float) -> Dict[str, float]:
+        """
+        Measure the rates since the previous measurement
+
+        Without a previous measurement, the first one samples for ``sample_interval``.
+        Counters that are new or were reset have a rate of 0.
+        """
+        if self._previous is None:
+            self._previous = time.monotonic(), self.reader()
+            time.sleep(sample_interval)
+        (previous_time, previous), now = self._previous, time.monotonic()
+        current = self.reader()
+        self._previous = now, current
+        elapsed = now - previous_time
+        if elapsed <= 0:
+            return dict.fromkeys(current, 0.0)
+        return {
+            name: max(value - previous.get(name, value), 0) / elapsed
+            for name, value in current.items()
+        }
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    """Get the ``percent`` percentile of ``values`` by the nearest rank"""
+    rank = math.ceil(min(max(percent, 0), 100) / 100 * len(values))
+    return sorted(values)[max(rank - 1, 0)]
+
+
+#: path of the sysfs, which provides hardware information
+SYSFS_PATH = "/sys"
+
+
+@functools.lru_cache(maxsize=None)
+def numa_cpus(node: int) -> "frozenset[int]":
+    """Get the numbers of all CPUs of the NUMA ``node``"""
+    path = os.path.join(SYSFS_PATH, f"devices/system/node/node{node}/cpulist")
+    try:
+        with open(path) as cpulist:
+            ranges = cpulist.read().strip()
+    except FileNotFoundError:
+        raise ValueError(f"no NUMA node {node}") from None
+    cpus: "set[int]" = set()
+    for cpu_range in filter(None, ranges.split(",")):
+        first, _, last = cpu_range.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return frozenset(cpus)
+
+
+class SystemSnapshot:
+    """
+    Lazy, per-tick cache of system sources
+
+    Each source is read at most once per tick, even if several threads
+    request it concurrently.
+    """
+
+    def __init__(self):
+        self.tick = 0
+        self._sources: Dict[str, Tuple[int, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._cpu_monitor = CpuMonitor()
+        self._counter_rates: Dict[str, CounterRates] = {}
+
+    def advance(self):
+        """Start a new tick, after which all sources are read again"""
+        self.tick += 1
+        # release sources that are not read anymore, e.g. of discarded trackers
+        outdated = [
+            name for name, (tick, _) in self._sources.items() if tick < self.tick - 1
+        ]
+        if outdated:
+            with self._locks_lock:
+                for name in outdated:
+                    del self._sources[name]
+                    self._locks.pop(name, None)
+
+    def read(self, name: str, reader: Callable[[], T]) -> T:
+        """Get the source ``name`` of this tick, using ``reader`` if needed"""
+        tick = self.tick
+        cached = self._sources.get(name)
+        if cached is not None and cached[0] == tick:
+            return cached[1]
+        with self._lock(name):
+            cached = self._sources.get(name)
+            if cached is not None and cached[0] == tick:
+                return cached[1]
+            value = reader()
+            self._sources[name] = tick, value
+            return value
+
+    def _lock(self, name: str) -> threading.Lock:
+        try:
+            return self._locks[name]
+        except KeyError:
+            with self._locks_lock:
+                return self._locks.setdefault(name, threading.Lock())
+
+    @property
+    def loadavg(self) -> Tuple[float, float, float]:
+        """The 1, 5 and 15 minute system load averages"""
+        return self.read("loadavg", read_loadavg)
+
+    @property
+    def ncores(self) -> int:
+        """The number of logical CPU cores"""
+        return self.read("ncores", lambda: psutil.cpu_count() or 1)
+
+    @property
+    def ncores_physical(self) -> int:
+        """The number of physical CPU cores"""
+        return self.read(
+            "ncores_physical", lambda: psutil.cpu_count(logical=False) or 1
+        )
+
+    def cpu_utilisation(self, sample_interval: float) -> CpuUtilisation:
+        """
+        The utilisation of each CPU since the previous tick
+
+        If there was no previous measurement, CPUs are sampled for ``sample_interval``.
+        """
+        return self.read(
+            "cpu_utilisation", lambda: self._cpu_monitor.measure(sample_interval)
+        )
+
+    def cpu_baseline(self) -> "Tuple[List[int], List[float], List[float]] | None":
+        """The CPU times from which utilisation is measured next, if any"""
+        return self._cpu_monitor.baseline()
+
+    def resume_cpu(
+        self, ids: Sequence[int], busy: Sequence[float], total: Sequence[float]
+    ):
+        """Measure CPU utilisation since a previous :py:meth:`cpu_baseline`"""
+        self._cpu_monitor.resume(ids, busy, total)
+
+    def counter_rates(
+        self, name: str, reader: Callable[[], Dict[str, int]], sample_interval: float
+    ) -> Dict[str, float]:
+        """
+        The rates of the counters ``name`` read by ``reader`` since the previous tick
+
+        If there was no previous measurement, counters are sampled for
+        ``sample_interval``.
+        """
+        rates = self._counter_rates.get(name)
+        if rates is None:
+            rates = self._counter_rates.setdefault(name, CounterRates(reader))
+        return self.read(name, lambda: rates.measure(sample_interval))
+
+    def vmstat_rates(self, sample_interval: float) -> Dict[str, float]:
+        """The rates of the ``/proc/vmstat`` counters since the previous tick"""
+        return self.counter_rates("vmstat", read_vmstat, sample_interval)
+
+    def net_rates(self, sample_interval: float) -> Dict[str, float]:
+        """The rates of all network counters since the previous tick"""
+        return self.counter_rates("net", read_net_counters, sample_interval)
+
+    @property
+    def memory(self) -> MemoryInfo:
+        """The memory and swap utilisation"""
+        return self.read("memory", read_memory)
+
+    @property
+    def memory_total(self) -> int:
+        """The total memory in bytes"""
+        return self.read("memory_total", read_memory_total)
+
+
+#: the snapshot shared by all sensors
+SNAPSHOT = SystemSnapshot()
@@ -0,0 +1,358 @@
+"""
+Sensors for the space and inodes of data mounts
+
+Mounts are inspected concurrently and each inspection may take only a limited
+time, so that dead mounts such as unreachable NFS servers never block a report.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+import concurrent.futures
+import enum
+import fnmatch
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import psutil
+
+from ..setup.cli_parser import Cost, cli_call, cli_domain
+
+LOGGER = logging.getLogger(__name__)
+
+
+@cli_domain(name="MOUNTS")
+class MountPattern(str):
+    """
+    Pattern of mount points, or ``@`` and the path to an XRootD configuration file
+
+    Patterns are matched against the mount points of the system
+    and may use glob wildcards such as ``/data*``.
+    A configuration file such as ``@/etc/xrootd/xrootd-data.cfg`` selects
+    the mounts of its ``oss.localroot`` and ``oss.space`` paths.
+    """
+
+    @property
+    def config(self) -> Optional[str]:
+        return self[1:] if self.startswith("@") else None
+
+
+@cli_domain(name="MOUNTSTAT")
+class MountStat(enum.Enum):
+    max = enum.auto()
+    mean = enum.auto()
+    min = enum.auto()
+
+
+def inspection_timeout(interval: float) -> float:
+    """Time for which the inspection of mounts may delay each report"""
+    return min(interval / 4, 2.0)
+
+
+@cli_call(name="pspace", cost=Cost.moderate, blocks=inspection_timeout)
+def space_utilization(
+    interval: float, mounts: MountPattern, stat: MountStat = MountStat.max
+) -> float:
+    """
+    Percentage of space used on the ``mounts``, reduced over mounts via ``stat``
+
+    The ``stat`` may be the ``max`` (the default), ``mean`` or ``min`` over all
+    mounts. For example, ``pspace(/data*)`` is the space used on the fullest
+    mount matching ``/data*``. Mounts that cannot be inspected are ignored.
+    """
+    return _reduce(interval, mounts, stat, space_percentage)
+
+
+@cli_call(name="pinodes", cost=Cost.moderate, blocks=inspection_timeout)
+def inode_utilization(
+    interval: float, mounts: MountPattern, stat: MountStat = MountStat.max
+) -> float:
+    """
+    Percentage of inodes used on the ``mounts``, reduced over mounts via ``stat``
+
+    The ``stat`` may be the ``max`` (the default), ``mean`` or ``min`` over all
+    mounts. Mounts without a fixed number of inodes are ignored.
+    """
+    return _reduce(interval, mounts, stat, inode_percentage)
+
+
+def _reduce(
+    interval: float,
+    mounts: MountPattern,
+    stat: MountStat,
+    percentage: "Callable[[os.statvfs_result], Optional[float]]",
+) -> float:
+    monitor = cached_monitor(interval)
+    results = monitor.statvfs(monitor.select(MountPattern(mounts)))
+    percentages = [
+        value for value in map(percentage, results.values()) if value is not None
+    ]
+    if not percentages:
+        return 0.0
+    elif stat is MountStat.max:
+        return max(percentages)
+    elif stat is MountStat.min:
+        return min(percentages)
+    return sum(percentages) / len(percentages)
+
+
+def space_percentage(result: os.statvfs_result) -> Optional[float]:
+    """Percentage of space used as reported by ``df``, if the mount has space"""
+    used = result.f_blocks - result.f_bfree
+    usable = used + result.f_bavail
+    return 100.0 * used / usable if result.f_blocks and usable else None
+
+
+def inode_percentage(result: os.statvfs_result) -> Optional[float]:
+    """Percentage of inodes used as reported by ``df -i``, if the mount has inodes"""
+    used = result.f_files - result.f_ffree
+    usable = used + result.f_favail
+    return 100.0 * used / usable if result.f_files and usable else None
+
+
+def cached_monitor(interval: float) -> "MountMonitor":
+    with MONITOR_LOCK:
+        try:
+            return MONITOR_CACHE[interval]
+        except KeyError:
+            monitor = MountMonitor(
+                ttl=interval / 2, timeout=inspection_timeout(interval)
+            )
+            MONITOR_CACHE[interval] = monitor
+            return monitor
+
+
+MONITOR_CACHE: "dict[float, MountMonitor]" = {}
+MONITOR_LOCK = threading.Lock()
+
+
+_OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+def read_mount_points() -> List[str]:
+    """Read the mount points of the system from ``/proc/self/mounts``"""
+    mount_points = []
+    with open(os.path.join(psutil.PROCFS_PATH, "self", "mounts")) as mounts:
+        for line in mounts:
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            # whitespace in paths is escaped as octal, e.g. "\040" for " "
+            mount_points.append(
+                _OCTAL_ESCAPE.sub(lambda match: chr(int(match[1], 8)), fields[1])
+            )
+    return mount_points
+
+
+def read_oss_paths(path: str) -> List[str]:
+    """
+    Read the ``oss.localroot`` and ``oss.space`` paths of an XRootD configuration
+
+    Space paths may end in ``*`` to select several directories or mounts.
+    """
+    paths = []
+    with open(path) as config:
+        for line in config:
+            words = line.split("#", 1)[0].split()
+            if len(words) >= 2 and words[0] == "oss.localroot":
+                paths.append(words[1])
+            elif len(words) >= 3 and words[0] == "oss.space":
+                paths.append(words[2])
+    return paths
+
+
+def mount_point_of(path: str, mount_points: List[str]) -> Optional[str]:
+    """Find the mount point that contains ``path`` without accessing ``path``"""
+    path = os.path.normpath(path)
+    containing = [
+        mount_point
+        for mount_point in mount_points
+        if path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+    ]
+    return max(containing, key=len, default=None)
+
+
+class MountMonitor:
+    """
+    Concurrent and timeout protected inspection of mounts
+
+    Each mount is inspected with ``os.statvfs`` by a pool of ``workers`` threads.
+    Results are reused for ``ttl`` seconds and each inspection is awaited
+    for at most ``timeout`` seconds. A mount whose inspection did not complete
+    in time is hung: it is not awaited or inspected again until it responds;
+    meanwhile, its previous result is used. Since there is at most one inspection
+    per mount and the worker of each hung mount is replaced,
+    hung mounts never hold up the inspection of other mounts.
+    """
+
+    def __init__(self, ttl: float, timeout: float, workers: int = 32):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._workers = _InspectionPool(workers)
+        self._lock = threading.Lock()
+        self._results: Dict[str, Tuple[float, os.statvfs_result]] = {}
+        self._pending: "Dict[str, concurrent.futures.Future[os.statvfs_result]]" = {}
+        self._hung: Set[str] = set()
+        self._selections: Dict[str, _Selection] = {}
+
+    def select(self, pattern: MountPattern) -> List[str]:
+        """Provide the mount points matching ``pattern``"""
+        now = time.monotonic()
+        with self._lock:
+            selection = self._selections.get(pattern)
+            if selection is None or selection.expires < now:
+                # release patterns that are not used anymore, e.g. after a reload
+                for expired in [
+                    key
+                    for key, cached in self._selections.items()
+                    if cached.expires < now
+                ]:
+                    del self._selections[expired]
+                # the mounts rarely change, so look for them only occasionally
+                selection = _Selection(
+                    now + max(self.ttl * 10, 60), self._select(pattern)
+                )
+                self._selections[pattern] = selection
+            return selection.mount_points
+
+    def _select(self, pattern: MountPattern) -> List[str]:
+        mount_points = read_mount_points()
+        if pattern.config is None:
+            return sorted(set(fnmatch.filter(mount_points, pattern)))
+        try:
+            oss_paths = read_oss_paths(pattern.config)
+        except OSError as err:
+            LOGGER.warning("cannot read XRootD configuration: %s", err)
+            return []
+        selected = set()
+        for path in oss_paths:
+            if path.endswith("*"):
+                matched = fnmatch.filter(mount_points, path)
+                if matched:
+                    selected.update(matched)
+                    continue
+                # the space is made of directories on some mount
+                path = os.path.dirname(path)
+            mount_point = mount_point_of(path, mount_points)
+            if mount_point is not None:
+                selected.add(mount_point)
+        return sorted(selected)
+
+    def statvfs(self, mount_points: List[str]) -> Dict[str, os.statvfs_result]:
+        """Inspect all ``mount_points`` concurrently, reusing recent results"""
+        now = time.monotonic()
+        with self._lock:
+            for mount_point in mount_points:
+                if mount_point in self._pending:
+                    continue
+                result = self._results.get(mount_point)
+                if result is None or result[0] < now:
+                    self._pending[mount_point] = self._workers.submit(mount_point)
+            waiting = [
+                self._pending[mount_point]
+                for mount_point in mount_points
+                if mount_point in self._pending and mount_point not in self._hung
+            ]
+        concurrent.futures.wait(waiting, timeout=self.timeout)
+        with self._lock:
+            expires = time.monotonic() + self.ttl
+            for mount_point in mount_points:
+                pending = self._pending.get(mount_point)
+                if pending is None:
+                    continue
+                if not pending.done():
+                    # inspections still queued behind others are merely late
+                    if pending.running() and mount_point not in self._hung:
+                        self._hung.add(mount_point)
+                        self._workers.grow()
+                        LOGGER.warning(
+                            "mount %r did not respond within %ss",
+                            mount_point,
+                            self.timeout,
+                        )
+                    continue
+                del self._pending[mount_point]
+                if mount_point in self._hung:
+                    self._hung.discard(mount_point)
+                    self._workers.shrink()
+                    LOGGER.warning("mount %r responds again", mount_point)
+                try:
+                    self._results[mount_point] = expires, pending.result()
+                except OSError as err:
+                    LOGGER.warning("cannot inspect mount %r: %s", mount_point, err)
+                    self._results.pop(mount_point, None)
+            return {
+                mount_point: self._results[mount_point][1]
+                for mount_point in mount_points
+                if mount_point in self._results
+            }
+
+
+class _InspectionPool:
+    """
+    Persistent daemon threads running ``os.statvfs`` for submitted mount points
+
+    Threads are started as needed up to ``workers``. Since a hung mount may never
+    return, its worker is replaced via :py:meth:`grow` and retired again via
+    :py:meth:`shrink` once the mount responds. Being daemons, workers stuck on
+    hung mounts do not prevent shutting down.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._threads = 0
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[str, concurrent.futures.Future]]]" = (
+            queue.Queue()
+        )
+
+    def submit(
+        self, mount_point: str
+    ) -> "concurrent.futures.Future[os.statvfs_result]":
+        """Inspect ``mount_point`` by the next idle worker"""
+        future: "concurrent.futures.Future[os.statvfs_result]" = (
+            concurrent.futures.Future()
+        )
+        self._queue.put((mount_point, future))
+        with self._lock:
+            if self._threads < self.workers:
+                self._start()
+        return future
+
+    def grow(self):
+        """Add a worker to replace one that is stuck"""
+        with self._lock:
+            self.workers += 1
+            self._start()
+
+    def shrink(self):
+        """Retire a worker once a stuck one is available again"""
+        with self._lock:
+            self.workers -= 1
+            if self._threads > self.workers:
+                self._threads -= 1
+                self._queue.put(None)
+
+    def _start(self):
+        self._threads += 1
+        threading.Thread(target=self._work, name="statvfs", daemon=True).start()
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            mount_point, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(os.statvfs(mount_point))
+            except Exception as err:
+                future.set_exception(err)
+
+
+class _Selection(NamedTuple):
+    expires: float
+    mount_points: List[str]
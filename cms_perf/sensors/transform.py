@@ -1,21 +1,21 @@
 import math
 
-from ..setup.cli_parser import cli_call
+from ..setup.cli_parser import Cost, Purity, cli_call
 
 
-@cli_call(name="max")
+@cli_call(name="max", cost=Cost.free, purity=Purity.constant)
 def maximum(a: float, b: float, *others: float) -> float:
     """The maximum value of all arguments"""
     return max(a, b, *others)
 
 
-@cli_call(name="min")
+@cli_call(name="min", cost=Cost.free, purity=Purity.constant)
 def minimum(a: float, b: float, *others: float) -> float:
     """The minimum value of all arguments"""
     return min(a, b, *others)
 
 
-@cli_call(name="relu")
+@cli_call(name="relu", cost=Cost.free, purity=Purity.constant)
 def just_relu(value: float, bias: float) -> float:
     """
     Reduce ``value`` by ``bias`` and truncate below 0, as ``max(value-bias, 0)``
@@ -23,7 +23,7 @@ def just_relu(value: float, bias: float) -> float:
     return max(value - bias, 0)
 
 
-@cli_call(name="prelu")
+@cli_call(name="prelu", cost=Cost.free, purity=Purity.constant)
 def normalized_relu(pct: float, bias: float) -> float:
     """
     Truncate ``pct`` below ``bias`` to 0 and normalize the result
@@ -36,7 +36,7 @@ def normalized_relu(pct: float, bias: float) -> float:
     return (pct - bias) * 100 / (100 - bias)
 
 
-@cli_call(name="erf")
+@cli_call(name="erf", cost=Cost.free, purity=Purity.constant)
 def just_erf(value: float) -> float:
     """
     The error function mapping -inf..inf to -1..1. See :py:func:`math.erf`
@@ -50,7 +50,7 @@ def just_erf(value: float) -> float:
 ERF2PCT_FACTOR = (100 - 0) / (math.erf(2) - math.erf(-2))
 
 
-@cli_call(name="psigmoid")
+@cli_call(name="psigmoid", cost=Cost.free, purity=Purity.constant)
 def normalized_erf(value: float) -> float:
     """
     A sigmoid boosting changes around 50 but compressing low/high values
@@ -2,50 +2,229 @@
 Sensors for resources used by XRootD processes
 """
 
-from typing import List
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import enum
+import fnmatch
+import mmap
+import os
+import threading
 import time
 
 import psutil
 
-from ..setup.cli_parser import cli_call
+from ..setup.cli_parser import Cost, Purity, cli_call, cli_domain
+from . import snapshot
 
 
-@cli_call(name="xrd.piowait")
-def xrd_piowait(interval: float) -> float:
-    """Percentage of time waiting for IO by all XRootD processes"""
-    tracker = cached_tracker(interval)
+@cli_domain(name="INSTANCE")
+class XrdInstance(str):
+    """
+    Name pattern of XRootD instances, or the path to the pidfile of an instance
+
+    Patterns are matched against the instance name given via ``-n`` to XRootD,
+    defaulting to ``anon``, and may use glob wildcards such as ``*``.
+    """
+
+    @property
+    def pidfile(self) -> Optional[str]:
+        return self if self.startswith("/") else None
+
+
+ALL_INSTANCES = XrdInstance("*")
+
+
+@cli_call(name="xrd.piowait", cost=Cost.moderate)
+def xrd_piowait(interval: float, instance: XrdInstance = ALL_INSTANCES) -> float:
+    """
+    Percentage of time waiting for IO by all XRootD processes
+
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    """
+    tracker = cached_tracker(interval, instance)
     return 100.0 * tracker.io_wait()
 
 
-@cli_call(name="xrd.nfds")
-def xrd_numfds(interval: float) -> float:
-    """Number of file descriptors by all XRootD processes"""
-    tracker = cached_tracker(interval)
+@cli_call(name="xrd.nfds", cost=Cost.moderate)
+def xrd_numfds(interval: float, instance: XrdInstance = ALL_INSTANCES) -> float:
+    """
+    Number of file descriptors by all XRootD processes
+
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    On Linux 6.2 and newer, counting takes the same time for any number of
+    file descriptors. Otherwise, the count of a process with many file descriptors
+    is updated only every few reports, one more per 10000 file descriptors.
+    """
+    tracker = cached_tracker(interval, instance)
     return tracker.num_fds()
 
 
-@cli_call(name="xrd.nthreads")
-def xrd_threads(interval: float) -> float:
-    """Number of threads by all XRootD processes"""
-    tracker = cached_tracker(interval)
+@cli_call(name="xrd.nthreads", cost=Cost.moderate)
+def xrd_threads(interval: float, instance: XrdInstance = ALL_INSTANCES) -> float:
+    """
+    Number of threads by all XRootD processes
+
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    """
+    tracker = cached_tracker(interval, instance)
     return tracker.num_threads()
 
 
-def cached_tracker(interval: float):
+@cli_call(name="xrd.pcpu", cost=Cost.moderate, purity=Purity.stateful)
+def xrd_pcpu(interval: float, instance: XrdInstance = ALL_INSTANCES) -> float:
+    """
+    Percentage of CPU cores used by all XRootD processes since the previous report
+
+    A value of 100 means XRootD used all cores of the system on its own.
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    """
+    tracker = cached_tracker(interval, instance)
+    sample_interval = min(interval / 4, 1)
+    # several expressions may use the same tracker in the same tick
+    cpu_usage = snapshot.SNAPSHOT.read(
+        f"xrd.cpu_usage {id(tracker)}", lambda: tracker.cpu_usage(sample_interval)
+    )
+    return 100.0 * cpu_usage / snapshot.SNAPSHOT.ncores
+
+
+@cli_domain(name="MEMLIMIT")
+class MemoryLimit(enum.Enum):
+    total = enum.auto()
+    cgroup = enum.auto()
+
+
+@cli_domain(name="MEMKIND")
+class MemoryKind(enum.Enum):
+    rss = enum.auto()
+    pss = enum.auto()
+
+
+@cli_call(name="xrd.pmem", cost=Cost.moderate)
+def xrd_pmem(
+    interval: float,
+    instance: XrdInstance = ALL_INSTANCES,
+    limit: MemoryLimit = MemoryLimit.total,
+    kind: MemoryKind = MemoryKind.rss,
+) -> float:
+    """
+    Percentage of memory used by all XRootD processes
+
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    ``limit`` is either ``total`` for the memory of the system or
+    ``cgroup`` for the memory limit of the XRootD cgroup, if it has one.
+    ``kind`` is either ``rss`` for the resident memory or ``pss`` to count
+    memory shared between processes only proportionally; ``pss`` is more
+    expensive to measure.
+    Trailing arguments may be omitted, as in ``xrd.pmem(data, cgroup)``.
+    """
+    tracker = cached_tracker(interval, instance)
+    memory_limit = (
+        tracker.memory_limit() if limit is MemoryLimit.cgroup else None
+    ) or snapshot.SNAPSHOT.memory_total
+    return 100.0 * tracker.memory_usage(kind) / memory_limit
+
+
+@cli_call(name="xrd.pactive", cost=Cost.moderate)
+def xrd_pactive(interval: float, instance: XrdInstance = ALL_INSTANCES) -> float:
+    """
+    Percentage of XRootD threads that are running or waiting for IO
+
+    Threads in the states ``R`` and ``D`` count as active.
+    If most threads are active, the worker pool of XRootD is saturated.
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    """
+    threads = _scan_threads(interval, instance)
+    return 100.0 * threads.active / threads.sampled if threads.sampled else 0.0
+
+
+@cli_domain(name="THREADSTAT")
+class ThreadStat(enum.Enum):
+    mean = enum.auto()
+    max = enum.auto()
+    pctl = enum.auto()
+
+
+@cli_call(name="xrd.ptcpu", cost=Cost.moderate, purity=Purity.stateful)
+def xrd_ptcpu(
+    interval: float,
+    instance: XrdInstance = ALL_INSTANCES,
+    stat: ThreadStat = ThreadStat.max,
+    *option: float,
+) -> float:
+    """
+    Percentage of a core used by individual XRootD threads since the previous scan
+
+    ``instance`` selects which XRootD instances to inspect; it defaults to all.
+    ``stat`` selects how the usage of individual threads is combined,
+    and may be one of ``mean``, ``max`` for the busiest thread or
+    ``pctl`` for a percentile of the threads, as in ``xrd.ptcpu(*, pctl, 99)``.
+    It defaults to ``max``; the percentile defaults to 90.
+    """
+    usage = _scan_threads(interval, instance).cpu_usage
+    if not usage:
+        return 0.0
+    elif stat is ThreadStat.mean:
+        return 100.0 * sum(usage) / len(usage)
+    elif stat is ThreadStat.max:
+        return 100.0 * max(usage)
+    else:  # ThreadStat.pctl
+        return 100.0 * snapshot.percentile(usage, option[0] if option else 90)
+
+
+def _scan_threads(interval: float, instance: XrdInstance) -> "ThreadScan":
+    tracker = cached_tracker(interval, instance)
+    # all thread sensors of the same tick share one scan
+    return snapshot.SNAPSHOT.read(
+        f"xrd.threads {id(tracker)}", lambda: tracker.scan_threads()
+    )
+
+
+def cached_tracker(interval: float, instance: str = ALL_INSTANCES):
     # how often the tracker scans for processes
     rescan_interval = max(
         60,
         int(min(interval * 10, 3600)) // 10 * 10,
     )
-    try:
-        return TRACKER_CACHE[rescan_interval]
-    except KeyError:
-        tracker = XrootdTracker(rescan_interval=rescan_interval)
-        TRACKER_CACHE[rescan_interval] = tracker
+    with CACHE_LOCK:
+        try:
+            tracker = TRACKER_CACHE[rescan_interval, instance]
+        except KeyError:
+            release_trackers()
+            tracker = XrootdTracker(
+                rescan_interval=rescan_interval,
+                instance=XrdInstance(instance),
+                discovery=cached_discovery(rescan_interval),
+            )
+            TRACKER_CACHE[rescan_interval, instance] = tracker
+        tracker.last_used = time.monotonic()
         return tracker
 
 
-TRACKER_CACHE: "dict[float, XrootdTracker]" = {}
+def release_trackers():
+    """Release trackers and discoveries not used for ten rescan intervals"""
+    now = time.monotonic()
+    with CACHE_LOCK:
+        for key, tracker in list(TRACKER_CACHE.items()):
+            if now - tracker.last_used > 10 * tracker.rescan_interval:
+                del TRACKER_CACHE[key]
+        in_use = {tracker.rescan_interval for tracker in TRACKER_CACHE.values()}
+        for rescan_interval in [key for key in DISCOVERY_CACHE if key not in in_use]:
+            del DISCOVERY_CACHE[rescan_interval]
+
+
+def cached_discovery(rescan_interval: float):
+    with CACHE_LOCK:
+        try:
+            return DISCOVERY_CACHE[rescan_interval]
+        except KeyError:
+            discovery = XrootdDiscovery(rescan_interval=rescan_interval)
+            DISCOVERY_CACHE[rescan_interval] = discovery
+            return discovery
+
+
+TRACKER_CACHE: "dict[tuple[float, str], XrootdTracker]" = {}
+DISCOVERY_CACHE: "dict[float, XrootdDiscovery]" = {}
+#: guard of the caches, which are used by concurrently evaluated fields
+CACHE_LOCK = threading.RLock()
 
 
 def is_alive(proc: psutil.Process) -> bool:
@@ -53,27 +232,365 @@ def is_alive(proc: psutil.Process) -> bool:
     return proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE
 
 
-class XrootdTracker:
+def instance_name(cmdline: List[str]) -> str:
+    """Get the name of an XRootD instance from its `cmdline`"""
+    # process titles may squash all arguments into one
+    args = [part for arg in cmdline for part in arg.split()]
+    for flag, value in zip(args[:-1], args[1:]):
+        if flag == "-n":
+            return value
+    return "anon"
+
+
+def read_pidfile(path: str) -> Optional[int]:
+    """Read the PID from the pidfile at `path` if it exists"""
+    try:
+        with open(path) as pidfile:
+            return int(pidfile.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+#: clock ticks per second as used by ``/proc/<pid>/stat``
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if psutil.LINUX else 100
+#: cgroup memory limits at or above this value mean there is no limit
+UNLIMITED = 2**62
+
+
+def _proc_path(proc: psutil.Process, name: str) -> str:
+    return os.path.join(psutil.PROCFS_PATH, str(proc.pid), name)
+
+
+def read_cpu_time(proc: psutil.Process) -> float:
+    """Read the CPU seconds used by `proc`, preferably from ``/proc/<pid>/stat``"""
+    if not psutil.LINUX:
+        times = proc.cpu_times()
+        return times.user + times.system
+    with open(_proc_path(proc, "stat"), "rb") as stat:
+        data = stat.read()
+    # the command name may contain spaces and parentheses, so skip past it
+    comm_end = data.rindex(b")") + 2
+    fields = data[comm_end:].split()
+    # utime and stime, the 14th and 15th field counting from the pid
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def read_rss(proc: psutil.Process) -> int:
+    """Read the resident memory of `proc` in bytes"""
+    if not psutil.LINUX:
+        return proc.memory_info().rss
+    with open(_proc_path(proc, "statm"), "rb") as statm:
+        return int(statm.read().split()[1]) * mmap.PAGESIZE
+
+
+def read_pss(proc: psutil.Process) -> int:
+    """Read the proportional memory of `proc` in bytes, or its resident memory"""
+    if not psutil.LINUX:
+        return proc.memory_info().rss
+    try:
+        with open(_proc_path(proc, "smaps_rollup"), "rb") as smaps:
+            for line in smaps:
+                if line.startswith(b"Pss:"):
+                    return int(line.split()[1]) * 1024
+    # kernels before 4.14 do not provide the rollup
+    except FileNotFoundError:
+        return proc.memory_full_info().pss  # type: ignore
+    return read_rss(proc)
+
+
+def _read_limit(path: str) -> Optional[int]:
+    try:
+        with open(path) as limit_file:
+            limit = limit_file.read().strip()
+    except OSError:
+        return None
+    if not limit.isdigit() or int(limit) >= UNLIMITED:
+        return None
+    return int(limit)
+
+
+def read_cgroup_limit(proc: psutil.Process) -> Optional[int]:
+    """Read the memory limit of the cgroup of `proc` in bytes, if it has one"""
+    try:
+        with open(_proc_path(proc, "cgroup")) as cgroups:
+            entries = [line.rstrip("\n").split(":", 2) for line in cgroups]
+    except OSError:
+        return None
+    for entry in entries:
+        if len(entry) != 3:
+            continue
+        _, controllers, path = entry
+        # cgroup v2 has a single hierarchy for all controllers
+        if not controllers:
+            hierarchy, limit_name = "fs/cgroup", "memory.max"
+        elif "memory" in controllers.split(","):
+            hierarchy, limit_name = "fs/cgroup/memory", "memory.limit_in_bytes"
+        else:
+            continue
+        # limits of parent cgroups apply as well
+        limits: List[int] = []
+        while True:
+            limit = _read_limit(
+                os.path.join(
+                    snapshot.SYSFS_PATH, hierarchy, path.lstrip("/"), limit_name
+                )
+            )
+            if limit is not None:
+                limits.append(limit)
+            if path in ("/", ""):
+                break
+            path = os.path.dirname(path)
+        if limits:
+            return min(limits)
+    return None
+
+
+class ThreadScan(NamedTuple):
+    """Threads of processes observed in one scan"""
+
+    #: number of threads of all processes
+    threads: int
+    #: number of threads that were inspected
+    sampled: int
+    #: number of inspected threads that are running or waiting for IO
+    active: int
+    #: CPU cores used by each thread inspected in the previous scan as well
+    cpu_usage: List[float]
+
+
+#: maximum number of threads inspected in one scan
+TASK_SCAN_BUDGET = 4096
+
+
+class TaskScanner:
+    """
+    Bulk reader of threads from ``/proc/<pid>/task/<tid>/stat``
+
+    Files are read into one reusable buffer, without creating file objects.
+    At most ``budget`` threads are inspected per scan; if there are more threads,
+    each scan continues where the previous one left off.
+    """
+
+    def __init__(self, budget: int = TASK_SCAN_BUDGET):
+        self.budget = budget
+        self._buffer = bytearray(1024)
+        self._offset = 0
+        # tid => (time of reading, CPU seconds) of the latest reading
+        self._cpu_times: Dict[int, Tuple[float, float]] = {}
+
+    def scan(self, procs: List[psutil.Process]) -> ThreadScan:
+        tasks: List[Tuple[str, int]] = []
+        for proc in procs:
+            task_dir = _proc_path(proc, "task")
+            try:
+                tids = os.listdir(task_dir)
+            except OSError:  # the process just exited
+                continue
+            # keep a stable order, so that partial scans visit all threads in turn
+            tasks.extend((task_dir, tid) for tid in sorted(map(int, tids)))
+        selected = tasks
+        if len(tasks) > self.budget:
+            start = self._offset % len(tasks)
+            end = start + self.budget
+            selected = tasks[start:end] + tasks[: max(end - len(tasks), 0)]
+            self._offset = end
+        active = 0
+        cpu_usage: List[float] = []
+        cpu_times = self._cpu_times
+        for task_dir, tid in selected:
+            now = time.monotonic()
+            try:
+                state, cpu_time = self._read_task(task_dir, tid)
+            except (OSError, ValueError, IndexError):  # the thread just exited
+                continue
+            active += state in b"RD"
+            previous = cpu_times.get(tid)
+            if previous is not None and now > previous[0]:
+                cpu_usage.append((cpu_time - previous[1]) / (now - previous[0]))
+            cpu_times[tid] = now, cpu_time
+        # forget threads that exited
+        if len(cpu_times) > len(tasks):
+            alive = {tid for _, tid in tasks}
+            for tid in [tid for tid in cpu_times if tid not in alive]:
+                del cpu_times[tid]
+        return ThreadScan(len(tasks), len(selected), active, cpu_usage)
+
+    def _read_task(self, task_dir: str, tid: int) -> Tuple[int, float]:
+        buffer = self._buffer
+        fd = os.open(os.path.join(task_dir, str(tid), "stat"), os.O_RDONLY)
+        try:
+            size = os.readv(fd, [buffer])
+        finally:
+            os.close(fd)
+        # the command name may contain spaces and parentheses, so skip past it
+        comm_end = buffer.rindex(b")", 0, size) + 2
+        fields = buffer[comm_end:size].split(None, 13)
+        # state, utime and stime, the 3rd, 14th and 15th field counting from the tid
+        return fields[0][0], (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+#: whether the size of ``/proc/<pid>/fd`` is its number of file descriptors,
+#: as with Linux 6.2 and newer, or :py:data:`None` if not detected yet
+FD_DIR_SIZE: Optional[bool] = None
+#: number of file descriptors listed per count on average, before reusing listings
+FD_LISTING_BUDGET = 10000
+
+
+def _detect_fd_dir_size(size: int, count: int, size_after: int):
+    global FD_DIR_SIZE
+    # file descriptors opened or closed meanwhile leave the result undecided
+    if size != size_after or count == 0:
+        return
+    FD_DIR_SIZE = size == count
+
+
+class FdCounter:
+    """
+    Counter of the open file descriptors of processes
+
+    Linux 6.2 and newer provide the number of file descriptors as the size
+    of ``/proc/<pid>/fd``, which takes the same time for any number.
+    Support for this is detected by comparing the size to a listing once.
+    Otherwise, listing takes time proportional to the number of file descriptors,
+    so a listing is reused for one more count per ``budget`` file descriptors.
+    Counting is thread-safe, as sensors sharing a counter may run concurrently.
+    """
+
+    def __init__(self, budget: int = FD_LISTING_BUDGET):
+        self.budget = budget
+        self._lock = threading.Lock()
+        # pid => (counts to reuse the listing for, number of file descriptors)
+        self._listings: Dict[int, Tuple[int, int]] = {}
+
+    def count(self, procs: List[psutil.Process]) -> int:
+        """Count the file descriptors of all ``procs``"""
+        total = 0
+        with self._lock:
+            for proc in procs:
+                try:
+                    total += self._count(proc)
+                except (FileNotFoundError, ProcessLookupError, psutil.NoSuchProcess):
+                    pass  # the process just exited
+            # forget processes that exited
+            if len(self._listings) > len(procs):
+                alive = {proc.pid for proc in procs}
+                for pid in [pid for pid in self._listings if pid not in alive]:
+                    del self._listings[pid]
+        return total
+
+    def _count(self, proc: psutil.Process) -> int:
+        if not psutil.LINUX:
+            return proc.num_fds()
+        path = _proc_path(proc, "fd")
+        try:
+            if FD_DIR_SIZE:
+                return os.stat(path).st_size
+            return self._list(proc.pid, path)
+        except PermissionError:
+            raise psutil.AccessDenied(proc.pid) from None
+
+    def _list(self, pid: int, path: str) -> int:
+        reuses, count = self._listings.get(pid, (0, 0))
+        if reuses > 0:
+            self._listings[pid] = reuses - 1, count
+            return count
+        size = os.stat(path).st_size if FD_DIR_SIZE is None else None
+        count = len(os.listdir(path))
+        # listing our own file descriptors opens one more
+        if size is not None and pid != os.getpid():
+            _detect_fd_dir_size(size, count, os.stat(path).st_size)
+        self._listings[pid] = count // self.budget, count
+        return count
+
+
+class XrootdDiscovery:
+    """
+    Shared scan for XRootD processes, grouped by instance
+
+    Every scan increments the :py:attr:`generation` of the discovery.
+    Trackers should request a rescan only for the generation they have
+    inspected, so that several trackers requiring a rescan share one scan.
+    """
+
     def __init__(self, rescan_interval: float):
         self.rescan_interval = rescan_interval
+        self.generation = 0
         self._next_scan = 0.0
+        self._instances: Dict[str, List[psutil.Process]] = {}
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() > self._next_scan
+
+    def refresh(self, generation: int):
+        """Rescan unless a newer scan than for `generation` is available"""
+        if generation >= self.generation or self.expired:
+            instances: Dict[str, List[psutil.Process]] = {}
+            for proc in psutil.process_iter(["name", "cmdline"]):
+                if proc.info["name"] == "xrootd" and is_alive(proc):
+                    name = instance_name(proc.info["cmdline"] or [])
+                    instances.setdefault(name, []).append(proc)
+            self._instances = instances
+            self._next_scan = time.monotonic() + self.rescan_interval
+            self.generation += 1
+
+    def select(self, instance: XrdInstance) -> List[psutil.Process]:
+        """Select the processes of the latest scan that belong to `instance`"""
+        pidfile = instance.pidfile
+        if pidfile is not None:
+            pid = read_pidfile(pidfile)
+            return [
+                proc
+                for procs in self._instances.values()
+                for proc in procs
+                if proc.pid == pid
+            ]
+        return [
+            proc
+            for name, procs in self._instances.items()
+            if fnmatch.fnmatchcase(name, instance)
+            for proc in procs
+        ]
+
+
+class XrootdTracker:
+    def __init__(
+        self,
+        rescan_interval: float,
+        instance: XrdInstance = ALL_INSTANCES,
+        discovery: Optional[XrootdDiscovery] = None,
+    ):
+        self.instance = instance
+        self.discovery = (
+            discovery if discovery is not None else XrootdDiscovery(rescan_interval)
+        )
+        self._generation = 0
+        #: time at which the tracker was last used by a sensor
+        self.last_used = time.monotonic()
         self._xrootd_procs: List[psutil.Process] = []
+        self._cpu_times: Optional[Tuple[float, Dict[int, float]]] = None
+        self._memory_limits: Dict[int, Optional[int]] = {}
+        self._task_scanner = TaskScanner()
+        self._fd_counter = FdCounter()
+
+    @property
+    def rescan_interval(self) -> float:
+        return self.discovery.rescan_interval
 
     @property
     def xrootds(self) -> List[psutil.Process]:
         if self._refresh_xrootds():
-            self._xrootd_procs = [
-                proc
-                for proc in psutil.process_iter()
-                if proc.name() == "xrootd" and is_alive(proc)
-            ]
-            self._next_scan = time.monotonic() + self.rescan_interval
+            self.discovery.refresh(self._generation)
+            self._generation = self.discovery.generation
+            self._xrootd_procs = self.discovery.select(self.instance)
+            self._memory_limits.clear()
         return self._xrootd_procs
 
     def _refresh_xrootds(self) -> bool:
+        # an instance without processes is looked for only with each regular rescan
         return (
-            not self._xrootd_procs
-            or time.monotonic() > self._next_scan
+            self._generation != self.discovery.generation
+            or self.discovery.expired
             or not all(is_alive(proc) for proc in self._xrootd_procs)
         )
 
@@ -84,7 +601,63 @@ class XrootdTracker:
         )
 
     def num_fds(self) -> int:
-        return sum(xrd.num_fds() for xrd in self.xrootds)
+        return self._fd_counter.count(self.xrootds)
 
     def num_threads(self) -> int:
         return sum(xrd.num_threads() for xrd in self.xrootds)
+
+    def cpu_usage(self, sample_interval: float) -> float:
+        """
+        The CPU cores used since the previous measurement, e.g. 2.0 for two cores
+
+        Without a previous measurement, the first one samples for ``sample_interval``.
+        """
+        if self._cpu_times is None:
+            self._cpu_times = time.monotonic(), self._read_cpu_times()
+            time.sleep(sample_interval)
+        previous_time, previous = self._cpu_times
+        now, current = time.monotonic(), self._read_cpu_times()
+        self._cpu_times = now, current
+        # new processes are accounted for starting with the next measurement
+        used = sum(
+            cpu_time - previous[pid]
+            for pid, cpu_time in current.items()
+            if pid in previous
+        )
+        return used / (now - previous_time) if now > previous_time else 0.0
+
+    def _read_cpu_times(self) -> Dict[int, float]:
+        cpu_times: Dict[int, float] = {}
+        for xrd in self.xrootds:
+            try:
+                cpu_times[xrd.pid] = read_cpu_time(xrd)
+            except (OSError, psutil.Error):  # the process just exited
+                pass
+        return cpu_times
+
+    def memory_usage(self, kind: MemoryKind = MemoryKind.rss) -> int:
+        """The memory used by all processes in bytes"""
+        read_memory = read_pss if kind is MemoryKind.pss else read_rss
+        used = 0
+        for xrd in self.xrootds:
+            try:
+                used += read_memory(xrd)
+            except (OSError, psutil.Error):  # the process just exited
+                pass
+        return used
+
+    def memory_limit(self) -> Optional[int]:
+        """The lowest memory limit of the cgroups of all processes, if any"""
+        limits: List[Optional[int]] = []
+        for xrd in self.xrootds:
+            # the limits may be cleared by a concurrent rescan at any time
+            try:
+                limit = self._memory_limits[xrd.pid]
+            except KeyError:
+                limit = self._memory_limits[xrd.pid] = read_cgroup_limit(xrd)
+            limits.append(limit)
+        return min((limit for limit in limits if limit is not None), default=None)
+
+    def scan_threads(self) -> ThreadScan:
+        """Inspect the threads of all processes"""
+        return self._task_scanner.scan(self.xrootds)
@@ -0,0 +1,191 @@
+"""
+Sensors fed by the XRootD summary monitoring stream
+
+XRootD periodically reports its internal statistics as XML via UDP
+when configured with the ``xrd.report`` directive.
+The sensors listen for these reports on a local UDP port,
+which must match the destination of the directive::
+
+    xrd.report 127.0.0.1:9931 every 30s link sched
+
+Reports are digested by a background thread as they arrive,
+so reading a sensor only looks up the latest value.
+"""
+
+from typing import Dict, NamedTuple, Tuple
+import socket
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from ..setup.cli_parser import cli_call
+
+#: UDP port to listen on if none is given explicitly
+DEFAULT_PORT = 9931
+
+
+@cli_call(name="xrd.nconn")
+def xrd_nconn(port: float = DEFAULT_PORT) -> float:
+    """
+    Number of client connections of all XRootD processes
+
+    ``port`` is the local UDP port targeted by ``xrd.report``; it defaults to 9931.
+    Requires the ``link`` summary.
+    """
+    return cached_listener(port).values.get("nconn", 0.0)
+
+
+@cli_call(name="xrd.pthreads")
+def xrd_pthreads(port: float = DEFAULT_PORT) -> float:
+    """
+    Percentage of busy scheduler threads of all XRootD processes
+
+    ``port`` is the local UDP port targeted by ``xrd.report``; it defaults to 9931.
+    Requires the ``sched`` summary.
+    """
+    return cached_listener(port).values.get("pthreads", 0.0)
+
+
+@cli_call(name="xrd.bytesout")
+def xrd_bytesout(port: float = DEFAULT_PORT) -> float:
+    """
+    Bytes per second sent by all XRootD processes
+
+    ``port`` is the local UDP port targeted by ``xrd.report``; it defaults to 9931.
+    Requires the ``link`` summary.
+    """
+    return cached_listener(port).values.get("bytesout", 0.0)
+
+
+def cached_listener(port: float) -> "SummaryListener":
+    port = int(port)
+    # fields are evaluated concurrently but only one listener may bind the port
+    with LISTENER_LOCK:
+        try:
+            return LISTENER_CACHE[port]
+        except KeyError:
+            listener = SummaryListener(port=port)
+            LISTENER_CACHE[port] = listener
+            return listener
+
+
+LISTENER_CACHE: "dict[int, SummaryListener]" = {}
+LISTENER_LOCK = threading.Lock()
+
+
+class Summary(NamedTuple):
+    """The digested summary of a single XRootD process"""
+
+    #: monotonic time at which the summary was received
+    received: float
+    #: time of day at which the summary was sent
+    tod: float
+    #: flattened statistics such as ``{"link.num": 12, "sched.idle": 4, ...}``
+    stats: Dict[str, float]
+    #: rate of bytes sent since the previous summary
+    bytes_out: float
+
+
+def flatten_stats(element: ET.Element, prefix: str = "") -> Dict[str, float]:
+    """Flatten the numerical statistics of an XML ``element`` to a ``dict``"""
+    stats: Dict[str, float] = {}
+    for child in element:
+        name = child.get("id", child.tag) if child.tag == "stats" else child.tag
+        key = f"{prefix}.{name}" if prefix else name
+        if len(child):
+            stats.update(flatten_stats(child, key))
+        elif child.text is not None:
+            try:
+                stats[key] = float(child.text)
+            except ValueError:
+                pass
+    return stats
+
+
+class SummaryListener:
+    """
+    Listener for the ``xrd.report`` summaries sent to a local UDP ``port``
+
+    The latest values aggregated over all XRootD processes are available
+    via the ``values`` mapping. Summaries of processes that have not reported
+    for ``expire`` seconds are discarded, even if no process reports anymore.
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", expire: float = 600):
+        self.expire = expire
+        self._values: Dict[str, float] = {}
+        self._summaries: Dict[Tuple[str, str, str], Summary] = {}
+        self._lock = threading.Lock()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self.address: Tuple[str, int] = self._socket.getsockname()
+        self._thread = threading.Thread(
+            target=self._receive_forever,
+            name=f"xrd.report listener {self.address}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    @property
+    def values(self) -> Dict[str, float]:
+        """The latest values aggregated over all XRootD processes"""
+        now = time.monotonic()
+        with self._lock:
+            if any(
+                now - summary.received > self.expire
+                for summary in self._summaries.values()
+            ):
+                self._aggregate(now)
+            return self._values
+
+    def close(self):
+        """Stop listening for new summaries"""
+        self._socket.close()
+
+    def _receive_forever(self):
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except OSError:  # socket was closed
+                return
+            try:
+                self.digest(data)
+            except ET.ParseError:
+                continue
+
+    def digest(self, data: bytes):
+        """Digest the raw XML ``data`` of a single summary"""
+        root = ET.fromstring(data)
+        if root.tag != "statistics" or root.get("pgm", "xrootd") != "xrootd":
+            return
+        now = time.monotonic()
+        source = (root.get("src", ""), root.get("ins", ""), root.get("pid", ""))
+        tod = float(root.get("tod", time.time()))
+        stats = flatten_stats(root)
+        bytes_out = 0.0
+        with self._lock:
+            previous = self._summaries.get(source)
+            if previous is not None and "link.out" in stats:
+                elapsed = tod - previous.tod
+                sent = stats["link.out"] - previous.stats.get("link.out", 0.0)
+                # an old or restarted process may appear to have negative rates
+                if elapsed > 0 and sent >= 0:
+                    bytes_out = sent / elapsed
+                elif elapsed <= 0:
+                    bytes_out = previous.bytes_out
+            self._summaries[source] = Summary(now, tod, stats, bytes_out)
+            self._aggregate(now)
+
+    def _aggregate(self, now: float):
+        for source, summary in list(self._summaries.items()):
+            if now - summary.received > self.expire:
+                del self._summaries[source]
+        summaries = self._summaries.values()
+        threads = sum(summary.stats.get("sched.threads", 0) for summary in summaries)
+        idle = sum(summary.stats.get("sched.idle", 0) for summary in summaries)
+        # replace all values at once so readers never see partial updates
+        self._values = {
+            "nconn": sum(summary.stats.get("link.num", 0) for summary in summaries),
+            "pthreads": 100.0 * (threads - idle) / threads if threads else 0.0,
+            "bytesout": sum(summary.bytes_out for summary in summaries),
+        }
@@ -1,10 +1,17 @@
+from typing import Callable, List, Optional, Sequence, Tuple
 import argparse
 
 from ..setup import cli_parser
 from .. import __version__ as lib_version
+from .. import budget, export
 
 # ensure sensors are loaded
 from ..sensors import sensor, transform, xrd_load  # noqa  # pyright: ignore
+from ..sensors import xrd_report, storage, background  # noqa
+from ..sensors import network, paging, self_usage  # noqa
+
+#: the options describing sensor expressions, in order of reporting
+SENSOR_FIELDS = ("prunq", "pcpu", "pmem", "ppag", "pio")
 
 
 class ConfigArgumentParser(argparse.ArgumentParser):
@@ -26,16 +33,6 @@ class ConfigArgumentParser(argparse.ArgumentParser):
         return [key, value] if value else [key]
 
 
-INTERVAL_UNITS = {
-    "": 1,
-    "s": 1,
-    "m": 60,
-    "h": 60 * 60,
-    "d": 60 * 60 * 24,
-    "w": 60 * 60 * 24 * 7,
-}
-
-
 def duration(literal: str) -> float:
     """
     Parse an XRootD duration literal as a float representing seconds
@@ -44,18 +41,19 @@ def duration(literal: str) -> float:
     and an optional unit ``s`` (for seconds), ``m`` (for minutes),
     and so on. If no unit is given, ``s`` is assumed.
     """
-    literal = literal.strip()
-    value, unit = (
-        (literal, "") if literal[-1].isdigit() else (literal[:-1], literal[-1])
-    )
     try:
-        scale = INTERVAL_UNITS[unit]
-    except KeyError:
-        expected = ", ".join(map(repr, INTERVAL_UNITS))
-        raise argparse.ArgumentTypeError(
-            f"{unit!r} is not a valid time unit - expected one of {expected}"
-        ) from None
-    return float(value) * scale
+        return cli_parser.Duration(literal).seconds
+    except ValueError as err:
+        raise argparse.ArgumentTypeError(str(err)) from None
+
+
+def sampling_period(literal: str) -> Tuple[str, float]:
+    """Parse a ``name=duration`` literal for sampling a sensor every ``duration``"""
+    name, _, period = (part.strip() for part in literal.partition("="))
+    known = {call_info.cli_name for call_info in cli_parser.KNOWN_CALLABLES.values()}
+    if name not in known:
+        raise argparse.ArgumentTypeError(f"{name!r} is not a known sensor")
+    return name, duration(period)
 
 
 CLI = ConfigArgumentParser(
@@ -68,7 +66,7 @@ CLI = ConfigArgumentParser(
         "paging load, and "
         "network utilization. "
         "The paging load exists for historical reasons; "
-        "it cannot be reliably computed."
+        "it is 0 by default but may be set to the memory pressure via ppaging. "
         "Time can be suffixed with s, m, h, d or w."
     ),
     fromfile_prefix_chars="@",
@@ -84,12 +82,112 @@ CLI.add_argument(
     help="Interval between output [default: %(default)s]",
     type=duration,
 )
+CLI.add_argument(
+    "--min-interval",
+    default=None,
+    help=(
+        "Shortest interval to use while load changes rapidly [default: the interval]"
+    ),
+    type=duration,
+)
+CLI.add_argument(
+    "--max-interval",
+    default=None,
+    help="Longest interval to use while load is stable [default: the interval]",
+    type=duration,
+)
 CLI.add_argument(
     "--rampup",
     default="0s",
     help="Duration in which usage is dampened [default: %(default)s]",
     type=duration,
 )
+CLI.add_argument(
+    "--deadline",
+    default=None,
+    help=(
+        "Maximum time for sensors to provide a value before their last value is used"
+        " [default: half the interval, at least 1s]"
+    ),
+    type=duration,
+)
+CLI.add_argument(
+    "--max-stale",
+    default=3,
+    help=(
+        "Number of consecutive missed deadlines after which a sensor reports 100"
+        " [default: %(default)s]"
+    ),
+    type=int,
+)
+CLI.add_argument(
+    "--every",
+    action="append",
+    default=[],
+    help=(
+        "Sample a sensor in the background every duration, as in nsockets=5m;"
+        " may be used multiple times"
+    ),
+    metavar="SENSOR=DURATION",
+    type=sampling_period,
+)
+CLI.add_argument(
+    "--budget",
+    default=None,
+    help=(
+        "Percentage of one CPU core that cms_perf may use, as in 0.5;"
+        " expensive sensors are evaluated less often while it is exceeded"
+    ),
+    metavar="PERCENT",
+    type=float,
+)
+CLI.add_argument(
+    "--check",
+    action="store_true",
+    help=(
+        "Instead of reporting, check the expressions and show their estimated"
+        " cost per tick, warning if they may exceed the interval or budget"
+    ),
+)
+CLI.add_argument(
+    "--explain",
+    default=0,
+    help=(
+        "Instead of reporting, evaluate the expressions this many times and show"
+        " the value, time and calls of every subexpression"
+    ),
+    metavar="TICKS",
+    type=int,
+)
+CLI.add_argument(
+    "--export",
+    default=None,
+    help=(
+        "Publish the latest values to a memory-mapped file for local agents,"
+        " such as /run/cms_perf/values"
+    ),
+    metavar="PATH",
+)
+CLI.add_argument(
+    "--state",
+    default=None,
+    help=(
+        "Checkpoint the sensor state to a file to resume after a restart"
+        " without a full rampup, such as /run/cms_perf/state"
+    ),
+    metavar="PATH",
+)
+CLI.add_argument(
+    "--sink",
+    action="append",
+    default=[],
+    help=(
+        "Send reports to another consumer, as in json:PATH,"
+        " graphite+udp://HOST:PORT/PREFIX, graphite+tcp://HOST:PORT/PREFIX or"
+        " openmetrics://HOST:PORT; may be used multiple times"
+    ),
+    metavar="SPEC",
+)
 CLI.add_argument(
     "--prunq",
     default="prunq",
@@ -125,3 +223,43 @@ CLI.add_argument(
     help="cms.sched directive to report total load and maxload on stderr",
     type=str,
 )
+
+
+def compile_options(
+    options: argparse.Namespace,
+    fields: Sequence[str] = SENSOR_FIELDS,
+    interval: Optional[float] = None,
+) -> List[Callable[[], float]]:
+    """
+    Compile the sensor expressions of parsed ``options`` for all ``fields``
+
+    If ``interval`` is given, it replaces the interval of the ``options``.
+    """
+    interval = interval if interval is not None else options.interval
+    return cli_parser.compile_sensors(
+        interval,
+        *(getattr(options, field) for field in fields),
+        decorate=call_decorator(options, interval),
+    )
+
+
+def call_decorator(
+    options: argparse.Namespace, interval: Optional[float] = None
+) -> Callable[[cli_parser.CallInfo], cli_parser.CLICall]:
+    """Create the decorator of CLI calls as configured by parsed ``options``"""
+    periods = dict(options.every)
+    interval = interval if interval is not None else options.interval
+
+    def decorate(call_info: cli_parser.CallInfo) -> cli_parser.CLICall:
+        call = call_info.call
+        if call_info.cli_name in periods:
+            call = background.sample_calls(
+                call_info, periods[call_info.cli_name], interval
+            )
+        if options.budget is not None:
+            call = budget.throttle_calls(call_info, call)
+        if options.export is not None:
+            call = export.record_calls(call_info, call)
+        return call
+
+    return decorate
@@ -11,9 +11,12 @@ The math part is an explicitly defined infix parser rule.
 The parts for both calls and constants are automatically generated from Python objects.
 """
 
-from typing import TypeVar, Optional, Dict, NamedTuple, List, Callable, Type
+from typing import TypeVar, Optional, Dict, NamedTuple, List, Callable, Type, Tuple
+import ast
 import inspect
 import enum
+import functools
+import sys
 
 import pyparsing as pp
 
@@ -58,6 +61,9 @@ def parse(code: str) -> str:
         raise SyntaxError(
             str(pe), ("<cms_perf.cli_parser code>", pe.col, pe.loc, code)
         ) from None
+    finally:
+        # the packrat cache holds partial results of this code only
+        pp.ParserElement.resetCache()
 
 
 # Sensor Plugins
@@ -67,11 +73,66 @@ CLICall = Callable[..., float]
 S = TypeVar("S", bound=CLICall)
 
 
+class Lazy(NamedTuple):
+    """An expression passed to a CLI call without evaluating it first"""
+
+    #: the transpiled source code of the expression
+    source: str
+    #: evaluate the expression
+    call: Callable[[], float]
+
+
+class Cost(enum.IntEnum):
+    """Rough CPU cost of evaluating a CLI call once"""
+
+    #: arithmetic on the arguments only
+    free = 0
+    #: reading a few small files, e.g. from ``/proc``
+    cheap = 1
+    #: inspecting a few processes or mounts
+    moderate = 2
+    #: scanning all processes or sockets of the system
+    expensive = 3
+
+    @property
+    def cpu_time(self) -> float:
+        """Estimated CPU seconds of evaluating a call"""
+        return _CPU_TIMES[self]
+
+
+_CPU_TIMES = {
+    Cost.free: 0.000001,
+    Cost.cheap: 0.0001,
+    Cost.moderate: 0.002,
+    Cost.expensive: 0.2,
+}
+
+
+class Purity(enum.Enum):
+    """How the value of a CLI call depends on its arguments and previous calls"""
+
+    #: the value depends only on the arguments, as for ``ncores`` or ``max``
+    constant = enum.auto()
+    #: the value reflects the current state of the system
+    tick = enum.auto()
+    #: the value depends on previous calls, e.g. as a rate since the previous one
+    stateful = enum.auto()
+
+
+def _no_blocking(interval: float) -> float:
+    return 0.0
+
+
 class CallInfo(NamedTuple):
     """Information for running `cli_name(...)` via `call`"""
 
     call: Callable[..., float]
     cli_name: str
+    #: CPU cost of each call
+    cost: Cost = Cost.cheap
+    #: seconds each call blocks for sampling, depending on the interval
+    blocks: Callable[[float], float] = _no_blocking
+    purity: Purity = Purity.tick
 
 
 class DomainInfo(NamedTuple):
@@ -146,23 +207,32 @@ def _compile_cli_call(
         transpilers.append(default_call)
     # if parameters may be passed, allow call with parametrised arguments
     if len(parameters):
-        argument_parsers: "list[pp.ParserElement]" = []
-        for parameter in parameters.values():
-            # individual parameter
-            if parameter.kind != inspect.Parameter.VAR_POSITIONAL:
-                if argument_parsers:
-                    argument_parsers.append(pp.Suppress(","))
-                argument_parsers.append(_compile_parameter(parameter))
+        # compile back to front, since trailing parameters with defaults
+        # and variadic parameters are optional
+        arguments_parser: Optional[pp.ParserElement] = None
+        for index, parameter in reversed(list(enumerate(parameters.values()))):
             # variadic parameter, compile to a list of parameters
-            else:
+            if parameter.kind == inspect.Parameter.VAR_POSITIONAL:
                 param_parser = pp.delimitedList(_compile_parameter(parameter))
-                if argument_parsers:
-                    argument_parsers.append(
-                        pp.Optional(pp.Suppress(",") - param_parser)
-                    )
-                else:
-                    argument_parsers.append(pp.Optional(param_parser))
-        signature = pp.And((LEFT_PAR, *argument_parsers, RIGHT_PAR))
+                optional = True
+            # individual parameter
+            else:
+                param_parser = _compile_parameter(parameter)
+                optional = parameter.default is not inspect.Parameter.empty
+            if arguments_parser is not None:
+                param_parser = param_parser + arguments_parser
+            if index == 0:
+                arguments_parser = (
+                    pp.Optional(param_parser)
+                    if parameter.kind == inspect.Parameter.VAR_POSITIONAL
+                    else param_parser
+                )
+            elif optional:
+                arguments_parser = pp.Optional(pp.Suppress(",") - param_parser)
+            else:
+                arguments_parser = pp.Suppress(",") + param_parser
+        assert arguments_parser is not None
+        signature = pp.And((LEFT_PAR, arguments_parser, RIGHT_PAR))
         parameter_call = pp.Suppress(call_name).setName(f'"{call_name}"') + signature
 
         @parameter_call.setParseAction  # type: ignore
@@ -175,27 +245,43 @@ def _compile_cli_call(
 
 
 # registration decorators
-def cli_call(name: Optional[str] = None) -> Callable[[S], S]:
+def cli_call(
+    name: Optional[str] = None,
+    cost: Cost = Cost.cheap,
+    blocks: Callable[[float], float] = _no_blocking,
+    purity: Purity = Purity.tick,
+) -> Callable[[S], S]:
     """
     Register a sensor or transformation for the CLI with its own name or ``name``
+
+    The ``cost`` and the seconds a call ``blocks`` for sampling in each tick,
+    given the interval, estimate the time each tick takes.
+    Calls of ``constant`` ``purity`` with constant arguments are evaluated
+    only once when compiling an expression.
     """
     assert not callable(name), "cli_call must be called before decorating"
 
     def register(call: S) -> S:
-        _register_cli_callable(call, name)
+        _register_cli_callable(call, name, cost, blocks, purity)
         return call
 
     return register
 
 
-def _register_cli_callable(call: S, cli_name: Optional[str]) -> S:
+def _register_cli_callable(
+    call: S,
+    cli_name: Optional[str],
+    cost: Cost = Cost.cheap,
+    blocks: Callable[[float], float] = _no_blocking,
+    purity: Purity = Purity.tick,
+) -> S:
     cli_name = cli_name if cli_name is not None else call.__name__  # type: ignore
     assert isinstance(cli_name, str)
     source_name = cli_name.replace(".", "_")
     assert (
         source_name not in KNOWN_CALLABLES
     ), f"cannot re-register CLI callable {source_name}"
-    KNOWN_CALLABLES[source_name] = CallInfo(call, cli_name)
+    KNOWN_CALLABLES[source_name] = CallInfo(call, cli_name, cost, blocks, purity)
     _extend_generated(*_compile_cli_call(cli_name, source_name, call))
     return call
 
@@ -206,64 +292,350 @@ TP = TypeVar("TP", bound=type)
 def cli_domain(name: Optional[str] = None):
     """
     Register a value domain for the CLI displayed with its own name or ``name``
+
+    An :py:class:`~enum.Enum` domain allows the names of its members as literals.
+    A :py:class:`str` domain allows any literal without whitespace, parentheses
+    or commas, such as a name, glob pattern, or path.
     """
 
     def register(domain: TP) -> TP:
         if issubclass(domain, enum.Enum):
             _register_enum(domain, name)
+        elif issubclass(domain, str):
+            _register_literal(domain, name)
         else:
-            raise TypeError(f"Can only register Enum domain, not {domain}")
+            raise TypeError(f"Can only register Enum or str domain, not {domain}")
         return domain  # type: ignore
 
     return register
 
 
-def _register_enum(domain: Type[enum.Enum], cli_name: Optional[str]):
+def _register_domain(
+    domain: type, cli_name: Optional[str], parser: pp.ParserElement
+) -> str:
     cli_name = cli_name if cli_name is not None else domain.__name__
     source_name = cli_name.replace(".", "_")
     assert source_name not in KNOWN_DOMAINS, (
         f"cannot re-register CLI domain {source_name}"
         f" as {domain.__module__}:{domain.__qualname__}"
     )
+    KNOWN_DOMAINS_MAP[domain] = KNOWN_DOMAINS[source_name] = DomainInfo(
+        domain, cli_name, parser
+    )
+    return source_name
+
+
+def _register_enum(domain: Type[enum.Enum], cli_name: Optional[str]):
     cases = sorted(domain.__members__, reverse=True)
     match_case = pp.MatchFirst(tuple(map(pp.Keyword, cases))).setName(
         " | ".join(f'"{case}"' for case in cases)
     )
+    source_name = _register_domain(domain, cli_name, match_case)
 
     @match_case.setParseAction  # type: ignore
     def transpile_enum_case(result: pp.ParseResults) -> str:  # type: ignore[reportUnusedFunction]
         case: str = result[0]  # type: ignore
         return f"{source_name}['{case}']"
 
-    KNOWN_DOMAINS_MAP[domain] = KNOWN_DOMAINS[source_name] = DomainInfo(
-        domain, cli_name, match_case
-    )
+
+def _register_literal(domain: Type[str], cli_name: Optional[str]):
+    match_literal = pp.Regex(r"[^\s(),]+").setName("LITERAL")
+    source_name = _register_domain(domain, cli_name, match_literal)
+
+    @match_literal.setParseAction  # type: ignore
+    def transpile_literal(result: pp.ParseResults) -> str:  # type: ignore[reportUnusedFunction]
+        literal: str = result[0]  # type: ignore
+        domain(literal)  # validate the literal before it is used
+        return f"{source_name}({literal!r})"
+
+
+# special domains for the CLI language itself
+INTERVAL_UNITS = {
+    "": 1,
+    "s": 1,
+    "m": 60,
+    "h": 60 * 60,
+    "d": 60 * 60 * 24,
+    "w": 60 * 60 * 24 * 7,
+}
+
+
+@cli_domain(name="DURATION")
+class Duration(str):
+    """
+    An XRootD duration literal, providing the duration in ``seconds``
+
+    A literal consists of a float literal, e.g. ``12`` or ``17.5``,
+    and an optional unit ``s`` (for seconds), ``m`` (for minutes),
+    and so on. If no unit is given, ``s`` is assumed.
+    """
+
+    seconds: float
+
+    def __new__(cls, literal: str) -> "Duration":
+        self = super().__new__(cls, literal.strip())
+        value, unit = (self, "") if self[-1:].isdigit() else (self[:-1], self[-1:])
+        try:
+            scale = INTERVAL_UNITS[unit]
+        except KeyError:
+            expected = ", ".join(map(repr, INTERVAL_UNITS))
+            raise ValueError(
+                f"{unit!r} is not a valid time unit - expected one of {expected}"
+            ) from None
+        self.seconds = float(value) * scale
+        return self
+
+
+LAZY_EXPRESSION = EXPRESSION.copy().setName("TERM")
+
+
+@LAZY_EXPRESSION.addParseAction  # type: ignore
+def transpile_lazy(result: pp.ParseResults) -> str:
+    """Capture an expression as a ``Lazy`` instead of evaluating it"""
+    source: str = result[0]  # type: ignore
+    return f"LAZY({source!r}, lambda: {source})"
+
+
+_register_domain(Lazy, "LAZY", LAZY_EXPRESSION)
+
+
+# Python 3.8 parses all literals as ast.Constant, earlier versions as ast.Num/ast.Str
+if sys.version_info >= (3, 8):
+    LITERAL_NODES: Tuple[Type[ast.expr], ...] = (ast.Constant,)
+else:
+    LITERAL_NODES = (ast.Constant, ast.Num, ast.Str)
+
+
+def literal_value(node: ast.AST) -> object:
+    """The value of a literal node of a transpiled expression, such as ``12``"""
+    assert isinstance(node, LITERAL_NODES), f"not a literal: {ast.dump(node)}"
+    if isinstance(node, ast.Constant):
+        return node.value
+    return node.n if isinstance(node, ast.Num) else node.s  # type: ignore
 
 
 # digesting of CLI information
+# reparsing the same source provides the same factory, e.g. on config reloads
+@functools.lru_cache(maxsize=64)
 def parse_sensor(
     source: str, name: Optional[str] = None
 ) -> Callable[..., Callable[[], float]]:
-    py_source = parse(source)
-    name = (
-        name
-        if name is not None
-        else f"<cms_perf.cli_parser code {source!r} => {py_source!r}>"
-    )
-    pp.ParserElement.resetCache()  # free parser cache
+    # the interpreter keeps the filename of compiled code for good,
+    # so a distinct name per source would accumulate over config reloads
+    name = name if name is not None else "<cms_perf.cli_parser code>"
+    factory = build_factory(*optimize(parse(source)), filename=name)
+    # keep the CLI source to inspect the expression later on
+    factory.cli_source = source
+    return factory
+
+
+def optimize(py_source: str) -> Tuple[ast.expr, List[ast.expr]]:
+    """
+    Transform a transpiled expression as it is evaluated
+
+    Provides the expression with constants hoisted as ``_const0``, ``_const1``, ...
+    and short-circuited arguments, as well as the hoisted constants.
+    """
+    hoister = _ConstantHoister()
+    body = hoister.visit(ast.parse(py_source, mode="eval").body)
+    return _ShortCircuit().visit_clamped(body), hoister.constants
+
+
+def build_factory(
+    body: ast.expr,
+    constants: List[ast.expr],
+    filename: str,
+    **helpers: Callable[..., float],
+) -> Callable[..., Callable[[], float]]:
+    """
+    Compile an expression and constants of :py:func:`optimize` to a sensor factory
+
+    Any ``helpers`` are available to the expression in addition to the
+    CLI callables and domains.
+    """
     free_variables = ", ".join(KNOWN_CALLABLES.keys() | KNOWN_DOMAINS.keys())
-    code = compile(
-        f"lambda interval, {free_variables}: lambda: {py_source}",
-        filename=name,
+    # constants are evaluated once per compilation, outside of the sensor
+    names = ", ".join(f"_const{index}" for index in range(len(constants)))
+    module = ast.parse(
+        f"lambda interval, {free_variables}: (lambda {names}: lambda: 0)({names})",
         mode="eval",
     )
-    return eval(code, {}, {})
+    hoisting = module.body.body  # type: ignore
+    hoisting.func.body.body = body
+    hoisting.args = constants
+    code = compile(ast.fix_missing_locations(module), filename=filename, mode="eval")
+    return eval(code, {**SHORT_CIRCUITS, **helpers}, {})
+
+
+def is_constant(node: ast.AST) -> bool:
+    """Check whether a node of a transpiled expression is the same in every tick"""
+    if isinstance(node, LITERAL_NODES):
+        return True
+    elif isinstance(node, ast.Name):
+        return node.id == "interval"
+    elif isinstance(node, ast.UnaryOp):  # negative number literals
+        return is_constant(node.operand)
+    elif isinstance(node, ast.BinOp):
+        return is_constant(node.left) and is_constant(node.right)
+    # cases of enum domains, as in ``CPUSTAT['max']``
+    elif isinstance(node, ast.Subscript):
+        return True
+    elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        # literals of domains, as in ``INSTANCE('data')`` or ``LAZY('pcpu', ...)``
+        if node.func.id in KNOWN_DOMAINS:
+            return True
+        call_info = KNOWN_CALLABLES.get(node.func.id)
+        return (
+            call_info is not None
+            and call_info.purity is Purity.constant
+            and all(map(is_constant, node.args))
+        )
+    return False
+
+
+class _ConstantHoister(ast.NodeTransformer):
+    """Replace constant subexpressions by names, collecting the ``constants``"""
+
+    def __init__(self):
+        self.constants: List[ast.expr] = []
+
+    def visit(self, node: ast.AST) -> ast.AST:
+        # plain literals are cheaper than looking up a name
+        if isinstance(node, (*LITERAL_NODES, ast.Name, ast.UnaryOp)):
+            return node
+        if not is_constant(node):
+            return self.generic_visit(node)
+        assert isinstance(node, ast.expr)
+        self.constants.append(node)
+        name = ast.Name(id=f"_const{len(self.constants) - 1}", ctx=ast.Load())
+        return ast.copy_location(name, node)
+
+
+#: interval for which the time of blocking calls is estimated to order them
+TYPICAL_INTERVAL = 60.0
+
+
+def expression_cost(node: ast.AST) -> float:
+    """Estimate the seconds of evaluating a transpiled expression once"""
+    seconds = 0.0
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call) and isinstance(child.func, ast.Name):
+            call_info = KNOWN_CALLABLES.get(child.func.id)
+            if call_info is not None:
+                seconds += call_info.cost.cpu_time + call_info.blocks(TYPICAL_INTERVAL)
+    return seconds
+
+
+def _short_chain(
+    decided: Callable[[float], bool],
+    call: Callable[[float, float], float],
+    *args: Callable[[], float],
+) -> float:
+    """Fold the values of ``args`` with ``call`` until the result is ``decided``"""
+    value = args[0]()
+    for arg in args[1:]:
+        if decided(value):
+            return value
+        value = call(value, arg())
+    return value
+
+
+def _short_prelu(
+    call: Callable[[float, float], float],
+    pct: Callable[[], float],
+    bias: Callable[[], float],
+) -> float:
+    """Evaluate ``call(pct, bias)`` unless ``bias`` alone decides the result"""
+    bias_value = bias()
+    return 0 if bias_value >= 100 else call(pct(), bias_value)
+
+
+#: helpers of short-circuited expressions, as globals of the compiled code
+SHORT_CIRCUITS: Dict[str, Callable[..., float]] = {
+    "_short_max": functools.partial(_short_chain, lambda value: value >= 100),
+    "_short_min": functools.partial(_short_chain, lambda value: value <= 0),
+    "_short_prelu": _short_prelu,
+}
+
+
+def _thunk(node: ast.expr) -> ast.expr:
+    """Wrap ``node`` as ``lambda: node`` to evaluate it on demand"""
+    thunk = ast.parse("lambda: 0", mode="eval").body
+    assert isinstance(thunk, ast.Lambda)
+    thunk.body = node
+    return ast.copy_location(thunk, node)
+
+
+class _ShortCircuit(ast.NodeTransformer):
+    """
+    Skip arguments of ``max``, ``min`` and ``prelu`` that cannot change the result
+
+    Sensor values are clamped to 0..100, so ``max`` is decided by any argument
+    of 100 or more and ``min`` by any argument of 0 or less.
+    Their arguments are evaluated from the cheapest to the most expensive,
+    until the clamped result is decided.
+    Likewise, ``prelu`` is 0 without evaluating ``pct`` if ``bias`` is 100 or more.
+    Skippable arguments are passed as ``lambda: ...`` to the ``SHORT_CIRCUITS``.
+    """
+
+    def visit_clamped(self, node: ast.expr) -> ast.expr:
+        """Visit a ``node`` of which only the value clamped to 0..100 matters"""
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in ("max", "min"):
+                args = sorted(map(self.visit_clamped, node.args), key=expression_cost)
+                return self._chain(node.func.id, args)
+            elif node.func.id == "prelu":
+                return self._prelu(*node.args)
+            elif node.func.id == "psigmoid":
+                # psigmoid maps values beyond 0..100 to 0 or 100
+                node.args = list(map(self.visit_clamped, node.args))
+                return node
+        return self.visit(node)
+
+    def _chain(self, func: str, args: List[ast.expr]) -> ast.expr:
+        # arguments with free calls only are not worth skipping
+        if expression_cost(args[-1]) < Cost.cheap.cpu_time:
+            return ast.Call(ast.Name(func, ast.Load()), args, [])
+        # _short_max(max, lambda: a, lambda: b, ...)
+        return ast.Call(
+            ast.Name(f"_short_{func}", ast.Load()),
+            [ast.Name(func, ast.Load()), *map(_thunk, args)],
+            [],
+        )
+
+    def _prelu(self, pct: ast.expr, bias: ast.expr) -> ast.expr:
+        bias = self.visit(bias)
+        # for a bias of 0..100, prelu maps pct beyond 0..100 to 0 or 100
+        if isinstance(bias, LITERAL_NODES) and 0 <= literal_value(bias) <= 100:  # type: ignore
+            pct = self.visit_clamped(pct)
+        else:
+            pct = self.visit(pct)
+        # a bias that varies may be cheaper than the pct it cuts off
+        bias_cost = expression_cost(bias)
+        if not 0 < bias_cost < expression_cost(pct):
+            return ast.Call(ast.Name("prelu", ast.Load()), [pct, bias], [])
+        # _short_prelu(prelu, lambda: pct, lambda: bias)
+        return ast.Call(
+            ast.Name("_short_prelu", ast.Load()),
+            [ast.Name("prelu", ast.Load()), _thunk(pct), _thunk(bias)],
+            [],
+        )
 
 
 def compile_sensors(
-    interval: float, *sensors: Callable[..., Callable[[], float]]
+    interval: float,
+    *sensors: Callable[..., Callable[[], float]],
+    decorate: Optional[Callable[[CallInfo], CLICall]] = None,
 ) -> List[Callable[[], float]]:
-    raw_sensors = {name: sf_info.call for name, sf_info in KNOWN_CALLABLES.items()}
+    """
+    Compile sensor factories for a given ``interval``
+
+    If ``decorate`` is given, it is used to replace the raw call of each CLI callable.
+    """
+    raw_sensors = {
+        name: sf_info.call if decorate is None else decorate(sf_info)
+        for name, sf_info in KNOWN_CALLABLES.items()
+    }
     raw_domains = {name: dm_info.domain for name, dm_info in KNOWN_DOMAINS.items()}  # type: ignore[reportUnknownMemberType]
     return [
         factory(interval=interval, **raw_sensors, **raw_domains) for factory in sensors
@@ -272,7 +644,7 @@ def compile_sensors(
 
 if __name__ == "__main__":
     # provide debug information on the parser
-    from ..sensors import sensor, xrd_load  # noqa  # pyright: ignore
+    from ..sensors import sensor, xrd_load, xrd_report, background, storage, self_usage  # noqa  # pyright: ignore
     from . import cli_parser  # noqa
 
     print("EXPRESSION:", cli_parser.EXPRESSION)
@@ -0,0 +1,214 @@
+"""
+Live reloading of configuration files provided as ``@/path/to/config``
+
+Files are watched via inotify if available, or by polling their status otherwise.
+When a file changes, the configuration is parsed again and only expressions that
+actually changed are compiled again. Sensors that did not change are kept as-is,
+including any state they hold.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+
+from .cli import CLI, SENSOR_FIELDS, compile_options
+
+LOGGER = logging.getLogger(__name__)
+
+
+def config_paths(argv: List[str]) -> List[str]:
+    """Get the paths of all configuration files used by the CLI arguments `argv`"""
+    prefixes = CLI.fromfile_prefix_chars or ""
+    return [os.path.abspath(arg[1:]) for arg in argv if arg and arg[0] in prefixes]
+
+
+StatSignature = Optional[Tuple[int, int, int, int]]
+
+
+def stat_signature(path: str) -> StatSignature:
+    """Summarise the status of `path` to detect modifications"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher:
+    """
+    Non-blocking detection of changes to several files
+
+    Uses inotify to watch the directories of all files, if available.
+    This also detects files being replaced, as is common for editors.
+    If inotify is not available, the status of each file is compared instead.
+    """
+
+    # see `man inotify`
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, *paths: str):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self._inotify_fd: Optional[int] = None
+        self._watches: Dict[int, "set[str]"] = {}
+        self._signatures = {path: stat_signature(path) for path in self.paths}
+        if self.paths:
+            try:
+                self._inotify_fd = self._watch_inotify()
+            except OSError as err:
+                LOGGER.info("watching config files by polling: %s", err)
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify_fd is not None
+
+    def _watch_inotify(self) -> int:
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, "no libc to provide inotify")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "libc does not provide inotify")
+        fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        directories: Dict[str, "set[str]"] = {}
+        for path in self.paths:
+            directory, name = os.path.split(path)
+            directories.setdefault(directory, set()).add(name)
+        for directory, names in directories.items():
+            wd = libc.inotify_add_watch(
+                fd,
+                os.fsencode(directory),
+                self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE,
+            )
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(err, f"inotify_add_watch failed for {directory}")
+            self._watches[wd] = names
+        return fd
+
+    def changed(self) -> bool:
+        """Check whether any file changed since the last check"""
+        if self._inotify_fd is not None:
+            return self._changed_inotify(self._inotify_fd)
+        return self._changed_stat()
+
+    def _changed_inotify(self, fd: int) -> bool:
+        changed = False
+        while True:
+            try:
+                events = os.read(fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(events):
+                wd, _, _, length = self.EVENT_HEADER.unpack_from(events, offset)
+                start = offset + self.EVENT_HEADER.size
+                offset = start + length
+                name = events[start:offset].rstrip(b"\0")
+                changed |= os.fsdecode(name) in self._watches.get(wd, ())
+
+    def _changed_stat(self) -> bool:
+        changed = False
+        for path, signature in self._signatures.items():
+            current = stat_signature(path)
+            if current != signature:
+                self._signatures[path] = current
+                changed = True
+        return changed
+
+    def close(self):
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+
+#: options that are applied only on a restart, by their destination
+RESTART_OPTIONS = (
+    "interval",
+    "min_interval",
+    "max_interval",
+    "deadline",
+    "max_stale",
+    "budget",
+    "export",
+    "sink",
+    "state",
+    "rampup",
+)
+
+
+class ConfigReloader:
+    """
+    Reload the configuration of the CLI arguments `argv` on changes
+
+    The reloader provides the currently compiled `sensors`,
+    in the order of :py:data:`SENSOR_FIELDS`, and the current `options`.
+    Changes of the :py:data:`RESTART_OPTIONS` are ignored with a warning.
+    """
+
+    def __init__(
+        self,
+        argv: List[str],
+        options: argparse.Namespace,
+        sensors: List[Callable[[], float]],
+    ):
+        self.argv = argv
+        self.options = options
+        self.sensors = sensors
+        #: the interval for which sensors are compiled, if adapted at runtime
+        self.interval: Optional[float] = None
+        self.watcher = FileWatcher(*config_paths(argv))
+
+    def recompile(self, interval: float) -> List[Callable[[], float]]:
+        """Compile all sensors again for a new ``interval``"""
+        self.interval = interval
+        self.sensors = compile_options(self.options, interval=interval)
+        return self.sensors
+
+    def reload(self) -> bool:
+        """Reload the configuration if it changed and report whether it did"""
+        if not self.watcher.changed():
+            return False
+        try:
+            options = CLI.parse_args(self.argv)
+        # argparse reports most errors and exits, but not a SyntaxError of sensors
+        except (SystemExit, SyntaxError):
+            LOGGER.warning("keeping previous configuration due to invalid config")
+            return False
+        for name in RESTART_OPTIONS:
+            if getattr(options, name) != getattr(self.options, name):
+                LOGGER.warning(
+                    "changes of %s require a restart, ignoring it",
+                    name.replace("_", "-"),
+                )
+                setattr(options, name, getattr(self.options, name))
+        # sampling periods may affect all expressions
+        changed = [
+            field
+            for field in SENSOR_FIELDS
+            if getattr(options, field) is not getattr(self.options, field)
+            or options.every != self.options.every
+        ]
+        if changed:
+            LOGGER.info("reloaded expressions for %s", ", ".join(changed))
+        compiled = dict(
+            zip(changed, compile_options(options, changed, interval=self.interval))
+        )
+        self.sensors = [
+            compiled.get(field, sensor)
+            for field, sensor in zip(SENSOR_FIELDS, self.sensors)
+        ]
+        self.options = options
+        return True
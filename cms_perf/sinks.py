@@ -0,0 +1,321 @@
+"""
+Sinks that consume the reports of each sampling pass
+
+Every report is passed to all sinks, starting with the line for ``cmsd``.
+Sinks that may be slow, such as files or network connections, are buffered
+and fed in batches from a background thread, so that they never delay
+the report to ``cmsd``.
+"""
+
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import http.server
+import json
+import logging
+import math
+import socket
+import socketserver
+import threading
+import urllib.parse
+from collections import deque
+
+from .output import ReportWriter
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Report(NamedTuple):
+    """The outcome of one sampling pass"""
+
+    #: UNIX time of the report
+    time: float
+    #: interval in seconds until the next report
+    interval: float
+    #: the name of each reported value, e.g. ``"pcpu"``
+    fields: Sequence[str]
+    #: the reported percentages
+    values: Sequence[int]
+    #: the values of the expressions before clamping them to percentages
+    raw_values: Sequence[float]
+    #: the total load and whether it exceeds the maxload of ``cms.sched``, if any
+    summary: Optional[str] = None
+
+
+class Sink:
+    """Consumer of reports"""
+
+    def send(self, report: Report):
+        """Consume a single report"""
+        raise NotImplementedError
+
+    def send_batch(self, reports: Sequence[Report]):
+        """Consume several reports at once"""
+        for report in reports:
+            self.send(report)
+
+    def close(self):
+        """Release all resources of the sink"""
+
+
+class CmsdSink(Sink):
+    """The report line for the ``cms.perf`` directive and the ``cms.sched`` summary"""
+
+    def __init__(self, writer: Optional[ReportWriter] = None):
+        self.writer = writer if writer is not None else ReportWriter()
+
+    def send(self, report: Report):
+        self.writer.write(" ".join(map(str, report.values)), report.summary)
+
+    def close(self):
+        self.writer.close()
+
+
+class BufferedSink(Sink):
+    """
+    Feed reports to a slow ``sink`` in batches from a background thread
+
+    At most ``capacity`` reports are buffered; if the ``sink`` does not keep up,
+    the oldest reports are dropped. Errors of the ``sink`` are logged.
+    """
+
+    def __init__(self, sink: Sink, capacity: int = 1024):
+        self.sink = sink
+        #: number of reports dropped since the sink did not keep up
+        self.dropped = 0
+        self._buffer: "deque[Report]" = deque(maxlen=capacity)
+        self._available = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._send_forever, name=f"sink {sink!r}", daemon=True
+        )
+        self._thread.start()
+
+    def send(self, report: Report):
+        with self._available:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(report)
+            self._available.notify()
+
+    def _send_forever(self):
+        while True:
+            with self._available:
+                while not self._buffer and not self._closed:
+                    self._available.wait()
+                if not self._buffer:
+                    return
+                batch = list(self._buffer)
+                self._buffer.clear()
+            try:
+                self.sink.send_batch(batch)
+            except Exception as err:
+                LOGGER.warning("sink %r failed to send reports: %s", self.sink, err)
+
+    def close(self, timeout: float = 1.0):
+        """Send any buffered reports and release the sink"""
+        with self._available:
+            self._closed = True
+            self._available.notify()
+        self._thread.join(timeout)
+        self.sink.close()
+
+
+class JsonLinesSink(Sink):
+    """
+    Append each report as a line of JSON to the file at ``path``
+
+    Raw values that are not finite, such as ``inf``, have no JSON representation
+    and are written as ``null``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.path!r})"
+
+    def send_batch(self, reports: Sequence[Report]):
+        for report in reports:
+            self._file.write(
+                json.dumps(
+                    {
+                        "time": report.time,
+                        "interval": report.interval,
+                        "values": dict(zip(report.fields, report.values)),
+                        "raw": {
+                            field: raw if math.isfinite(raw) else None
+                            for field, raw in zip(report.fields, report.raw_values)
+                        },
+                        "summary": report.summary,
+                    },
+                    allow_nan=False,
+                )
+            )
+            self._file.write("\n")
+        self._file.flush()
+
+    def send(self, report: Report):
+        self.send_batch([report])
+
+    def close(self):
+        self._file.close()
+
+
+def format_number(value: float) -> str:
+    """Format ``value`` as a number of the Graphite and OpenMetrics text formats"""
+    if math.isnan(value):
+        return "NaN"
+    elif math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class GraphiteSink(Sink):
+    """
+    Send reports in the Graphite plaintext protocol to ``address``
+
+    Each value is sent as ``<prefix>.<field>`` and each raw value as
+    ``<prefix>.raw.<field>``. The ``protocol`` may be ``"udp"`` or ``"tcp"``;
+    a broken TCP connection is established again for the next batch.
+    """
+
+    def __init__(
+        self, address: Tuple[str, int], protocol: str = "tcp", prefix: str = "cms_perf"
+    ):
+        assert protocol in ("udp", "tcp"), f"unknown protocol {protocol!r}"
+        self.address = address
+        self.protocol = protocol
+        self.prefix = prefix
+        self._socket: Optional[socket.socket] = None
+
+    def __repr__(self):
+        host, port = self.address
+        return f"{self.__class__.__name__}('{self.protocol}://{host}:{port}')"
+
+    def _lines(self, report: Report) -> List[str]:
+        timestamp = int(report.time)
+        return [
+            *(
+                f"{self.prefix}.{field} {format_number(value)} {timestamp}\n"
+                for field, value in zip(report.fields, report.values)
+            ),
+            *(
+                f"{self.prefix}.raw.{field} {format_number(value)} {timestamp}\n"
+                for field, value in zip(report.fields, report.raw_values)
+            ),
+        ]
+
+    def send_batch(self, reports: Sequence[Report]):
+        if self.protocol == "udp":
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+                for report in reports:
+                    message = "".join(self._lines(report)).encode()
+                    udp_socket.sendto(message, self.address)
+            return
+        message = "".join(line for report in reports for line in self._lines(report))
+        try:
+            if self._socket is None:
+                self._socket = socket.create_connection(self.address, timeout=10)
+            self._socket.sendall(message.encode())
+        except OSError:
+            self.close()
+            raise
+
+    def send(self, report: Report):
+        self.send_batch([report])
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+# http.server.ThreadingHTTPServer is available only since Python 3.7
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class OpenMetricsSink(Sink):
+    """
+    Serve the latest report as OpenMetrics text via HTTP at ``address``
+
+    The metrics are available at any path, such as ``/metrics``.
+    """
+
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self, address: Tuple[str, int]):
+        self._latest = b"# EOF\n"
+        sink = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = sink._latest
+                self.send_response(200)
+                self.send_header("Content-Type", sink.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object):
+                LOGGER.debug(format, *args)
+
+        self._server = _ThreadingHTTPServer(address, MetricsHandler)
+        #: the address actually served, e.g. if port 0 was requested
+        self.address: Tuple[str, int] = self._server.server_address[:2]  # type: ignore
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="openmetrics", daemon=True
+        )
+        self._thread.start()
+
+    def send(self, report: Report):
+        lines = [
+            "# TYPE cms_perf_load gauge",
+            "# HELP cms_perf_load Reported load percentage",
+            *(
+                f'cms_perf_load{{field="{field}"}} {format_number(value)}'
+                for field, value in zip(report.fields, report.values)
+            ),
+            "# TYPE cms_perf_raw gauge",
+            "# HELP cms_perf_raw Value of the load expression before clamping",
+            *(
+                f'cms_perf_raw{{field="{field}"}} {format_number(value)}'
+                for field, value in zip(report.fields, report.raw_values)
+            ),
+            "# TYPE cms_perf_interval_seconds gauge",
+            "# UNIT cms_perf_interval_seconds seconds",
+            f"cms_perf_interval_seconds {format_number(report.interval)}",
+            "# EOF",
+            "",
+        ]
+        # replacing the content as a whole needs no lock
+        self._latest = "\n".join(lines).encode()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _address(url: urllib.parse.SplitResult, default_port: int) -> Tuple[str, int]:
+    return url.hostname or "127.0.0.1", url.port or default_port
+
+
+def sink_from_spec(spec: str) -> Sink:
+    """
+    Create a sink from a specification such as ``graphite+udp://host:2003``
+
+    Supported are ``json:PATH``, ``graphite+tcp://HOST:PORT/PREFIX``,
+    ``graphite+udp://HOST:PORT/PREFIX`` and ``openmetrics://HOST:PORT``.
+    File and network sinks that may block are buffered.
+    """
+    scheme, _, location = spec.partition(":")
+    if scheme == "json":
+        return BufferedSink(JsonLinesSink(location))
+    url = urllib.parse.urlsplit(spec)
+    if scheme in ("graphite", "graphite+tcp", "graphite+udp"):
+        protocol = "udp" if scheme == "graphite+udp" else "tcp"
+        prefix = url.path.strip("/").replace("/", ".") or "cms_perf"
+        return BufferedSink(GraphiteSink(_address(url, 2003), protocol, prefix))
+    elif scheme == "openmetrics":
+        return OpenMetricsSink(_address(url, 9100))
+    raise ValueError(f"unknown sink {spec!r}")
@@ -0,0 +1,163 @@
+"""
+Checkpoints of the sensor state, to resume quickly after a restart
+
+Restarting ``cms_perf``, e.g. along with ``cmsd``, discards the state of all
+sensors and starts a new rampup, which drains the server of traffic for its
+duration. Instead, the state can be written to a small file, usually in
+``/run``, periodically and on shutdown. When starting shortly after a
+checkpoint with the same configuration, ``cms_perf`` resumes from it:
+
+* the rampup continues from its progress at the checkpoint,
+  set back by the time ``cms_perf`` was not running,
+* an adaptive interval continues from the interval and values of the checkpoint,
+* CPU utilisation is measured since the checkpoint, without sampling first.
+
+Checkpoints of another configuration or boot, or older than several intervals,
+are ignored.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+import psutil
+
+from .sensors.snapshot import SNAPSHOT
+from .setup.cli import SENSOR_FIELDS
+from .setup.reload import ConfigReloader
+from .sinks import Report, Sink
+
+LOGGER = logging.getLogger(__name__)
+
+#: version of the state layout, checkpoints of other versions are ignored
+STATE_VERSION = 1
+#: number of intervals after which a checkpoint is too old to resume
+MAX_INTERVALS = 10
+
+
+class Checkpoint(NamedTuple):
+    """State of ``cms_perf`` at the time of a checkpoint"""
+
+    #: UNIX time of the checkpoint
+    time: float
+    #: UNIX time at which the system booted
+    boot_time: float
+    #: digest of the configuration, see :py:func:`config_digest`
+    config: str
+    #: seconds of the rampup completed
+    rampup: float
+    #: the report interval in seconds
+    interval: float
+    #: the values of the latest report before clamping and rampup
+    raw_values: List[float]
+    #: the ids, busy and total times of the latest CPU measurement, if any
+    cpu_times: Optional[Tuple[List[int], List[float], List[float]]]
+
+    def rampup_progress(self) -> float:
+        """Seconds of rampup to resume, set back by the time since the checkpoint"""
+        return max(self.rampup - (time.time() - self.time), 0.0)
+
+
+def config_digest(options: argparse.Namespace) -> str:
+    """Digest of the parsed ``options`` that affect the state of sensors"""
+    relevant = [getattr(options, field).cli_source for field in SENSOR_FIELDS]
+    relevant += [options.interval, options.min_interval, options.max_interval]
+    relevant += sorted(options.every)
+    return hashlib.sha256(repr(relevant).encode()).hexdigest()
+
+
+def _boot_time() -> float:
+    try:
+        return psutil.boot_time()
+    except (OSError, RuntimeError):
+        return 0.0
+
+
+def load_checkpoint(path: str, config: str) -> Optional[Checkpoint]:
+    """Load the checkpoint at ``path``, if it is recent and of the ``config``"""
+    try:
+        with open(path) as in_stream:
+            state = json.load(in_stream)
+        if state.pop("version", None) != STATE_VERSION:
+            raise ValueError("unknown state version")
+        checkpoint = Checkpoint(**state)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as err:
+        LOGGER.warning("ignoring invalid state %r: %s", path, err)
+        return None
+    age = time.time() - checkpoint.time
+    if checkpoint.config != config:
+        LOGGER.info("not resuming state of a different configuration")
+    elif abs(checkpoint.boot_time - _boot_time()) > 1.0:
+        LOGGER.info("not resuming state of a previous boot")
+    elif not 0 <= age <= MAX_INTERVALS * checkpoint.interval:
+        LOGGER.info("not resuming state from %.0fs ago", age)
+    else:
+        return checkpoint
+    return None
+
+
+class StateCheckpoint(Sink):
+    """
+    Writer of checkpoints to the file at ``path`` every ``period`` and on closing
+
+    The rampup is assumed to have progressed by ``rampup`` seconds on creation.
+    If a ``reloader`` is given, checkpoints are of its latest configuration.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        options: argparse.Namespace,
+        rampup: float = 0.0,
+        period: float = 60.0,
+        reloader: "ConfigReloader | None" = None,
+    ):
+        self.path = os.path.abspath(path)
+        self.options = options
+        self.period = period
+        self.reloader = reloader
+        self._started = time.monotonic() - rampup
+        self._written = float("-inf")
+        self._latest: Optional[Report] = None
+
+    def send(self, report: Report):
+        self._latest = report
+        if time.monotonic() - self._written >= self.period:
+            self.write()
+
+    def write(self):
+        """Write a checkpoint of the latest report, if any"""
+        report = self._latest
+        if report is None:
+            return
+        self._written = time.monotonic()
+        options = self.reloader.options if self.reloader is not None else self.options
+        checkpoint = Checkpoint(
+            time=time.time(),
+            boot_time=_boot_time(),
+            config=config_digest(options),
+            rampup=self._written - self._started,
+            interval=report.interval,
+            raw_values=list(report.raw_values),
+            cpu_times=SNAPSHOT.cpu_baseline(),
+        )
+        # replace the file at once so that no incomplete state is ever read
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w") as out_stream:
+                json.dump(
+                    {"version": STATE_VERSION, **checkpoint._asdict()}, out_stream
+                )
+            os.replace(temp_path, self.path)
+        except OSError as err:
+            LOGGER.warning("cannot write state %r: %s", self.path, err)
+
+    def close(self):
+        """Write a final checkpoint"""
+        self.write()
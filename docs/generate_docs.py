@@ -28,6 +28,7 @@ def document_cli(*, sensors: bool) -> str:
         cli_help = (
             action.help + r" [default: %(default)s]"
             if r"%(default)s" not in action.help
+            and "[default: " not in action.help
             and action.default is not argparse.SUPPRESS
             else action.help
         )
@@ -63,6 +64,8 @@ def document_cli_call(call_info: cli_parser.CallInfo) -> str:
     rst_lines.extend(
         f"   {line}" for line in normalized_doc(call_info.call).splitlines()
     )
+    if call_info.cost is not cli_parser.Cost.free:
+        rst_lines.extend(("", f"   Cost: ``{call_info.cost.name}``"))
     return "\n".join(rst_lines)
 
 
@@ -86,6 +89,16 @@ with open(TARGET_DIR / "cli_options.rst", "w") as out_stream:
     out_stream.write(document_cli(sensors=False))
 
 
-for call_domain in ("sensor", "transform", "xrd_load"):
+for call_domain in (
+    "sensor",
+    "storage",
+    "paging",
+    "network",
+    "transform",
+    "xrd_load",
+    "xrd_report",
+    "background",
+    "self_usage",
+):
     with open(TARGET_DIR / f"cli_callables_{call_domain}.rst", "w") as out_stream:
         out_stream.write(document_cli_calls(call_domain))
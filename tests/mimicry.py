@@ -28,19 +28,31 @@ class Process:
 
     This class must be used as a context manager. The process is created on entering
     the context and gracefully closed on exiting it.
+    Any ``args`` are shown as part of the command line but not of the name.
     """
 
     def __init__(
-        self, name: str, threads: int = 1, files: int = 0, lifetime: float = 1.0
+        self,
+        name: str,
+        threads: int = 1,
+        files: int = 0,
+        lifetime: float = 1.0,
+        args: "tuple[str, ...]" = (),
     ):
         assert platform.system() == "Linux", "Not compatible with this OS"
         assert name and threads > 1 and files >= 0 and lifetime > 0
         self.name = name
+        self.args = args
         self.threads = threads
         self.files = files
         self.lifetime = lifetime
         self._process: Optional[subprocess.Popen] = None
 
+    @property
+    def pid(self) -> int:
+        assert self._process is not None, "process only exists inside the context"
+        return self._process.pid
+
     def __enter__(self):
         with tempfile.TemporaryDirectory() as rendezvous_dir:
             rendezvous = os.path.join(rendezvous_dir, "__it_lives__")
@@ -50,6 +62,7 @@ class Process:
                     sys.executable,
                     __file__,
                     str(self.name),
+                    " ".join((self.name, *self.args)),
                     str(self.threads),
                     str(self.files),
                     str(self.lifetime),
@@ -58,6 +71,7 @@ class Process:
             )
             with open(rendezvous, "r") as ready:
                 ready.read()
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._process.send_signal(signal.SIGINT)
@@ -71,8 +85,9 @@ def add_thread():
 
 
 def mimimain():
-    name, threads, files, lifetime, rendezvous = sys.argv[-5:]
-    setproctitle.setproctitle(name)
+    name, title, threads, files, lifetime, rendezvous = sys.argv[-6:]
+    setproctitle.setproctitle(title)
+    setproctitle.setthreadtitle(name)
     threads = [add_thread() for _ in range(int(threads))]
     with contextlib.ExitStack() as es:
         for _ in range(int(files)):
@@ -0,0 +1,420 @@
+"""
+Helpers to simulate a host with a virtual clock and a synthetic ``/proc``
+
+The :py:class:`SimulatedClock` replaces the ``time`` module of selected modules,
+so that sleeping merely advances the clock. The :py:class:`FakeProc` generates
+a ``/proc`` tree with configurable processes, threads, files and sockets
+that :py:mod:`psutil` and the sensors read instead of the actual ``/proc``.
+This allows to run sensors, trackers and the report loop deterministically
+and much faster than real time, e.g. a simulated week of reports.
+For sensors of single counter files, :py:class:`ProcCounters` writes just these.
+The :py:class:`MemoryWatch` detects memory that is retained over such runs.
+
+.. note::
+
+    Only code in the main thread should use the simulated clock.
+    Background threads sleeping on the simulated clock would spin.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+import os
+import shutil
+import time
+import tracemalloc
+import types
+
+import psutil
+
+from cms_perf import report
+from cms_perf.sinks import Report, Sink
+from cms_perf.sensors import self_usage, sensor, snapshot, xrd_load
+
+#: modules whose ``time`` is replaced by the simulated clock
+SIMULATED_MODULES: Sequence[types.ModuleType] = (
+    report,
+    self_usage,
+    sensor,
+    snapshot,
+    xrd_load,
+)
+
+
+class SimulatedClock:
+    """
+    Virtual replacement of the :py:mod:`time` module
+
+    Sleeping advances the clock instantly and notifies all ``listeners``
+    of the elapsed time. Any other attribute is taken from :py:mod:`time`.
+    """
+
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.elapsed = 0.0
+        self.start = start
+        self.listeners: List[Callable[[float], None]] = []
+
+    def __getattr__(self, name: str):
+        return getattr(time, name)
+
+    def monotonic(self) -> float:
+        return 1000.0 + self.elapsed
+
+    def perf_counter(self) -> float:
+        return self.monotonic()
+
+    def time(self) -> float:
+        return self.start + self.elapsed
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """Advance the clock by ``seconds`` and notify all listeners"""
+        if seconds <= 0:
+            return
+        self.elapsed += seconds
+        for listener in self.listeners:
+            listener(seconds)
+
+
+class SimulatedProcess(NamedTuple):
+    pid: int
+    name: str
+    cmdline: Sequence[str]
+    threads: int
+    fds: int
+    sockets: int
+    #: resident memory in pages
+    rss: int
+    #: CPU cores used while the clock advances
+    cpu_load: float
+
+
+class FakeProc:
+    """
+    Synthetic ``/proc`` tree at ``root``, evolving with the ``clock``
+
+    The system has ``ncpus`` CPUs that are busy by the fraction ``cpu_busy``,
+    and a run queue of ``running`` and ``blocked`` processes.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        clock: SimulatedClock,
+        ncpus: int = 4,
+        memory_kb: int = 16 * 2**20,
+    ):
+        self.root = root
+        self.clock = clock
+        self.ncpus = ncpus
+        self.memory_kb = memory_kb
+        self.memory_used = 0.25
+        self.cpu_busy = 0.5
+        self.running = 1
+        self.blocked = 0
+        self.loadavg = (0.5, 0.5, 0.5)
+        self.processes: Dict[int, SimulatedProcess] = {}
+        self._cpu_ticks: Dict[int, float] = {}
+        self._sockets: Dict[int, List[str]] = {}
+        self._system_ticks = 0.0
+        self._next_pid = 1000
+        self._next_inode = 10000
+        os.makedirs(os.path.join(root, "self"), exist_ok=True)
+        os.makedirs(os.path.join(root, "net"), exist_ok=True)
+        self._write("self/mounts", "/dev/root / ext4 rw 0 0\n")
+        self._write_sockets()
+        self.write_system()
+        clock.listeners.append(self._advance)
+
+    def _write(self, path: str, content: str):
+        with open(os.path.join(self.root, path), "w") as out_file:
+            out_file.write(content)
+
+    @staticmethod
+    def _socket_header() -> str:
+        return (
+            "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when"
+            " retrnsmt   uid  timeout inode\n"
+        )
+
+    @property
+    def btime(self) -> int:
+        return int(self.clock.start - 3600)
+
+    def write_system(self):
+        """Write the system-wide files such as ``/proc/stat``"""
+        ticks = self._system_ticks
+        busy = int(ticks * self.cpu_busy)
+        idle = int(ticks) - busy
+        cpu_line = f"{busy} 0 0 {idle} 0 0 0 0 0 0"
+        self._write(
+            "stat",
+            f"cpu  {busy * self.ncpus} 0 0 {idle * self.ncpus} 0 0 0 0 0 0\n"
+            + "".join(f"cpu{cpu} {cpu_line}\n" for cpu in range(self.ncpus))
+            + f"intr 0\nctxt 0\nbtime {self.btime}\nprocesses {self._next_pid}\n"
+            + f"procs_running {self.running}\nprocs_blocked {self.blocked}\n",
+        )
+        self._write(
+            "loadavg",
+            " ".join(map(str, self.loadavg)) + f" 1/{len(self.processes) + 1} 1\n",
+        )
+        available = int(self.memory_kb * (1 - self.memory_used))
+        self._write(
+            "meminfo",
+            f"MemTotal: {self.memory_kb} kB\nMemFree: {available} kB\n"
+            f"MemAvailable: {available} kB\nSwapTotal: 0 kB\nSwapFree: 0 kB\n",
+        )
+
+    def add_process(
+        self,
+        name: str = "xrootd",
+        args: Sequence[str] = (),
+        threads: int = 1,
+        fds: int = 0,
+        sockets: int = 0,
+        rss: int = 1024,
+        cpu_load: float = 0.0,
+        pid: Optional[int] = None,
+    ) -> int:
+        """Add a process and provide its PID, which is picked if not given"""
+        # threads take up IDs as well
+        pid = pid if pid is not None else self._allocate_pids(max(threads, 1))
+        process = SimulatedProcess(
+            pid, name, (name, *args), threads, fds, sockets, rss, cpu_load
+        )
+        self.processes[pid] = process
+        self._cpu_ticks[pid] = 0.0
+        proc_dir = os.path.join(self.root, str(pid))
+        os.makedirs(os.path.join(proc_dir, "fd"))
+        self._write(f"{pid}/cmdline", "\0".join(process.cmdline) + "\0")
+        self._write(
+            f"{pid}/status",
+            f"Name:\t{name}\nState:\tS (sleeping)\nPid:\t{pid}\nThreads:\t{threads}\n",
+        )
+        self._write(f"{pid}/statm", f"{rss * 4} {rss} 0 1 0 {rss} 0\n")
+        self._write_stat(process)
+        for tid in range(pid, pid + threads):
+            os.makedirs(os.path.join(proc_dir, "task", str(tid)))
+            self._write(f"{pid}/task/{tid}/stat", self._stat_line(process, tid))
+        for fd in range(fds):
+            open(os.path.join(proc_dir, "fd", str(fd)), "w").close()
+        for fd in range(fds, fds + sockets):
+            inode = self._next_inode
+            self._next_inode += 1
+            os.symlink(f"socket:[{inode}]", os.path.join(proc_dir, "fd", str(fd)))
+            self._sockets.setdefault(pid, []).append(
+                f"   0: 0100007F:0438 0100007F:{fd:04X} 01 00000000:00000000"
+                f" 00:00000000 00000000     0        0 {inode} 1 0 20 4 30 10 -1\n"
+            )
+        if sockets:
+            self._write_sockets()
+        return pid
+
+    def add_idle_processes(self, count: int, name: str = "bash") -> List[int]:
+        """
+        Add ``count`` idle processes and provide their PIDs
+
+        Only the files needed to identify the processes are created,
+        which is much faster than :py:meth:`add_process` for many processes.
+        """
+        pids = []
+        for _ in range(count):
+            pid = self._allocate_pids(1)
+            process = SimulatedProcess(pid, name, (name,), 1, 0, 0, 0, 0.0)
+            self.processes[pid] = process
+            self._cpu_ticks[pid] = 0.0
+            os.mkdir(os.path.join(self.root, str(pid)))
+            self._write(f"{pid}/cmdline", f"{name}\0")
+            self._write_stat(process)
+            pids.append(pid)
+        return pids
+
+    def _allocate_pids(self, count: int) -> int:
+        pid = self._next_pid
+        # skip processes added with an explicit PID
+        while any(tid in self.processes for tid in range(pid, pid + count)):
+            pid += 1
+        self._next_pid = pid + count
+        return pid
+
+    def remove_process(self, pid: int):
+        """Remove the process ``pid``, as if it exited"""
+        del self.processes[pid]
+        del self._cpu_ticks[pid]
+        shutil.rmtree(os.path.join(self.root, str(pid)))
+        if self._sockets.pop(pid, None):
+            self._write_sockets()
+
+    def _write_sockets(self):
+        self._write(
+            "net/tcp",
+            self._socket_header()
+            + "".join(line for lines in self._sockets.values() for line in lines),
+        )
+
+    def _stat_line(self, process: SimulatedProcess, tid: Optional[int] = None) -> str:
+        cpu_ticks = int(self._cpu_ticks[process.pid])
+        if tid is not None and process.threads > 1:
+            cpu_ticks //= process.threads
+        started = 100 * (process.pid - 1000)
+        # state, ppid, ... utime (14th), stime, ..., starttime (22nd), ...
+        fields = ["S", "1", "1", "1", "0", "-1", "0", "0", "0", "0", "0"]
+        fields += [str(cpu_ticks), "0", "0", "0", "20", "0", str(process.threads)]
+        fields += ["0", str(started)] + ["0"] * 30
+        return f"{tid or process.pid} ({process.name}) {' '.join(fields)}\n"
+
+    def _write_stat(self, process: SimulatedProcess):
+        self._write(f"{process.pid}/stat", self._stat_line(process))
+
+    def _advance(self, seconds: float):
+        self._system_ticks += seconds * xrd_load.CLOCK_TICKS
+        for pid, process in self.processes.items():
+            if process.cpu_load:
+                self._cpu_ticks[pid] += (
+                    seconds * process.cpu_load * xrd_load.CLOCK_TICKS
+                )
+                self._write_stat(process)
+        self.write_system()
+
+
+class StopSimulation(Exception):
+    """The simulation collected all reports it should"""
+
+
+class SimulatedHost:
+    """A simulated ``clock`` and ``proc`` tree, installed via ``monkeypatch``"""
+
+    def __init__(self, root: str, monkeypatch, **proc_options):
+        self.clock = SimulatedClock()
+        os.makedirs(root, exist_ok=True)
+        self.proc = FakeProc(root, self.clock, **proc_options)
+        # the current process, as inspected by the self monitoring sensors
+        self.proc.add_process("python", pid=os.getpid())
+        monkeypatch.setattr(psutil, "PROCFS_PATH", root)
+        for module in SIMULATED_MODULES:
+            monkeypatch.setattr(module, "time", self.clock)
+        # start without state of the actual host
+        monkeypatch.setattr(snapshot.SNAPSHOT, "_sources", {})
+        monkeypatch.setattr(snapshot.SNAPSHOT, "_cpu_monitor", snapshot.CpuMonitor())
+        monkeypatch.setattr(xrd_load, "TRACKER_CACHE", {})
+        monkeypatch.setattr(xrd_load, "DISCOVERY_CACHE", {})
+        # the simulated /proc is not a procfs, which must be detected anew
+        monkeypatch.setattr(xrd_load, "FD_DIR_SIZE", None)
+        monkeypatch.setattr(psutil, "_pmap", {})
+
+
+class ProcCounters:
+    """
+    Counter files of a synthetic ``/proc`` at ``root``, installed via ``monkeypatch``
+
+    The sensors of ``module`` read the files via a snapshot of their own.
+    Every :py:meth:`write` advances the ``clock`` by ``step`` seconds
+    and the snapshot by one tick, as from one report to the next.
+    """
+
+    def __init__(
+        self, root: str, monkeypatch, module: types.ModuleType, step: float = 60.0
+    ):
+        self.root = root
+        self.step = step
+        self.clock = SimulatedClock()
+        self.snapshot = snapshot.SystemSnapshot()
+        monkeypatch.setattr(psutil, "PROCFS_PATH", root)
+        monkeypatch.setattr(snapshot, "time", self.clock)
+        monkeypatch.setattr(module, "SNAPSHOT", self.snapshot)
+
+    def write(self, files: Dict[str, str]):
+        """Write the ``files`` by their path in ``/proc``, then advance by a step"""
+        for path, content in files.items():
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as out_stream:
+                out_stream.write(content)
+        self.clock.advance(self.step)
+        self.snapshot.advance()
+
+
+class CollectSink(Sink):
+    """Sink that collects ``count`` reports, then stops the simulation"""
+
+    def __init__(self, count: int, on_report: Optional[Callable[[int], None]] = None):
+        self.count = count
+        self.on_report = on_report
+        self.reports: List[Report] = []
+
+    def send(self, report: Report):
+        self.reports.append(report)
+        if self.on_report is not None:
+            self.on_report(len(self.reports))
+        if len(self.reports) >= self.count:
+            raise StopSimulation
+
+
+class MemorySample(NamedTuple):
+    tick: int
+    #: bytes allocated by Python objects
+    traced: int
+    #: bytes of resident memory of the process
+    rss: int
+
+
+class MemoryWatch:
+    """
+    Sample the memory of the current process to detect sustained growth
+
+    Python allocations are measured with :py:mod:`tracemalloc`, which is
+    started by :py:meth:`start`, except for allocations in files matching
+    ``ignore``. By default, this ignores the bounded caches of :py:mod:`re`
+    and :py:mod:`fnmatch` as well as :py:mod:`tracemalloc` itself.
+    The resident memory is read from the actual ``/proc``,
+    even if :py:data:`psutil.PROCFS_PATH` is simulated.
+    """
+
+    def __init__(
+        self, ignore: Sequence[str] = ("*/re/*", "*/fnmatch.py", "*/tracemalloc.py")
+    ):
+        self.samples: List[MemorySample] = []
+        self._filters = [tracemalloc.Filter(False, pattern) for pattern in ignore]
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    def start(self):
+        tracemalloc.start()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    def sample(self, tick: int):
+        """Record the memory used at ``tick``"""
+        with open("/proc/self/statm", "rb") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        snapshot = self._snapshot()
+        traced = sum(stat.size for stat in snapshot.statistics("filename"))
+        self.samples.append(MemorySample(tick, traced, rss))
+        if self._baseline is None:
+            self._baseline = snapshot
+
+    def growth(self) -> MemorySample:
+        """
+        The growth of memory from the first to the second half of all samples
+
+        Only growth of the minimum of each half counts, so that memory which is
+        used only temporarily, e.g. during a rescan, does not count as growth.
+        """
+        middle = len(self.samples) // 2
+        earlier, later = self.samples[:middle], self.samples[middle:]
+        return MemorySample(
+            later[-1].tick - earlier[0].tick,
+            min(sample.traced for sample in later)
+            - min(sample.traced for sample in earlier),
+            min(sample.rss for sample in later) - min(sample.rss for sample in earlier),
+        )
+
+    def top_growth(self, limit: int = 10) -> str:
+        """Describe the source lines whose allocations grew the most"""
+        if self._baseline is None:
+            return ""
+        differences = self._snapshot().compare_to(self._baseline, "lineno")
+        return "\n".join(map(str, differences[:limit]))
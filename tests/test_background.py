@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from cms_perf.setup import cli, cli_parser
+from cms_perf.sensors import background
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self) -> float:
+        with self.lock:
+            self.calls += 1
+            return self.calls
+
+
+CALL_COUNTER = Counter()
+
+
+@cli_parser.cli_call(name="test.counter")
+def count_calls() -> float:
+    """Count how often this is called"""
+    return CALL_COUNTER()
+
+
+def test_sampler():
+    counter = Counter()
+    sampler = background.BackgroundSampler(counter, period=0.05)
+    assert sampler() == 1
+    # reading does not evaluate the call
+    assert sampler() == 1
+    time.sleep(0.2)
+    assert 2 <= sampler() <= 6
+    assert sampler() <= counter.calls
+
+
+def test_sampler_idle():
+    counter = Counter()
+    sampler = background.BackgroundSampler(counter, period=0.01, idle_timeout=0.05)
+    assert sampler() == 1
+    time.sleep(0.2)
+    assert sampler.idle
+    calls = counter.calls
+    time.sleep(0.05)
+    assert counter.calls == calls
+
+
+def test_sampler_error():
+    def broken():
+        raise KeyError("broken sensor")
+
+    sampler = background.BackgroundSampler(broken, period=1)
+    with pytest.raises(KeyError):
+        sampler()
+    # the traceback does not grow with every read of the same error
+    depths = []
+    for _ in range(3):
+        with pytest.raises(KeyError) as raised:
+            sampler()
+        depths.append(len(raised.traceback))
+    assert depths[0] == depths[1] == depths[2]
+
+
+def test_cached_sampler_concurrent():
+    counter = Counter()
+    expression = cli_parser.Lazy("test.concurrent", counter)
+    barrier = threading.Barrier(8)
+    samplers = []
+
+    def get_sampler():
+        barrier.wait()
+        samplers.append(background.cached_sampler(expression, 60, 1))
+
+    # fields using the same expression may be evaluated at the same time
+    threads = [threading.Thread(target=get_sampler) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(samplers) == 8
+    assert all(sampler is samplers[0] for sampler in samplers)
+    assert samplers[0]() == counter.calls == 1
+
+
+@pytest.mark.parametrize(
+    "expected, source",
+    [(3, "every(1 + 2, 5m)"), (4, "every(max(2, 4), 10)"), (5, "every(5, 0.5s)")],
+)
+def test_every(expected: float, source: str):
+    (sensor,) = cli_parser.compile_sensors(0.01, cli_parser.parse_sensor(source))
+    assert sensor() == expected
+
+
+def test_every_invalid():
+    with pytest.raises(ValueError):
+        cli_parser.parse_sensor("every(1, 5x)")
+
+
+def test_every_option():
+    options = cli.CLI.parse_args(
+        ["--every", "test.counter=1h", "--pcpu", "test.counter + 1"]
+    )
+    _, pcpu, *_ = cli.compile_options(options)
+    assert pcpu() == 2
+    assert pcpu() == 2
+    assert CALL_COUNTER.calls == 1
+
+
+def test_every_option_invalid(capsys):
+    with pytest.raises(SystemExit):
+        cli.CLI.parse_args(["--every", "no_such_sensor=5m"])
+    assert "not a known sensor" in capsys.readouterr().err
@@ -0,0 +1,107 @@
+import logging
+
+import pytest
+
+from cms_perf import budget
+from cms_perf.sensors import self_usage, snapshot
+from cms_perf.setup import cli_parser
+
+
+def busy(interval: float, loops: float) -> float:
+    return float(sum(range(int(loops))))
+
+
+@pytest.fixture
+def call_costs(monkeypatch):
+    monkeypatch.setattr(budget, "CALL_COSTS", {})
+    return budget.CALL_COSTS
+
+
+def test_throttle_calls(call_costs):
+    call = budget.throttle_calls(cli_parser.CallInfo(busy, "busy"), busy)
+    snapshot.SNAPSHOT.advance()
+    assert call(1.0, 10.0) == 45.0
+    cost = call_costs["busy(10)"]
+    assert cost.period == 1 and cost.cpu_time > 0
+    cost.period = 3
+    snapshot.SNAPSHOT.advance()
+    call(1.0, 10.0)
+    # throttled calls reuse their latest value until they are due again
+    cost.value = -1.0
+    for _ in range(2):
+        snapshot.SNAPSHOT.advance()
+        assert call(1.0, 10.0) == -1.0
+    snapshot.SNAPSHOT.advance()
+    assert call(1.0, 10.0) == 45.0
+
+
+def test_budget(call_costs, monkeypatch, caplog):
+    usage = [0.0]
+    cpu_budget = budget.CpuBudget(limit=1.0, max_period=4, patience=1)
+    monkeypatch.setattr(
+        cpu_budget._monitor, "measure", lambda: self_usage.SelfUsage(usage[0], 0)
+    )
+    cheap = budget.throttle_calls(cli_parser.CallInfo(busy, "busy"), busy)
+
+    def tick():
+        snapshot.SNAPSHOT.advance()
+        cheap(1.0, 10.0)
+        cheap(1.0, 100000.0)
+        cpu_budget.update()
+
+    tick()
+    assert {cost.period for cost in call_costs.values()} == {1}
+    usage[0] = 2.0
+    with caplog.at_level(logging.WARNING, logger=budget.__name__):
+        tick()
+    # the most expensive call is throttled first
+    assert call_costs["busy(100000)"].period == 2
+    assert call_costs["busy(10)"].period == 1
+    assert "busy(100000) every 2 ticks" in caplog.text
+    for _ in range(4):
+        tick()
+    assert call_costs["busy(100000)"].period == 4
+    assert call_costs["busy(10)"].period == 4
+    usage[0] = 0.1
+    with caplog.at_level(logging.WARNING, logger=budget.__name__):
+        for _ in range(4):
+            tick()
+    assert {cost.period for cost in call_costs.values()} == {1}
+    assert "within budget of 1.00%: evaluating busy(10) every 1 ticks" in caplog.text
+
+
+def test_budget_new_calls(call_costs, monkeypatch):
+    class IntrudedCost(budget.CallCost):
+        @property
+        def cost(self) -> float:
+            # a concurrently evaluated field calls a new sensor
+            call_costs.setdefault(f"new{len(call_costs)}", budget.CallCost())
+            return super().cost
+
+    cpu_budget = budget.CpuBudget(limit=1.0, patience=1)
+    monkeypatch.setattr(
+        cpu_budget._monitor, "measure", lambda: self_usage.SelfUsage(2.0, 0)
+    )
+    snapshot.SNAPSHOT.advance()
+    for label in ("first", "second"):
+        call_costs[label] = IntrudedCost()
+        call_costs[label].requested = snapshot.SNAPSHOT.tick
+    cpu_budget.update()
+    assert len(call_costs) > 2
+
+
+@pytest.mark.parametrize(
+    "thread_time", [budget._thread_time, budget._rusage_thread_time]
+)
+def test_thread_time(thread_time):
+    started = thread_time()
+    sum(range(1000000))
+    assert thread_time() > started
+
+
+def test_self_monitor():
+    monitor = self_usage.SelfMonitor()
+    sum(range(100000))
+    usage = monitor.measure()
+    assert usage.pcpu > 0
+    assert usage.rss > 0
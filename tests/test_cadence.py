@@ -0,0 +1,61 @@
+from cms_perf.cadence import AdaptiveInterval
+
+
+def test_adaptive_interval(caplog):
+    compiled = []
+
+    def compile(interval):
+        compiled.append(interval)
+        return [lambda: interval]
+
+    sensors = [lambda: 0.0]
+    cadence = AdaptiveInterval(60, 15, 240, compile=compile, patience=2)
+    assert cadence() == 60
+    # the first report provides no change
+    assert cadence.adapt([10, 10], sensors) is sensors
+    # volatile reports shorten the interval, until the minimum
+    for load in (60, 10, 60):
+        sensors = cadence.adapt([load, 10], sensors)
+    assert cadence() == 15
+    assert compiled == [30, 15]
+    assert sensors[0]() == 15
+    # changes are visible at the default level of warnings
+    changes = [record for record in caplog.records if record.levelname == "WARNING"]
+    assert [record.getMessage() for record in changes] == [
+        "changing interval from 60s to 30s",
+        "changing interval from 30s to 15s",
+    ]
+    # stable reports extend the interval after some patience, until the maximum
+    intervals = []
+    for _ in range(12):
+        sensors = cadence.adapt([11, 10], sensors)
+        intervals.append(cadence())
+    # the first report still differs from the volatile ones
+    assert intervals == [15, 15, 30, 30, 60, 60, 120, 120, 240, 240, 240, 240]
+    assert compiled[-1] == 240
+
+
+def test_adaptive_interval_bounds():
+    cadence = AdaptiveInterval(10, 15, 240, compile=lambda interval: [])
+    assert cadence() == 15
+    cadence = AdaptiveInterval(300, 15, 240, compile=lambda interval: [])
+    assert cadence() == 240
+
+
+def test_adaptive_interval_resume():
+    compiled = []
+
+    def compile(interval):
+        compiled.append(interval)
+        return [lambda: interval]
+
+    sensors = [lambda: 0.0]
+    cadence = AdaptiveInterval(60, 15, 240, compile=compile)
+    # resuming the same interval keeps the sensors
+    assert cadence.resume(60, [10, 10], sensors) is sensors
+    sensors = cadence.resume(480, [10, 10], sensors)
+    assert cadence() == 240
+    assert compiled == [240]
+    # the resumed values are the baseline for changes
+    cadence.adapt([60, 10], sensors)
+    assert cadence() == 120
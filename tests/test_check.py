@@ -0,0 +1,74 @@
+import io
+
+import pytest
+
+from cms_perf import check
+from cms_perf.setup import cli
+from cms_perf.setup.cli_parser import Cost
+
+
+def estimated(source: str, interval: float = 60.0, **periods: float):
+    return {
+        estimate.label: estimate
+        for estimate in check.estimate_calls(source, interval, periods)
+    }
+
+
+def test_estimate_calls():
+    estimates = estimated("max(pio, nsockets(all) / 100) + 100 * nloadq / ncores")
+    # constants are evaluated only once and do not count
+    assert estimates.keys() == {
+        "max(pio, nsockets(all) / 100)",
+        "pio",
+        "nsockets(all)",
+        "nloadq",
+    }
+    assert estimates["nsockets(all)"].cost is Cost.expensive
+    assert estimates["nsockets(all)"].wall_time == Cost.expensive.cpu_time
+    # pio samples for a quarter of the interval, at most 1s
+    assert estimates["pio"].wall_time == pytest.approx(1 + Cost.cheap.cpu_time)
+
+
+def test_estimate_background():
+    estimates = estimated("every(nsockets, 10m)", interval=60.0)
+    assert not estimates["every(nsockets, 10m)"].background
+    assert estimates["nsockets"].background
+    assert estimates["nsockets"].wall_time == 0
+    assert estimates["nsockets"].cpu_time == pytest.approx(Cost.expensive.cpu_time / 10)
+    estimates = estimated("nsockets", interval=60.0, nsockets=120.0)
+    assert estimates["nsockets"].background
+    assert estimates["nsockets"].cpu_time == pytest.approx(Cost.expensive.cpu_time / 2)
+
+
+def test_run_check():
+    options = cli.CLI.parse_args(["--interval", "60", "--pio", "nsockets"])
+    output = io.StringIO()
+    assert check.run_check(options, output=output)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "prunq = prunq: 0.10 ms CPU, 0.10 ms wall"
+    assert "  nsockets: expensive, 200.00 ms CPU per tick" in lines
+    assert lines[-1].startswith("per tick: ")
+
+
+@pytest.mark.parametrize(
+    "argv, warning",
+    [
+        (["--interval", "0.1", "--pio", "nsockets"], "exceeding the interval"),
+        (["--budget", "0.1", "--pio", "nsockets"], "exceeding the budget"),
+    ],
+)
+def test_run_check_warnings(argv, warning):
+    options = cli.CLI.parse_args(argv)
+    output = io.StringIO()
+    assert not check.run_check(options, output=output)
+    assert warning in output.getvalue().splitlines()[-1]
+
+
+def test_run_check_concurrent():
+    # fields are evaluated concurrently, so a tick takes only the slowest one
+    options = cli.CLI.parse_args(
+        ["--interval", "0.3", "--pio", "nsockets", "--pmem", "nsockets"]
+    )
+    output = io.StringIO()
+    assert check.run_check(options, output=output)
+    assert "200.00 ms wall of 300.00 ms interval" in output.getvalue().splitlines()[-1]
@@ -1,4 +1,7 @@
 from typing import List, Tuple
+import os
+import signal
+import subprocess
 import sys
 
 import pytest
@@ -102,6 +105,60 @@ def test_run_mixed_fromfile(executable: List[str]):
             assert idx == int(reading)
 
 
+@pytest.mark.parametrize("executable", EXECUTABLES)
+def test_run_reload_fromfile(executable: List[str]):
+    config = b"interval=0.02\nprunq=0\npcpu=1\npmem=2\nppag=3\npio=%d\n"
+    with tempfile.TemporaryDirectory() as config_dir:
+        config_path = os.path.join(config_dir, "cms_perf.ini")
+        with open(config_path, "wb") as out_stream:
+            out_stream.write(config % 4)
+        process = subprocess.Popen(
+            [*executable, f"@{config_path}"], stdout=subprocess.PIPE
+        )
+        try:
+            assert process.stdout.readline().split() == [b"0", b"1", b"2", b"3", b"4"]
+            with open(config_path + ".new", "wb") as out_stream:
+                out_stream.write(config % 5)
+            os.replace(config_path + ".new", config_path)
+            for _ in range(500):
+                if process.stdout.readline().split()[-1] == b"5":
+                    break
+            else:
+                assert False, "config was not reloaded"
+        finally:
+            process.send_signal(signal.SIGINT)
+            process.wait()
+
+
+@pytest.mark.parametrize("executable", EXECUTABLES)
+def test_run_adaptive(executable: List[str]):
+    output = capture(
+        [
+            *executable,
+            "--interval",
+            "0.02",
+            "--min-interval",
+            "0.01",
+            "--max-interval",
+            "0.08",
+            "--prunq",
+            "0",
+            "--pcpu",
+            "1",
+            "--pmem",
+            "2",
+            "--ppag",
+            "3",
+            "--pio",
+            "4",
+        ],
+        num_lines=8,
+    )
+    assert output
+    for line in output:
+        assert line.split() == [b"0", b"1", b"2", b"3", b"4"]
+
+
 SCHED_FIELD = tuple(enumerate(("runq", "cpu", "mem", "pag", "io")))
 
 
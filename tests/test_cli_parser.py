@@ -7,8 +7,10 @@ import psutil
 from cms_perf.setup import cli_parser
 from cms_perf.sensors import (  # noqa
     sensor as _mount_sensors,  # pyright: ignore[reportUnusedImport]
+    storage as _mount_storage,  # pyright: ignore[reportUnusedImport]
     transform as _mount_transform,  # pyright: ignore[reportUnusedImport]
     xrd_load as _mount_xrd_load,  # pyright: ignore[reportUnusedImport]
+    xrd_report as _mount_xrd_report,  # pyright: ignore[reportUnusedImport]
 )
 
 
@@ -26,12 +28,22 @@ SENSORS = [
     "prunq",
     "prunq",
     "pcpu",
+    "pcpu(max)",
+    "pcpu(min)",
+    "pcpu(pctl, 90)",
+    "pcpu(numa, 0)",
     "pmem",
     "pio",
     "pswap",
     "nloadq",
+    "nloadq(mean)",
+    "nloadq(max)",
+    "prunq(pctl, 90)",
     "ncores",
     "nsockets",
+    "pspace(/)",
+    "pinodes(/data*, mean)",
+    "pspace(@/etc/xrootd/xrootd-data.cfg, min)",
 ]
 
 
@@ -130,6 +142,84 @@ def test_known_transforms(expected: "float | Almost", source: str):
     assert expected == sensor()
 
 
+@cli_parser.cli_call(name="fake.constant", purity=cli_parser.Purity.constant)
+def fake_constant(value: float = 1) -> float:
+    CONSTANT_CALLS.append(value)
+    return value
+
+
+CONSTANT_CALLS = []
+
+
+def test_hoist_constants():
+    CONSTANT_CALLS.clear()
+    factory = cli_parser.parse_sensor(
+        "fake.constant(2) * fake_sensor_factory(fake.constant(3) + 1)"
+    )
+    (sensor,) = cli_parser.compile_sensors(0.01, factory)
+    # constant calls are evaluated once when compiling, not for every evaluation
+    assert CONSTANT_CALLS == [2, 3]
+    assert sensor() == sensor() == 8
+    assert CONSTANT_CALLS == [2, 3]
+    # calls with arguments that vary are not constant
+    factory = cli_parser.parse_sensor("fake.constant(fake_sensor_factory(2))")
+    (sensor,) = cli_parser.compile_sensors(0.01, factory)
+    assert sensor() == sensor() == 2
+    assert CONSTANT_CALLS == [2, 3, 2, 2]
+
+
+@cli_parser.cli_call(name="fake.cheap")
+def fake_cheap(value: float = 1) -> float:
+    SENSOR_CALLS.append(f"cheap({value})")
+    return value
+
+
+@cli_parser.cli_call(name="fake.expensive", cost=cli_parser.Cost.expensive)
+def fake_expensive(value: float = 1) -> float:
+    SENSOR_CALLS.append(f"expensive({value})")
+    return value
+
+
+SENSOR_CALLS = []
+
+
+@pytest.mark.parametrize(
+    "source, expected, calls",
+    [
+        # arguments are evaluated from the cheapest to the most expensive
+        ("max(fake.expensive(20), fake.cheap(10))", 20, ["cheap(10)", "expensive(20)"]),
+        ("max(fake.expensive(20), fake.cheap(100))", 100, ["cheap(100)"]),
+        ("min(fake.expensive(20), fake.cheap(-5))", -5, ["cheap(-5)"]),
+        ("min(fake.expensive(20), fake.cheap(5))", 5, ["cheap(5)", "expensive(20)"]),
+        # nested calls are decided by the clamped result
+        ("prelu(max(fake.expensive, fake.cheap(120)), 20)", 125, ["cheap(120)"]),
+        ("psigmoid(min(fake.cheap(0), fake.expensive))", 0, ["cheap(0)"]),
+        ("prelu(fake.expensive, fake.cheap(100))", 0, ["cheap(100)"]),
+        (
+            "prelu(fake.expensive(60), fake.cheap(20))",
+            50,
+            ["cheap(20)", "expensive(60)"],
+        ),
+        # unclamped results need all arguments
+        (
+            "max(fake.expensive, fake.cheap(100)) / 2",
+            50,
+            ["expensive(1)", "cheap(100)"],
+        ),
+        (
+            "relu(max(fake.expensive, fake.cheap(100)), 20)",
+            80,
+            ["expensive(1)", "cheap(100)"],
+        ),
+    ],
+)
+def test_short_circuit(source: str, expected: float, calls: "list[str]"):
+    SENSOR_CALLS.clear()
+    (sensor,) = cli_parser.compile_sensors(0.01, cli_parser.parse_sensor(source))
+    assert sensor() == expected
+    assert SENSOR_CALLS == calls
+
+
 PRIVILEGED_SENSORS = [
     "nsockets",
     "nsockets(inet6)",
@@ -137,6 +227,17 @@ PRIVILEGED_SENSORS = [
     "xrd.piowait",
     "xrd.nfds",
     "xrd.nthreads",
+    "xrd.nfds(anon)",
+    "xrd.nthreads(data*)",
+    "xrd.piowait(/run/xrootd/xrootd.pid)",
+    "xrd.pcpu",
+    "xrd.pcpu(data)",
+    "xrd.pmem",
+    "xrd.pmem(data, cgroup)",
+    "xrd.pmem(anon, total, pss)",
+    "xrd.pactive",
+    "xrd.ptcpu",
+    "xrd.ptcpu(data, pctl, 99)",
 ]
 
 
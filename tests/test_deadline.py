@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from cms_perf.deadline import SensorDeadline
+
+
+class Hanging:
+    """Sensor that hangs until ``released`` and then returns ``value``"""
+
+    def __init__(self, value: float):
+        self.value = value
+        self.released = threading.Event()
+        self.released.set()
+
+    def __call__(self) -> float:
+        self.released.wait()
+        return self.value
+
+
+def test_on_time():
+    deadline = SensorDeadline(timeout=1)
+    assert deadline([lambda: 1, lambda: 2, lambda: 3]) == [1, 2, 3]
+
+
+def test_last_known_value():
+    hanging = Hanging(12)
+    deadline = SensorDeadline(timeout=0.05, max_stale=2)
+    assert deadline([hanging, lambda: 1]) == [12, 1]
+    hanging.released.clear()
+    hanging.value = 24
+    for _ in range(2):
+        start = time.monotonic()
+        assert deadline([hanging, lambda: 1]) == [12, 1]
+        assert time.monotonic() - start < 0.5
+    # escalate to the conservative value if a sensor stays stale
+    assert deadline([hanging, lambda: 1]) == [100, 1]
+    hanging.released.set()
+    assert deadline([hanging, lambda: 1]) == [24, 1]
+
+
+def test_late_value():
+    late = Hanging(12)
+    late.released.clear()
+    deadline = SensorDeadline(timeout=0.05)
+    assert deadline([late]) == [100]
+    # the evaluation finishes after the deadline
+    late.released.set()
+    time.sleep(0.05)
+    late.released.clear()
+    # the late result is the last known value, even if the next one is late
+    assert deadline([late]) == [12]
+    late.released.set()
+
+
+def test_no_known_value():
+    hanging = Hanging(12)
+    hanging.released.clear()
+    deadline = SensorDeadline(timeout=0.01, stale_value=50)
+    assert deadline([hanging]) == [50]
+    hanging.released.set()
+
+
+def test_concurrent():
+    sensors = [lambda: time.sleep(0.1) or 1 for _ in range(5)]
+    deadline = SensorDeadline(timeout=1)
+    start = time.monotonic()
+    assert deadline(sensors) == [1] * 5
+    assert time.monotonic() - start < 0.4
+
+
+def test_exceptions():
+    def broken():
+        raise KeyError("broken sensor")
+
+    deadline = SensorDeadline(timeout=1)
+    with pytest.raises(KeyError):
+        deadline([broken])
+
+
+def test_replaced_sensors():
+    deadline = SensorDeadline(timeout=1)
+    first, second = Hanging(1), Hanging(2)
+    assert deadline([first]) == [1]
+    assert deadline([second]) == [2]
+    assert list(deadline._workers) == [second]
@@ -0,0 +1,63 @@
+import ast
+import io
+
+import pytest
+
+from cms_perf import explain
+from cms_perf.setup import cli, cli_parser
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "0",
+        "pcpu",
+        "pcpu(pctl, 90)",
+        "100.0 * nloadq / ncores",
+        "(1 + 2) * 3",
+        "1 - (2 - 3)",
+        "max(prelu(pcpu, 20), 100 * nloadq / ncores)",
+        "xrd.nfds(data*)",
+        "every(nsockets(tcp4), 5m)",
+    ],
+)
+def test_render(source: str):
+    node = ast.parse(cli_parser.parse(source), mode="eval").body
+    assert explain.render(node) == source
+
+
+def test_instrument_sensor():
+    factory, root = explain.instrument_sensor("max(2 * 3, 4 + 5, 1)")
+    (sensor,) = cli_parser.compile_sensors(1.0, factory)
+    assert sensor() == 9
+    assert sensor() == 9
+    assert root.label == "max(2 * 3, 4 + 5, 1)"
+    assert root.calls == 2
+    # constant subexpressions are evaluated only once, when compiling
+    assert root.children == []
+    root.reset()
+    assert root.calls == 0
+
+
+def test_instrument_short_circuit():
+    factory, root = explain.instrument_sensor("max(pmem, 50 + 50)")
+    (sensor,) = cli_parser.compile_sensors(1.0, factory)
+    assert sensor() == 100
+    # arguments are shown in their order of evaluation, skipped ones not called
+    assert root.label == "max(50 + 50, pmem)"
+    assert [(child.label, child.calls) for child in root.children] == [("pmem", 0)]
+
+
+def test_run_explain():
+    options = cli.CLI.parse_args(
+        ["--interval", "0.01", "--prunq", "100 * nloadq / ncores", "--ppag", "0"]
+    )
+    output = io.StringIO()
+    explain.run_explain(options, ticks=2, output=output)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "tick 1/2"
+    assert "tick 2/2" in lines
+    assert lines[1] == "prunq:"
+    assert lines[2].startswith("  100 * nloadq / ncores = ")
+    assert lines[3].startswith("    100 * nloadq = ")
+    assert any(line.startswith("  0 = 0.00 (") for line in lines)
@@ -0,0 +1,71 @@
+import mmap
+
+import pytest
+
+from cms_perf import export
+from cms_perf.sensors import sensor as _mount_sensors, snapshot  # noqa: F401
+from cms_perf.setup import cli_parser
+from cms_perf.sinks import Report
+
+
+def _map(path):
+    with open(path, "rb") as export_file:
+        return mmap.mmap(export_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def test_publish_read(tmp_path):
+    path = tmp_path / "values"
+    writer = export.ValueExport(str(path), capacity=3)
+    mapped = _map(path)
+    assert export.read_export(mapped).values == {}
+    writer.publish([("a", 1.0), ("b.c", 2.5)], interval=60)
+    content = export.read_export(mapped)
+    assert content.values == {"a": 1.0, "b.c": 2.5}
+    assert content.interval == 60
+    # surplus entries are dropped
+    writer.publish([(name, 1.0) for name in "abcd"], interval=30)
+    assert export.read_export(mapped).values == {"a": 1.0, "b": 1.0, "c": 1.0}
+    writer.close()
+    assert not path.exists()
+
+
+def test_read_inconsistent(tmp_path):
+    path = tmp_path / "values"
+    writer = export.ValueExport(str(path))
+    writer.publish([("a", 1.0)], interval=60)
+    data = bytearray(_map(path))
+    # a writer that is still busy leaves an odd sequence
+    export.SEQUENCE.pack_into(data, export.SEQUENCE_OFFSET, 3)
+    with pytest.raises(TimeoutError):
+        export.read_export(data, retries=3)
+    with pytest.raises(ValueError):
+        export.read_export(bytes(len(data)))
+    writer.close()
+
+
+def test_publish_report(tmp_path):
+    (sensor,) = cli_parser.compile_sensors(
+        1.0,
+        cli_parser.parse_sensor("pcpu(pctl, 90) + pmem"),
+        decorate=lambda call_info: export.record_calls(call_info, call_info.call),
+    )
+    writer = export.ValueExport(str(tmp_path / "values"))
+    snapshot.SNAPSHOT.advance()
+    raw = sensor()
+    writer.send(Report(0.0, 1.0, ["pcpu"], [int(raw)], [raw]))
+    values = export.read_export(_map(tmp_path / "values")).values
+    assert values.keys() == {
+        "report.pcpu",
+        "raw.pcpu",
+        "pcpu(pctl, 90)",
+        "pmem",
+        "self.pcpu",
+        "self.rss",
+    }
+    assert values["raw.pcpu"] == raw
+    # calls not used anymore are forgotten
+    for _ in range(3):
+        snapshot.SNAPSHOT.advance()
+        writer.send(Report(0.0, 1.0, ["pcpu"], [0], [0.0]))
+    assert "pcpu(pctl, 90)" not in export.RECORDED_CALLS
+    writer.close()
@@ -0,0 +1,113 @@
+import pytest
+
+from cms_perf.sensors import network, snapshot
+from cms_perf.setup import cli_parser
+
+from . import simulation
+
+SNMP = """\
+Ip: Forwarding DefaultTTL
+Ip: 1 64
+Tcp: RtoAlgorithm MaxConn ActiveOpens PassiveOpens RetransSegs OutSegs
+Tcp: 1 -1 {opens} {opens} {retrans} {segments}
+"""
+
+NETSTAT = """\
+TcpExt: SyncookiesSent ListenOverflows ListenDrops
+TcpExt: 0 {overflows} {overflows}
+"""
+
+NET_DEV = """\
+Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: 0 {packets} 0 {drops} 0 0 0 0 0 {packets} 0 {drops} 0 0 0 0
+  eth0: 0 {packets} 0 {drops} 0 0 0 0 0 {packets} 0 {drops} 0 0 0 0
+  eth1: 0 {packets} 0 0 0 0 0 0 0 {packets} 0 0 0 0 0 0
+"""  # noqa: B950
+
+
+@pytest.fixture
+def net_stats(tmp_path, monkeypatch):
+    """Write the network counters and advance the clock by a minute for every write"""
+    counters = simulation.ProcCounters(str(tmp_path), monkeypatch, network)
+
+    def write_net_stats(
+        opens=0, retrans=0, segments=0, overflows=0, packets=0, drops=0
+    ):
+        counters.write(
+            {
+                "net/snmp": SNMP.format(
+                    opens=opens, retrans=retrans, segments=segments
+                ),
+                "net/netstat": NETSTAT.format(overflows=overflows),
+                "net/dev": NET_DEV.format(packets=packets, drops=drops),
+            }
+        )
+
+    return write_net_stats
+
+
+def test_read_net_snmp(net_stats):
+    net_stats(opens=3, retrans=2, segments=100, overflows=1)
+    counters = snapshot.read_net_snmp()
+    assert counters["Tcp.MaxConn"] == -1
+    assert counters["Tcp.RetransSegs"] == 2
+    assert counters["TcpExt.ListenOverflows"] == 1
+    # loopback is ignored
+    net_stats(packets=10, drops=1)
+    assert snapshot.read_net_dev() == {
+        "rx_packets": 20,
+        "rx_drop": 1,
+        "tx_packets": 20,
+        "tx_drop": 1,
+    }
+
+
+def test_read_net_dev_missing(net_stats, tmp_path):
+    net_stats(retrans=2)
+    (tmp_path / "net" / "dev").unlink()
+    counters = snapshot.read_net_counters()
+    assert counters["Tcp.RetransSegs"] == 2
+    assert counters["rx_packets"] == counters["tx_drop"] == 0
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        # 1% of segments retransmitted
+        ("pnet(retrans)", 20),
+        ("pnet(retrans, 2)", 50),
+        # 0.5% of packets dropped
+        ("pnet(drops)", 50),
+        # 1 overflow and 60 opens per second
+        ("pnet(overflows)", 10),
+        ("pnet(churn)", 6),
+        ("pnet", 50),
+        ("pnet(all)", 50),
+    ],
+)
+def test_network_stress(net_stats, source, expected):
+    (sensor,) = cli_parser.compile_sensors(60, cli_parser.parse_sensor(source))
+    net_stats()
+    sensor()
+    net_stats(
+        opens=1800, retrans=600, segments=60000, overflows=60, packets=6000, drops=60
+    )
+    assert sensor() == pytest.approx(expected)
+
+
+def test_network_first_sample(net_stats):
+    (sensor,) = cli_parser.compile_sensors(2, cli_parser.parse_sensor("pnet"))
+    net_stats()
+    before = snapshot.time.monotonic()
+    sensor()
+    # all counters are sampled in the same window of half a second
+    assert snapshot.time.monotonic() - before == 0.5
+
+
+def test_network_idle(net_stats):
+    (sensor,) = cli_parser.compile_sensors(60, cli_parser.parse_sensor("pnet"))
+    net_stats()
+    sensor()
+    net_stats()
+    assert sensor() == 0
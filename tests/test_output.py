@@ -0,0 +1,107 @@
+import os
+import socket
+
+from cms_perf.output import LineWriter, ReportWriter
+
+
+def read_all(fd: int) -> bytes:
+    chunks = []
+    while True:
+        try:
+            chunks.append(os.read(fd, 65536))
+        except BlockingIOError:
+            return b"".join(chunks)
+
+
+def test_coalesce_full_pipe():
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    try:
+        writer = LineWriter(write_fd)
+        # the shared descriptor, e.g. of stderr, still blocks as usual
+        assert os.get_blocking(write_fd)
+        # fill the pipe until the reader would have to catch up
+        filler = b"0 0 0 0 0\n"
+        while writer.write(filler):
+            pass
+        for value in range(1, 10):
+            assert not writer.write(
+                f"{value} {value} {value} {value} {value}\n".encode()
+            )
+        assert writer.dropped == 9
+        lines = read_all(read_fd).splitlines()
+        assert set(lines) == {filler.strip()}
+        assert writer.write(b"10 10 10 10 10\n")
+        # only the latest line is written after the reader caught up
+        assert read_all(read_fd) == b"10 10 10 10 10\n"
+        writer.close()
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_partial_line():
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    try:
+        writer = LineWriter(write_fd)
+        # a line larger than the pipe buffer can only be written partially
+        huge = b"1" * (1024 * 1024) + b"\n"
+        assert not writer.write(huge)
+        assert not writer.write(b"2\n")
+        received = read_all(read_fd)
+        while not writer.flush():
+            received += read_all(read_fd)
+        received += read_all(read_fd)
+        assert received == huge + b"2\n"
+        writer.close()
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_coalesce_full_socket():
+    reader, sender = socket.socketpair()
+    reader.setblocking(False)
+    try:
+        writer = LineWriter(sender.fileno())
+        assert os.get_blocking(sender.fileno())
+        while writer.write(b"0 0 0 0 0\n"):
+            pass
+        assert not writer.write(b"1 1 1 1 1\n")
+        while True:
+            try:
+                reader.recv(65536)
+            except BlockingIOError:
+                break
+        assert writer.flush()
+        assert reader.recv(65536).endswith(b"1 1 1 1 1\n")
+        writer.close()
+    finally:
+        reader.close()
+        sender.close()
+
+
+def test_report_writer_shared():
+    read_fd, write_fd = os.pipe()
+    try:
+        writer = ReportWriter(write_fd, write_fd)
+        writer.write("1 2 3 4 5", "3!")
+        writer.write("1 2 3 4 5")
+        assert os.read(read_fd, 1024) == b"1 2 3 4 5 3!\n1 2 3 4 5\n"
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_report_writer_separate():
+    report_read, report_write = os.pipe()
+    summary_read, summary_write = os.pipe()
+    try:
+        writer = ReportWriter(report_write, summary_write)
+        writer.write("1 2 3 4 5", "3")
+        assert os.read(report_read, 1024) == b"1 2 3 4 5\n"
+        assert os.read(summary_read, 1024) == b"3\n"
+    finally:
+        for fd in (report_read, report_write, summary_read, summary_write):
+            os.close(fd)
@@ -0,0 +1,77 @@
+import pytest
+
+from cms_perf.sensors import paging, snapshot
+from cms_perf.setup import cli_parser
+
+from . import simulation
+
+VMSTAT = """\
+nr_free_pages 1000
+pgmajfault {majfault}
+pswpin {swap}
+pswpout {swap}
+pgsteal_kswapd {steal}
+pgsteal_direct {steal}
+pgsteal_anon {steal}
+pgsteal_file {steal}
+pgscan_kswapd {scan}
+pgscan_direct {scan}
+pgscan_direct_throttle {scan}
+"""
+
+
+@pytest.fixture
+def vmstat(tmp_path, monkeypatch):
+    """Write ``/proc/vmstat`` and advance the clock by a minute for every write"""
+    counters = simulation.ProcCounters(str(tmp_path), monkeypatch, paging)
+
+    def write_vmstat(scan=0, steal=0, majfault=0, swap=0):
+        content = VMSTAT.format(scan=scan, steal=steal, majfault=majfault, swap=swap)
+        counters.write({"vmstat": content})
+
+    return write_vmstat
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("npaging", 100),
+        ("npaging(scan)", 100),
+        # reclaim is counted by kswapd and direct, and again by anon and file
+        ("npaging(steal)", 2000),
+        ("npaging(majfault)", 10),
+        ("npaging(swap)", 2),
+        ("npaging(all)", 2112),
+        ("ppaging(scan)", 1),
+        ("ppaging(majfault, 20)", 50),
+        ("ppaging", 4),
+    ],
+)
+def test_paging(vmstat, source, expected):
+    (sensor,) = cli_parser.compile_sensors(60, cli_parser.parse_sensor(source))
+    vmstat()
+    sensor()
+    vmstat(scan=6000, steal=60000, majfault=600, swap=60)
+    assert sensor() == pytest.approx(expected)
+
+
+def test_paging_once_per_tick(vmstat, monkeypatch):
+    reads = []
+    read_vmstat = snapshot.read_vmstat
+
+    def counted_read():
+        reads.append(1)
+        return read_vmstat()
+
+    monkeypatch.setattr(snapshot, "read_vmstat", counted_read)
+    sensors = cli_parser.compile_sensors(
+        60, *map(cli_parser.parse_sensor, ("npaging", "ppaging", "npaging(swap)"))
+    )
+    vmstat()
+    for sensor in sensors:
+        sensor()
+    # the first tick reads twice to sample an initial rate
+    assert len(reads) == 2
+    vmstat(swap=60)
+    assert [sensor() for sensor in sensors] == [0, 0.2, 2]
+    assert len(reads) == 3
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+
+from cms_perf.setup import cli, reload
+
+CONFIG = """\
+interval = 0.02
+prunq = 0
+pcpu = 1
+pmem = 2
+ppag = 3
+pio = 4
+"""
+
+
+def replace_file(path, content: str):
+    """Replace a file the way many editors do"""
+    with open(f"{path}.swp", "w") as out_stream:
+        out_stream.write(content)
+    os.replace(f"{path}.swp", path)
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "stat"])
+def watcher_factory(request, monkeypatch):
+    if not request.param:
+
+        def no_inotify(self):
+            raise OSError("inotify disabled by test")
+
+        monkeypatch.setattr(reload.FileWatcher, "_watch_inotify", no_inotify)
+
+    def make_watcher(*paths):
+        watcher = reload.FileWatcher(*paths)
+        if request.param and not watcher.uses_inotify:
+            pytest.skip("inotify is not available")
+        return watcher
+
+    return make_watcher
+
+
+def test_watcher(tmp_path, watcher_factory):
+    config, other = tmp_path / "cms_perf.ini", tmp_path / "other.ini"
+    config.write_text(CONFIG)
+    watcher = watcher_factory(str(config))
+    assert not watcher.changed()
+    other.write_text(CONFIG)
+    assert not watcher.changed()
+    config.write_text(CONFIG.replace("pcpu = 1", "pcpu = 10"))
+    assert watcher.changed()
+    assert not watcher.changed()
+    replace_file(config, CONFIG)
+    assert watcher.changed()
+    assert not watcher.changed()
+    watcher.close()
+
+
+def test_config_paths():
+    assert reload.config_paths(["--interval", "1", "@/etc/cms_perf.ini"]) == [
+        "/etc/cms_perf.ini"
+    ]
+    assert reload.config_paths(["--interval", "1"]) == []
+
+
+def test_reloader_restart_options(tmp_path, caplog):
+    config = tmp_path / "cms_perf.ini"
+    config.write_text(CONFIG)
+    argv = [f"@{config}"]
+    options = cli.CLI.parse_args(argv)
+    reloader = reload.ConfigReloader(argv, options, cli.compile_options(options))
+    replace_file(
+        config,
+        CONFIG.replace("interval = 0.02", "interval = 1")
+        + "deadline = 5\nmax-stale = 7\npcpu = 10\n",
+    )
+    assert reloader.reload()
+    # expressions are applied but options that need a restart are kept
+    assert reloader.options.pcpu.cli_source == "10"
+    assert reloader.options.interval == options.interval
+    assert reloader.options.deadline == options.deadline
+    assert reloader.options.max_stale == options.max_stale
+    for name in ("interval", "deadline", "max-stale"):
+        assert f"changes of {name} require a restart" in caplog.text
+
+
+def test_reloader(tmp_path):
+    config = tmp_path / "cms_perf.ini"
+    config.write_text(CONFIG)
+    argv = [f"@{config}"]
+    options = cli.CLI.parse_args(argv)
+    sensors = cli.compile_options(options)
+    reloader = reload.ConfigReloader(argv, options, sensors)
+    assert not reloader.reload()
+    replace_file(config, CONFIG.replace("pcpu = 1", "pcpu = 10"))
+    assert reloader.reload()
+    assert [sensor() for sensor in reloader.sensors] == [0, 10, 2, 3, 4]
+    # only changed expressions are compiled again
+    for index, (old, new) in enumerate(zip(sensors, reloader.sensors)):
+        assert (old is new) == (cli.SENSOR_FIELDS[index] != "pcpu")
+    # invalid configurations are ignored
+    replace_file(config, CONFIG.replace("pcpu = 1", "pcpu = 1 +* 2"))
+    assert not reloader.reload()
+    assert [sensor() for sensor in reloader.sensors] == [0, 10, 2, 3, 4]
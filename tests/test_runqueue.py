@@ -0,0 +1,82 @@
+import threading
+import time
+
+import psutil
+import pytest
+
+from cms_perf.sensors import runqueue
+
+
+def write_procstat(path, running: int, blocked: int, padding: int = 0):
+    path.write_bytes(
+        b"cpu  1 2 3 4 5 6 7 0 0 0\n"
+        + b"intr 1"
+        + b" 0" * padding
+        + b"\n"
+        + b"procs_running %d\nprocs_blocked %d\nsoftirq 0 0\n" % (running, blocked)
+    )
+
+
+@pytest.fixture
+def procstat(tmp_path, monkeypatch):
+    monkeypatch.setattr(psutil, "PROCFS_PATH", str(tmp_path))
+    write_procstat(tmp_path / "stat", running=3, blocked=2)
+    return tmp_path / "stat"
+
+
+def test_read(procstat):
+    reader = runqueue.ProcStatReader()
+    try:
+        # the reader itself is not counted
+        assert reader.read() == 4
+        write_procstat(procstat, running=1, blocked=0, padding=20000)
+        assert reader.read() == 0
+    finally:
+        reader.close()
+
+
+def test_read_real():
+    reader = runqueue.ProcStatReader()
+    try:
+        assert reader.read() >= 0
+    finally:
+        reader.close()
+
+
+def test_sampler(procstat):
+    sampler = runqueue.RunQueueSampler(window=0.2, period=0.01)
+    assert sampler.samples()[-1] == 4
+    write_procstat(procstat, running=11, blocked=0)
+    time.sleep(0.3)
+    samples = sampler.samples()
+    # the ring buffer holds just the window
+    assert 2 <= len(samples) <= 21
+    assert set(samples) == {10}
+
+
+def test_sampler_idle(procstat):
+    sampler = runqueue.RunQueueSampler(window=0.1, period=0.01, idle_timeout=0.05)
+    assert not sampler.idle
+    time.sleep(0.2)
+    assert sampler.idle
+    # the latest sample is available even if there are none in the window
+    assert sampler.samples() == [4]
+
+
+def test_cached_sampler_concurrent(procstat, monkeypatch):
+    monkeypatch.setattr(runqueue, "SAMPLER_CACHE", {})
+    barrier = threading.Barrier(8)
+    samplers = []
+
+    def get_sampler():
+        barrier.wait()
+        samplers.append(runqueue.cached_sampler(0.2))
+
+    # fields of the same interval may be evaluated at the same time
+    threads = [threading.Thread(target=get_sampler) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(samplers) == 8
+    assert all(sampler is samplers[0] for sampler in samplers)
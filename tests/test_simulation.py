@@ -0,0 +1,134 @@
+import os
+import time
+
+import psutil
+import pytest
+
+from cms_perf import report
+from cms_perf.sensors import xrd_load
+from cms_perf.setup import cli_parser
+
+from . import simulation
+
+pytestmark = pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+
+#: number of processes to simulate at scale
+SCALE = int(os.environ.get("CMS_PERF_SIMULATED_PROCESSES", 10000))
+
+
+@pytest.fixture
+def host(tmp_path, monkeypatch):
+    return simulation.SimulatedHost(str(tmp_path / "proc"), monkeypatch)
+
+
+def test_clock(host):
+    clock = host.clock
+    start, start_time = clock.monotonic(), clock.time()
+    report.time.sleep(3600)
+    assert clock.monotonic() - start == 3600
+    assert clock.time() - start_time == 3600
+    # other attributes are those of the actual time module
+    assert report.time.gmtime is time.gmtime
+
+
+def test_processes(host):
+    pid = host.proc.add_process(
+        "xrootd", args=("-n", "data"), threads=8, fds=12, sockets=4
+    )
+    host.proc.add_process("cmsd")
+    (xrootd,) = [
+        proc for proc in psutil.process_iter(["name"]) if proc.info["name"] == "xrootd"
+    ]
+    assert xrootd.pid == pid
+    assert xrootd.cmdline() == ["xrootd", "-n", "data"]
+    assert xrootd.num_threads() == 8
+    assert xrootd.num_fds() == 16
+    assert len(psutil.net_connections("tcp4")) == 4
+    host.proc.remove_process(pid)
+    assert not xrootd.is_running()
+    assert len(psutil.net_connections("tcp4")) == 0
+
+
+def test_tracker(host):
+    data = host.proc.add_process("xrootd", ("-n", "data"), threads=4, cpu_load=2.0)
+    tracker = xrd_load.XrootdTracker(rescan_interval=60)
+    assert [proc.pid for proc in tracker.xrootds] == [data]
+    # the first measurement samples by sleeping on the simulated clock
+    assert tracker.cpu_usage(1.0) == pytest.approx(2.0)
+    host.clock.advance(30)
+    assert tracker.cpu_usage(1.0) == pytest.approx(2.0)
+    # new processes are found after the rescan interval
+    cache = host.proc.add_process("xrootd", ("-n", "cache"), threads=2)
+    assert tracker.num_threads() == 4
+    host.clock.advance(61)
+    assert tracker.num_threads() == 6
+    host.proc.remove_process(cache)
+    assert tracker.num_threads() == 4
+    assert tracker.scan_threads().threads == 4
+
+
+def test_release_trackers(host):
+    data = xrd_load.cached_tracker(60.0, xrd_load.XrdInstance("data"))
+    host.clock.advance(3000)
+    assert xrd_load.cached_tracker(60.0, xrd_load.XrdInstance("data")) is data
+    host.clock.advance(6001)
+    # trackers unused for ten rescans are released once another is needed
+    cache = xrd_load.cached_tracker(60.0, xrd_load.XrdInstance("cache"))
+    assert list(xrd_load.TRACKER_CACHE.values()) == [cache]
+    assert cache.discovery is not data.discovery
+
+
+def test_sensors(host):
+    host.proc.cpu_busy = 0.25
+    host.proc.memory_used = 0.75
+    host.proc.loadavg = (2.0, 1.0, 0.5)
+    host.proc.write_system()
+    sensors = cli_parser.compile_sensors(
+        60.0, *map(cli_parser.parse_sensor, ("pcpu", "pmem", "nloadq"))
+    )
+    assert report.sample_raw(sensors) == [25.0, 75.0, 2.0]
+
+
+def test_week_of_reports(host):
+    host.proc.add_process("xrootd", threads=16, fds=100, cpu_load=0.5)
+    reports = 7 * 24 * 60
+    sink = simulation.CollectSink(reports)
+    prunq, pcpu, pmem, ppag, pio = cli_parser.compile_sensors(
+        60.0,
+        *map(
+            cli_parser.parse_sensor,
+            ("100 * nloadq / 4", "pcpu", "pmem", "xrd.nthreads", "xrd.pcpu"),
+        ),
+    )
+    started = time.monotonic()
+    with pytest.raises(simulation.StopSimulation):
+        report.run_forever(
+            60.0,
+            600.0,
+            prunq=prunq,
+            pcpu=pcpu,
+            pmem=pmem,
+            ppag=ppag,
+            pio=pio,
+            sinks=[sink],
+        )
+    assert time.monotonic() - started < 60
+    assert len(sink.reports) == reports
+    # reports keep the interval, including after the rampup
+    assert all(
+        later.time - earlier.time == 60
+        for earlier, later in zip(sink.reports[1:], sink.reports[2:])
+    )
+    # the rampup decays from 100 to the actual values
+    assert sink.reports[0].values == [99, 99, 99, 99, 99]
+    assert sink.reports[-1].values == [12, 50, 25, 16, 50]
+
+
+def test_discovery_at_scale(host):
+    host.proc.add_idle_processes(SCALE)
+    xrootd = host.proc.add_process("xrootd", threads=4)
+    discovery = xrd_load.XrootdDiscovery(rescan_interval=60)
+    started = time.monotonic()
+    discovery.refresh(0)
+    assert [proc.pid for proc in discovery.select(xrd_load.ALL_INSTANCES)] == [xrootd]
+    assert time.monotonic() - started < SCALE / 1000
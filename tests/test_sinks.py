@@ -0,0 +1,158 @@
+import json
+import os
+import socket
+import threading
+import urllib.request
+
+import pytest
+
+from cms_perf import sinks
+from cms_perf.output import ReportWriter
+
+INF, NAN = float("inf"), float("nan")
+REPORT = sinks.Report(
+    1700000000.5, 60.0, ("prunq", "pcpu"), (10, 100), (10.5, 123.0), "7!"
+)
+
+
+class Collect(sinks.Sink):
+    def __init__(self, block: "threading.Event | None" = None):
+        self.batches = []
+        self.block = block
+
+    def send_batch(self, reports):
+        if self.block is not None:
+            self.block.wait()
+        self.batches.append(list(reports))
+
+
+def test_cmsd_sink():
+    read_fd, write_fd = os.pipe()
+    with open(read_fd, "rb") as read_stream:
+        sink = sinks.CmsdSink(ReportWriter(write_fd, write_fd))
+        sink.send(REPORT)
+        sink.close()
+        os.close(write_fd)
+        assert read_stream.read() == b"10 100 7!\n"
+
+
+def test_buffered_sink():
+    block = threading.Event()
+    collect = Collect(block)
+    sink = sinks.BufferedSink(collect, capacity=3)
+    for index in range(6):
+        sink.send(REPORT._replace(time=index))
+    block.set()
+    sink.close()
+    # reports that did not fit into the buffer are dropped in favour of newer ones
+    received = [report.time for batch in collect.batches for report in batch]
+    assert received[-3:] == [3, 4, 5]
+    assert sink.dropped + len(received) == 6
+    assert len(collect.batches) <= 2
+
+
+def test_json_lines_sink(tmp_path):
+    path = tmp_path / "reports.jsonl"
+    sink = sinks.sink_from_spec(f"json:{path}")
+    sink.send(REPORT)
+    sink.send(REPORT)
+    sink.close()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {
+        "time": REPORT.time,
+        "interval": 60.0,
+        "values": {"prunq": 10, "pcpu": 100},
+        "raw": {"prunq": 10.5, "pcpu": 123.0},
+        "summary": "7!",
+    }
+
+
+def test_json_lines_sink_special_values(tmp_path):
+    path = tmp_path / "reports.jsonl"
+    sink = sinks.JsonLinesSink(str(path))
+    sink.send(REPORT._replace(raw_values=(INF, NAN)))
+    sink.close()
+    # strict parsers reject Infinity and NaN
+    report = json.loads(
+        path.read_text(), parse_constant=lambda name: pytest.fail(f"got {name}")
+    )
+    assert report["raw"] == {"prunq": None, "pcpu": None}
+
+
+EXPECTED_GRAPHITE = (
+    b"cms.perf.prunq 10 1700000000\n"
+    b"cms.perf.pcpu 100 1700000000\n"
+    b"cms.perf.raw.prunq 10.5 1700000000\n"
+    b"cms.perf.raw.pcpu 123.0 1700000000\n"
+)
+
+
+def test_graphite_udp_sink():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as server:
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(5)
+        port = server.getsockname()[1]
+        sink = sinks.GraphiteSink(("127.0.0.1", port), "udp", "cms.perf")
+        sink.send(REPORT)
+        assert server.recv(4096) == EXPECTED_GRAPHITE
+        sink.close()
+
+
+def test_graphite_tcp_sink():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        server.settimeout(5)
+        port = server.getsockname()[1]
+        sink = sinks.sink_from_spec(f"graphite+tcp://127.0.0.1:{port}/cms/perf")
+        sink.send(REPORT)
+        connection, _ = server.accept()
+        with connection:
+            connection.settimeout(5)
+            sink.close()
+            received = b""
+            while len(received) < len(EXPECTED_GRAPHITE):
+                received += connection.recv(4096)
+        assert received == EXPECTED_GRAPHITE
+
+
+def test_openmetrics_sink():
+    sink = sinks.OpenMetricsSink(("127.0.0.1", 0))
+    try:
+        sink.send(REPORT)
+        host, port = sink.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            assert "openmetrics-text" in response.headers["Content-Type"]
+            body = response.read().decode()
+    finally:
+        sink.close()
+    assert 'cms_perf_load{field="pcpu"} 100\n' in body
+    assert 'cms_perf_raw{field="pcpu"} 123.0\n' in body
+    assert body.endswith("# EOF\n")
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(12, "12"), (12.5, "12.5"), (INF, "+Inf"), (-INF, "-Inf"), (NAN, "NaN")],
+)
+def test_format_number(value, expected):
+    assert sinks.format_number(value) == expected
+
+
+def test_openmetrics_sink_special_values():
+    sink = sinks.OpenMetricsSink(("127.0.0.1", 0))
+    try:
+        sink.send(REPORT._replace(raw_values=(-INF, NAN)))
+        host, port = sink.address
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        sink.close()
+    assert 'cms_perf_raw{field="prunq"} -Inf\n' in body
+    assert 'cms_perf_raw{field="pcpu"} NaN\n' in body
+
+
+def test_unknown_sink():
+    with pytest.raises(ValueError):
+        sinks.sink_from_spec("carrier+pigeon://home")
@@ -0,0 +1,181 @@
+import threading
+
+import psutil
+import pytest
+
+from cms_perf.setup import cli_parser
+from cms_perf.sensors import sensor, snapshot
+
+
+def test_read_once_per_tick():
+    snap = snapshot.SystemSnapshot()
+    calls = []
+
+    def reader():
+        calls.append(snap.tick)
+        return len(calls)
+
+    assert snap.read("test", reader) == snap.read("test", reader) == 1
+    snap.advance()
+    assert snap.read("test", reader) == snap.read("test", reader) == 2
+    assert calls == [0, 1]
+
+
+def test_release_unread():
+    snap = snapshot.SystemSnapshot()
+    snap.read("kept", lambda: 1)
+    snap.read("dropped", lambda: 2)
+    snap.advance()
+    snap.read("kept", lambda: 1)
+    snap.advance()
+    # sources not read in the previous tick are released
+    assert list(snap._sources) == ["kept"]
+    assert list(snap._locks) == ["kept"]
+
+
+def test_read_once_concurrently():
+    snap = snapshot.SystemSnapshot()
+    calls = []
+    barrier = threading.Barrier(8)
+    values = []
+
+    def reader():
+        calls.append(1)
+        return len(calls)
+
+    def read():
+        barrier.wait()
+        values.append(snap.read("test", reader))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert values == [1] * 8
+    assert len(calls) == 1
+
+
+def test_memory():
+    memory = snapshot.read_memory()
+    assert memory.pmem == pytest.approx(psutil.virtual_memory().percent, abs=2)
+    assert memory.pswap == pytest.approx(psutil.swap_memory().percent, abs=2)
+
+
+def test_shared_sources(monkeypatch):
+    snap = snapshot.SystemSnapshot()
+    monkeypatch.setattr(sensor, "SNAPSHOT", snap)
+    calls = []
+
+    def getloadavg():
+        calls.append("loadavg")
+        return (1.0, 2.0, 3.0)
+
+    monkeypatch.setattr(snapshot, "read_loadavg", getloadavg)
+    for _ in range(3):
+        sensor.system_prunq(interval=1)
+        sensor.system_loadq(interval=1)
+    assert sensor.system_loadq(interval=120) == 2.0
+    assert calls == ["loadavg"]
+
+
+PROC_STAT = """\
+cpu  {total}
+cpu0 {cpu0} 0 0
+cpu1 {cpu1} 0 0
+cpu2 {cpu2} 0 0
+cpu3 {cpu3} 0 0
+intr 103113 0 0 0
+procs_running 2
+procs_blocked 0
+"""
+
+
+def cpu_line(busy: int, idle: int, iowait: int = 0) -> str:
+    # user nice system idle iowait irq softirq steal
+    return f"{busy} 0 0 {idle} {iowait} 0 0 0"
+
+
+@pytest.fixture
+def fake_proc(tmp_path, monkeypatch):
+    monkeypatch.setattr(psutil, "PROCFS_PATH", str(tmp_path))
+    monkeypatch.setattr(snapshot.time, "sleep", lambda _: None)
+
+    def write_stat(*cpus):
+        (tmp_path / "stat").write_text(
+            PROC_STAT.format(
+                total="0 0 0 0 0 0 0 0",
+                **{f"cpu{index}": cpu_line(*cpu) for index, cpu in enumerate(cpus)},
+            )
+        )
+
+    return write_stat
+
+
+def test_cpu_monitor(fake_proc):
+    monitor = snapshot.CpuMonitor()
+    fake_proc((0, 0), (0, 0), (0, 0), (0, 0))
+    assert monitor.measure(1).fractions == [0.0] * 4
+    fake_proc((100, 0), (50, 50), (0, 50, 50), (25, 75))
+    utilisation = monitor.measure(1)
+    assert list(utilisation.ids) == [0, 1, 2, 3]
+    assert utilisation.fractions == [1.0, 0.5, 0.0, 0.25]
+    assert utilisation.overall == 175 / 400
+    fake_proc((200, 0), (50, 150), (0, 50, 50), (25, 75))
+    assert monitor.measure(1).fractions == [1.0, 0.0, 0.0, 0.0]
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("pcpu", 175 / 4),
+        ("pcpu(mean)", 175 / 4),
+        ("pcpu(max)", 100),
+        ("pcpu(min)", 0),
+        ("pcpu(pctl, 50)", 25),
+        ("pcpu(pctl, 75)", 50),
+        ("pcpu(pctl, 100)", 100),
+        ("pcpu(pctl)", 100),
+    ],
+)
+def test_pcpu_stats(fake_proc, monkeypatch, source, expected):
+    monkeypatch.setattr(sensor, "SNAPSHOT", snapshot.SystemSnapshot())
+    fake_proc((0, 0), (0, 0), (0, 0), (0, 0))
+    (pcpu,) = cli_parser.compile_sensors(1, cli_parser.parse_sensor(source))
+    pcpu()
+    sensor.SNAPSHOT.advance()
+    fake_proc((100, 0), (50, 50), (0, 50, 50), (25, 75))
+    assert pcpu() == expected
+
+
+def test_pcpu_numa(fake_proc, monkeypatch, tmp_path):
+    for node, cpulist in enumerate(["0,2", "1,3"]):
+        node_dir = tmp_path / f"devices/system/node/node{node}"
+        node_dir.mkdir(parents=True)
+        (node_dir / "cpulist").write_text(cpulist + "\n")
+    monkeypatch.setattr(snapshot, "SYSFS_PATH", str(tmp_path))
+    snapshot.numa_cpus.cache_clear()
+    monkeypatch.setattr(sensor, "SNAPSHOT", snapshot.SystemSnapshot())
+    fake_proc((0, 0), (0, 0), (0, 0), (0, 0))
+    sensor.cpu_utilization(1, sensor.CpuStat.numa, 0)
+    sensor.SNAPSHOT.advance()
+    fake_proc((100, 0), (50, 50), (0, 50, 50), (25, 75))
+    try:
+        assert sensor.cpu_utilization(1, sensor.CpuStat.numa, 0) == 50
+        assert sensor.cpu_utilization(1, sensor.CpuStat.numa, 1) == 37.5
+        with pytest.raises(ValueError):
+            sensor.cpu_utilization(1, sensor.CpuStat.numa, 2)
+    finally:
+        snapshot.numa_cpus.cache_clear()
+
+
+def test_numa_cpulist(tmp_path, monkeypatch):
+    node_dir = tmp_path / "devices/system/node/node0"
+    node_dir.mkdir(parents=True)
+    (node_dir / "cpulist").write_text("0-3,8-9,12\n")
+    monkeypatch.setattr(snapshot, "SYSFS_PATH", str(tmp_path))
+    snapshot.numa_cpus.cache_clear()
+    try:
+        assert snapshot.numa_cpus(0) == {0, 1, 2, 3, 8, 9, 12}
+    finally:
+        snapshot.numa_cpus.cache_clear()
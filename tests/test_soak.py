@@ -0,0 +1,119 @@
+import gc
+import os
+
+import psutil
+import pytest
+
+from cms_perf import budget, export, report
+from cms_perf.setup import cli, reload
+from cms_perf.sinks import Report, Sink
+
+from . import simulation
+
+pytestmark = pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+
+#: number of reports to soak for, e.g. several millions for a thorough check
+TICKS = int(os.environ.get("CMS_PERF_SOAK_TICKS", 1000))
+#: number of distinct XRootD instance names, as bounded caches may hold each
+INSTANCES = 1000
+#: growth in bytes of Python objects and resident memory considered a leak
+MAX_TRACED_GROWTH = 64 * 1024
+MAX_RSS_GROWTH = 8 * 2**20
+
+CONFIG = """\
+interval = 60
+rampup = 600
+budget = 50
+prunq = 100 * nloadq / ncores
+pcpu = max(pcpu, xrd.pcpu({instance}))
+pmem = xrd.pmem({instance})
+ppag = xrd.nthreads({instance}) + xrd.ptcpu(*, pctl, 90)
+pio = xrd.nfds(inst{other}*) / 10 + pspace(/)
+"""
+
+
+class CountSink(Sink):
+    """Sink that counts reports without retaining them"""
+
+    def __init__(self, count: int, on_report):
+        self.count = count
+        self.on_report = on_report
+        self.received = 0
+        self.latest: "Report | None" = None
+
+    def send(self, report: Report):
+        self.received += 1
+        self.latest = report
+        self.on_report(self.received)
+        if self.received >= self.count:
+            raise simulation.StopSimulation
+
+
+def write_config(path, tick: int):
+    """Write the config of ``tick``, using the xrootd instance started last"""
+    instance = f"inst{tick // 10 % INSTANCES}"
+    with open(f"{path}.swp", "w") as out_stream:
+        out_stream.write(CONFIG.format(instance=instance, other=tick // 70 % 4))
+    os.replace(f"{path}.swp", path)
+
+
+def test_soak(tmp_path, monkeypatch):
+    host = simulation.SimulatedHost(str(tmp_path / "proc"), monkeypatch)
+    monkeypatch.setattr(budget, "CALL_COSTS", {})
+    monkeypatch.setattr(export, "RECORDED_CALLS", {})
+    config = tmp_path / "cms_perf.ini"
+    write_config(config, 0)
+    argv = [f"@{config}"]
+    options = cli.CLI.parse_args(argv)
+    sensors = cli.compile_options(options)
+    reloader = reload.ConfigReloader(argv, options, sensors)
+    xrootds = [
+        host.proc.add_process(
+            "xrootd", ("-n", f"inst{index}"), threads=4, fds=8, cpu_load=0.5
+        )
+        for index in range(4)
+    ]
+    watch = simulation.MemoryWatch()
+    warmup = TICKS // 3
+
+    def on_report(tick: int):
+        # xrootd instances come and go
+        if tick % 10 == 0:
+            host.proc.remove_process(xrootds.pop(0))
+            xrootds.append(
+                host.proc.add_process(
+                    "xrootd",
+                    ("-n", f"inst{tick // 10 % INSTANCES}"),
+                    threads=tick % 7 + 1,
+                    fds=tick % 13,
+                    sockets=tick % 3,
+                    cpu_load=0.25,
+                )
+            )
+            # the configuration follows the instances
+            write_config(config, tick)
+        if tick >= warmup and tick % (TICKS // 40 or 1) == 0:
+            gc.collect()
+            watch.sample(tick)
+
+    sink = CountSink(TICKS, on_report)
+    watch.start()
+    try:
+        with pytest.raises(simulation.StopSimulation):
+            report.run_forever(
+                60.0,
+                600.0,
+                **dict(zip(cli.SENSOR_FIELDS, sensors)),
+                budget=budget.CpuBudget(50),
+                reloader=reloader,
+                sinks=[sink],
+            )
+        growth = watch.growth()
+        top_growth = watch.top_growth()
+    finally:
+        watch.stop()
+        reloader.watcher.close()
+    assert sink.received == TICKS
+    assert sink.latest is not None
+    assert growth.traced < MAX_TRACED_GROWTH, top_growth
+    assert growth.rss < MAX_RSS_GROWTH, top_growth
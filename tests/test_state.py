@@ -0,0 +1,95 @@
+import json
+import logging
+
+import psutil
+import pytest
+
+from cms_perf import report, state
+from cms_perf.sensors import snapshot
+from cms_perf.setup import cli
+from cms_perf.sinks import Report
+
+from . import simulation
+
+
+def checkpoint_of(path, options, rampup: float = 0.0, raw_values=(12.5, 150.0)):
+    sink = state.StateCheckpoint(str(path), options, rampup=rampup)
+    sink.send(Report(1.0, 60.0, ("pcpu", "pio"), [12, 100], list(raw_values)))
+    sink.close()
+
+
+def test_resume_checkpoint(tmp_path):
+    path = tmp_path / "state"
+    options = cli.CLI.parse_args(["--interval", "60"])
+    checkpoint_of(path, options, rampup=300.0)
+    checkpoint = state.load_checkpoint(str(path), state.config_digest(options))
+    assert checkpoint is not None
+    assert checkpoint.raw_values == [12.5, 150.0]
+    assert checkpoint.interval == 60.0
+    assert checkpoint.rampup_progress() == pytest.approx(300.0, abs=1.0)
+    # the downtime since the checkpoint counts against the rampup
+    outdated = checkpoint._replace(time=checkpoint.time - 200)
+    assert outdated.rampup_progress() == pytest.approx(100.0, abs=1.0)
+
+
+@pytest.mark.parametrize(
+    "argv, change",
+    [
+        (["--pcpu", "max(pcpu, pio)"], {}),
+        (["--interval", "120"], {}),
+        ([], {"time": -3600}),
+        ([], {"boot_time": -3600}),
+        ([], {"version": 1000}),
+    ],
+)
+def test_ignore_checkpoint(tmp_path, argv, change):
+    path = tmp_path / "state"
+    checkpoint_of(path, cli.CLI.parse_args(["--interval", "60"]))
+    content = json.loads(path.read_text())
+    for key, offset in change.items():
+        content[key] += offset
+    path.write_text(json.dumps(content))
+    options = cli.CLI.parse_args(["--interval", "60", *argv])
+    assert state.load_checkpoint(str(path), state.config_digest(options)) is None
+
+
+def test_invalid_checkpoint(tmp_path, caplog):
+    path = tmp_path / "state"
+    options = cli.CLI.parse_args([])
+    assert state.load_checkpoint(str(path), state.config_digest(options)) is None
+    path.write_text("{")
+    with caplog.at_level(logging.WARNING):
+        assert state.load_checkpoint(str(path), state.config_digest(options)) is None
+    assert "ignoring invalid state" in caplog.text
+
+
+def test_resume_cpu(monkeypatch):
+    previous = snapshot.SystemSnapshot()
+    assert previous.cpu_baseline() is None
+    previous.cpu_utilisation(0.01)
+    baseline = previous.cpu_baseline()
+    assert baseline is not None
+    resumed = snapshot.SystemSnapshot()
+    resumed.resume_cpu(*baseline)
+
+    def sleep(seconds: float):
+        raise AssertionError("resumed CPU utilisation must not sample first")
+
+    monkeypatch.setattr(snapshot.time, "sleep", sleep)
+    assert 0 <= resumed.cpu_utilisation(1.0).overall <= 1
+
+
+@pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+@pytest.mark.parametrize("resumed, first_value", [(0, 100), (300, 50), (600, 0)])
+def test_resume_rampup(tmp_path, monkeypatch, resumed: float, first_value: int):
+    simulation.SimulatedHost(str(tmp_path / "proc"), monkeypatch)
+    sink = simulation.CollectSink(1)
+    with pytest.raises(simulation.StopSimulation):
+        report.run_forever(
+            60.0,
+            600.0,
+            *[lambda: 0.0] * 5,
+            sinks=[sink],
+            resumed=resumed,
+        )
+    assert sink.reports[0].values == [first_value] * 5
@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+
+import pytest
+import psutil
+
+from cms_perf.sensors import storage
+from cms_perf.setup import cli_parser
+
+
+@pytest.fixture
+def fake_mounts(tmp_path, monkeypatch):
+    """Mount points ``data1``, ``data2`` and ``other`` in ``tmp_path``"""
+    proc_self = tmp_path / "proc" / "self"
+    proc_self.mkdir(parents=True)
+    mounts = {name: tmp_path / name for name in ("data1", "data2", "other")}
+    for mount in mounts.values():
+        mount.mkdir()
+    (proc_self / "mounts").write_text(
+        "proc /proc proc rw 0 0\n"
+        + "".join(f"/dev/sdx {mount} ext4 rw 0 0\n" for mount in mounts.values())
+    )
+    monkeypatch.setattr(psutil, "PROCFS_PATH", str(tmp_path / "proc"))
+    return mounts
+
+
+def test_read_mount_points(tmp_path, monkeypatch):
+    (tmp_path / "self").mkdir()
+    (tmp_path / "self" / "mounts").write_text(
+        "/dev/sda1 / ext4 rw 0 0\nserver:/export /mnt/with\\040space nfs4 rw 0 0\n"
+    )
+    monkeypatch.setattr(psutil, "PROCFS_PATH", str(tmp_path))
+    assert storage.read_mount_points() == ["/", "/mnt/with space"]
+
+
+def test_read_oss_paths(tmp_path):
+    config = tmp_path / "xrootd.cfg"
+    config.write_text(
+        "all.export /store\n"
+        "oss.localroot /data/xrootd  # local namespace\n"
+        "oss.space public /data/disk*\n"
+        "oss.space meta /srv/meta xa\n"
+        "# oss.space disabled /srv/old\n"
+    )
+    assert storage.read_oss_paths(str(config)) == [
+        "/data/xrootd",
+        "/data/disk*",
+        "/srv/meta",
+    ]
+
+
+@pytest.mark.parametrize(
+    "path, mount_point",
+    [
+        ("/data/disk1/store", "/data/disk1"),
+        ("/data/disk1", "/data/disk1"),
+        ("/data/disk10", "/"),
+        ("/srv/meta/", "/srv"),
+    ],
+)
+def test_mount_point_of(path, mount_point):
+    mount_points = ["/", "/data/disk1", "/srv", "/data/disk2"]
+    assert storage.mount_point_of(path, mount_points) == mount_point
+
+
+def test_percentages():
+    result = os.statvfs_result((4096, 4096, 100, 30, 20, 1000, 250, 200, 0, 255))
+    # used 70 of 70 + 20 available blocks, as shown by df
+    assert storage.space_percentage(result) == pytest.approx(100 * 70 / 90)
+    assert storage.inode_percentage(result) == pytest.approx(100 * 750 / 950)
+    pseudo = os.statvfs_result((4096, 4096, 0, 0, 0, 0, 0, 0, 0, 255))
+    assert storage.space_percentage(pseudo) is None
+    assert storage.inode_percentage(pseudo) is None
+
+
+def test_monitor_select(fake_mounts, tmp_path):
+    monitor = storage.MountMonitor(ttl=1, timeout=1)
+    data_glob = storage.MountPattern(f"{tmp_path}/data*")
+    assert monitor.select(data_glob) == [
+        str(fake_mounts["data1"]),
+        str(fake_mounts["data2"]),
+    ]
+    config = tmp_path / "xrootd.cfg"
+    config.write_text(
+        f"oss.localroot {fake_mounts['other']}/xrootd\n"
+        f"oss.space public {tmp_path}/data2*\n"
+    )
+    assert monitor.select(storage.MountPattern(f"@{config}")) == [
+        str(fake_mounts["data2"]),
+        str(fake_mounts["other"]),
+    ]
+
+
+def test_monitor_statvfs(fake_mounts):
+    monitor = storage.MountMonitor(ttl=60, timeout=1)
+    mount_points = [str(mount) for mount in fake_mounts.values()]
+    results = monitor.statvfs(mount_points)
+    assert sorted(results) == sorted(mount_points)
+    assert results[mount_points[0]] == os.statvfs(mount_points[0])
+    # results are reused until they expire
+    assert monitor.statvfs(mount_points) == results
+    assert monitor.statvfs(["/does/not/exist"]) == {}
+
+
+def test_monitor_timeout(fake_mounts, monkeypatch, caplog):
+    hung = str(fake_mounts["data1"])
+    release = threading.Event()
+    calls = []
+
+    def statvfs(path):
+        calls.append(path)
+        if path == hung:
+            release.wait()
+        return os.statvfs_result((4096, 4096, 100, 50, 50, 0, 0, 0, 0, 255))
+
+    monkeypatch.setattr(storage.os, "statvfs", statvfs)
+    monitor = storage.MountMonitor(ttl=0, timeout=0.1)
+    mount_points = [str(mount) for mount in fake_mounts.values()]
+    try:
+        assert sorted(monitor.statvfs(mount_points)) == sorted(mount_points[1:])
+        # the hung mount is neither awaited nor inspected again until it responds
+        for _ in range(5):
+            started = time.monotonic()
+            assert sorted(monitor.statvfs(mount_points)) == sorted(mount_points[1:])
+            assert time.monotonic() - started < monitor.timeout
+        assert calls.count(hung) == 1
+        hangs = [record for record in caplog.records if "did not respond" in record.msg]
+        assert len(hangs) == 1
+    finally:
+        release.set()
+    monitor._pending[hung].result(timeout=1)
+    assert sorted(monitor.statvfs(mount_points)) == sorted(mount_points)
+
+
+def test_monitor_many_hung(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def statvfs(path):
+        if os.path.basename(path).startswith("hung"):
+            release.wait()
+        return os.statvfs_result((4096, 4096, 100, 50, 50, 0, 0, 0, 0, 255))
+
+    monkeypatch.setattr(storage.os, "statvfs", statvfs)
+    monitor = storage.MountMonitor(ttl=0, timeout=0.1, workers=4)
+    hung = [str(tmp_path / f"hung{index}") for index in range(4)]
+    try:
+        assert monitor.statvfs(hung) == {}
+        # hung mounts do not hold up the inspection of other mounts
+        assert list(monitor.statvfs([str(tmp_path)])) == [str(tmp_path)]
+    finally:
+        release.set()
+    for mount_point in hung:
+        monitor._pending[mount_point].result(timeout=1)
+    assert sorted(monitor.statvfs(hung)) == hung
+    # the replacements of stuck workers are retired again
+    assert monitor._workers.workers == 4
+
+
+def test_monitor_workers(tmp_path, monkeypatch):
+    threads = set()
+
+    def statvfs(path):
+        threads.add(threading.get_ident())
+        return os.statvfs_result((4096, 4096, 100, 50, 50, 0, 0, 0, 0, 255))
+
+    monkeypatch.setattr(storage.os, "statvfs", statvfs)
+    monitor = storage.MountMonitor(ttl=0, timeout=1, workers=4)
+    mount_points = [str(tmp_path / f"data{index}") for index in range(16)]
+    for _ in range(10):
+        assert sorted(monitor.statvfs(mount_points)) == sorted(mount_points)
+    # inspections are run by the same few threads on every refresh
+    assert len(threads) <= 4
+
+
+@pytest.mark.parametrize(
+    "stat, expected", [("", 75.0), (", max", 75.0), (", mean", 50.0), (", min", 25.0)]
+)
+def test_pspace(fake_mounts, tmp_path, monkeypatch, stat, expected):
+    used = {str(fake_mounts["data1"]): 25, str(fake_mounts["data2"]): 75}
+
+    def statvfs(path):
+        free = 100 - used[path]
+        return os.statvfs_result((4096, 4096, 100, free, free, 100, free, free, 0, 255))
+
+    monkeypatch.setattr(storage.os, "statvfs", statvfs)
+    monkeypatch.setattr(storage, "MONITOR_CACHE", {})
+    for sensor_name in ("pspace", "pinodes"):
+        source = f"{sensor_name}({tmp_path}/data*{stat})"
+        (sensor,) = cli_parser.compile_sensors(1.0, cli_parser.parse_sensor(source))
+        assert sensor() == expected
@@ -1,3 +1,9 @@
+import mmap
+import os
+import threading
+import time
+import timeit
+
 import pytest
 import psutil
 
@@ -22,13 +28,291 @@ def test_tracker():
 @mimicry.skipif_unsuported
 @pytest.mark.skipif(_any_xrootds(), reason="Ambient xrootd processes present")
 def test_tracker_cache_procs():
-    tracker = xrd_load.XrootdTracker(rescan_interval=1)
+    tracker = xrd_load.XrootdTracker(rescan_interval=0.2)
     assert not tracker.xrootds
-    # automatically rescan if there are no target processes
-    assert tracker.xrootds is not tracker.xrootds
+    # without target processes, rescan only once the previous scan expired
+    assert tracker.xrootds is tracker.xrootds
+    generation = tracker.discovery.generation
     with mimicry.Process("xrootd", threads=20, files=20):
+        time.sleep(0.3)
         found_procs = tracker.xrootds
+        assert tracker.discovery.generation == generation + 1
         assert len(found_procs) == 1
         assert found_procs is tracker.xrootds
     # automatically rescan if existing process died
     assert found_procs is not tracker.xrootds
+
+
+@pytest.mark.parametrize(
+    "cmdline, name",
+    [
+        (["xrootd", "-c", "/etc/xrootd.cfg"], "anon"),
+        (["/usr/bin/xrootd", "-n", "data", "-c", "/etc/xrootd.cfg"], "data"),
+        (["xrootd -c /etc/xrootd.cfg -n proxy", "", ""], "proxy"),
+        (["xrootd", "-n"], "anon"),
+    ],
+)
+def test_instance_name(cmdline, name):
+    assert xrd_load.instance_name(cmdline) == name
+
+
+@mimicry.skipif_unsuported
+def test_tracker_instances(tmp_path):
+    discovery = xrd_load.XrootdDiscovery(rescan_interval=60)
+    trackers = {
+        instance: xrd_load.XrootdTracker(
+            60, instance=xrd_load.XrdInstance(instance), discovery=discovery
+        )
+        for instance in ("data", "cache", "*", "d*")
+    }
+    data = mimicry.Process("xrootd", threads=20, files=20, args=("-n", "data"))
+    cache = mimicry.Process("xrootd", threads=10, files=10, args=("-n", "cache"))
+    with data, cache:
+        assert trackers["data"].num_threads() >= 20
+        assert trackers["cache"].num_threads() >= 10
+        assert trackers["data"].num_threads() < trackers["*"].num_threads()
+        assert trackers["data"].xrootds == trackers["d*"].xrootds
+        # all trackers share a single scan
+        assert discovery.generation == 1
+        pidfile = tmp_path / "xrootd.pid"
+        pidfile.write_text(f"{cache.pid}\n")
+        by_pidfile = xrd_load.XrootdTracker(
+            60, instance=xrd_load.XrdInstance(str(pidfile)), discovery=discovery
+        )
+        assert by_pidfile.num_fds() == trackers["cache"].num_fds()
+
+
+@pytest.fixture
+def fake_proc(tmp_path, monkeypatch):
+    """Provide the current process and a fake ``/proc/<pid>`` for it"""
+    proc = psutil.Process()
+    monkeypatch.setattr(psutil, "PROCFS_PATH", str(tmp_path / "proc"))
+    monkeypatch.setattr(xrd_load.snapshot, "SYSFS_PATH", str(tmp_path / "sys"))
+    proc_dir = tmp_path / "proc" / str(os.getpid())
+    proc_dir.mkdir(parents=True)
+    return proc, proc_dir
+
+
+@pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+def test_read_proc_files(fake_proc):
+    proc, proc_dir = fake_proc
+    ticks = xrd_load.CLOCK_TICKS
+    proc_dir.joinpath("stat").write_text(
+        f"1234 (xrootd (-n) x) S 1 2 3 4 5 6 7 8 9 10 {3 * ticks} {ticks} 0 0\n"
+    )
+    assert xrd_load.read_cpu_time(proc) == 4.0
+    proc_dir.joinpath("statm").write_text("1000 250 100 1 0 500 0\n")
+    assert xrd_load.read_rss(proc) == 250 * mmap.PAGESIZE
+    proc_dir.joinpath("smaps_rollup").write_text(
+        "00400000-7fff [rollup]\nRss:  1000 kB\nPss:  600 kB\n"
+    )
+    assert xrd_load.read_pss(proc) == 600 * 1024
+
+
+@pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+@pytest.mark.parametrize(
+    "cgroup, limits, expected",
+    [
+        ("0::/system.slice/xrootd.service\n", {}, None),
+        ("0::/a/b\n", {"fs/cgroup/a/b/memory.max": "max\n"}, None),
+        (
+            "0::/a/b\n",
+            {"fs/cgroup/a/b/memory.max": "4096\n", "fs/cgroup/a/memory.max": "2048"},
+            2048,
+        ),
+        (
+            "4:memory:/a\n0::/\n",
+            {"fs/cgroup/memory/a/memory.limit_in_bytes": "8192\n"},
+            8192,
+        ),
+        (
+            "4:cpu,memory:/a\n",
+            {"fs/cgroup/memory/a/memory.limit_in_bytes": f"{2**63 - 4096}\n"},
+            None,
+        ),
+    ],
+)
+def test_read_cgroup_limit(fake_proc, cgroup, limits, expected):
+    proc, proc_dir = fake_proc
+    proc_dir.joinpath("cgroup").write_text(cgroup)
+    sys_path = proc_dir.parent.parent / "sys"
+    for path, limit in limits.items():
+        sys_path.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        sys_path.joinpath(path).write_text(limit)
+    assert xrd_load.read_cgroup_limit(proc) == expected
+
+
+@pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+def test_fd_counter_listing(fake_proc, monkeypatch):
+    proc, proc_dir = fake_proc
+    monkeypatch.setattr(xrd_load, "FD_DIR_SIZE", False)
+    counter = xrd_load.FdCounter(budget=4)
+    (proc_dir / "fd").mkdir()
+
+    def open_fds(count):
+        for fd in range(count):
+            proc_dir.joinpath("fd", str(fd)).touch()
+
+    open_fds(3)
+    assert counter.count([proc]) == 3
+    open_fds(8)
+    assert counter.count([proc]) == 8
+    # long listings are reused for one more count per budget
+    open_fds(12)
+    assert [counter.count([proc]) for _ in range(3)] == [8, 8, 12]
+    # processes that exited count as none and are forgotten
+    (proc_dir / "fd").rename(proc_dir / "closed")
+    assert xrd_load.FdCounter().count([proc]) == 0
+    assert counter.count([]) == 0
+    assert not counter._listings
+
+
+def test_fd_counter_concurrent(fake_proc, monkeypatch):
+    proc, proc_dir = fake_proc
+    monkeypatch.setattr(xrd_load, "FD_DIR_SIZE", False)
+    counter = xrd_load.FdCounter(budget=1)
+    (proc_dir / "fd").mkdir()
+    proc_dir.joinpath("fd", "0").touch()
+    errors = []
+
+    def count_often(procs):
+        try:
+            for _ in range(500):
+                counter.count(procs)
+        except Exception as err:
+            errors.append(err)
+
+    # counting processes and forgetting them may overlap
+    threads = [
+        threading.Thread(target=count_often, args=(procs,))
+        for procs in ([proc], [], [proc], [])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+#: number of file descriptors of a process at scale
+FDS_AT_SCALE = 5000
+
+
+@mimicry.skipif_unsuported
+def test_fd_counter_at_scale(monkeypatch):
+    monkeypatch.setattr(xrd_load, "FD_DIR_SIZE", None)
+    counter = xrd_load.FdCounter()
+    few = mimicry.Process("xrootd", threads=2, files=10, lifetime=10)
+    many = mimicry.Process("xrootd", threads=2, files=FDS_AT_SCALE, lifetime=10)
+    with few, many:
+        procs = [psutil.Process(few.pid), psutil.Process(many.pid)]
+        assert counter.count(procs[1:]) >= FDS_AT_SCALE
+        assert counter.count(procs[1:]) == len(os.listdir(f"/proc/{many.pid}/fd"))
+        if not xrd_load.FD_DIR_SIZE:
+            pytest.skip("Kernel does not count file descriptors of /proc/<pid>/fd")
+        durations = [
+            min(
+                timeit.repeat(
+                    lambda proc=proc: counter.count([proc]), number=100, repeat=5
+                )
+            )
+            for proc in procs
+        ]
+    # counting takes the same time for any number of file descriptors
+    assert durations[1] < 3 * durations[0]
+
+
+@mimicry.skipif_unsuported
+def test_tracker_usage():
+    tracker = xrd_load.XrootdTracker(rescan_interval=1)
+    with mimicry.Process("xrootd", threads=20, files=20):
+        assert 0 <= tracker.cpu_usage(0.01)
+        assert 0 <= tracker.cpu_usage(0.01)
+        assert 0 < tracker.memory_usage(xrd_load.MemoryKind.rss)
+        assert 0 < tracker.memory_usage(xrd_load.MemoryKind.pss)
+        limit = tracker.memory_limit()
+        assert limit is None or limit > 0
+
+
+def test_tracker_memory_limit_rescan(monkeypatch):
+    tracker = xrd_load.XrootdTracker(rescan_interval=60)
+    monkeypatch.setattr(tracker, "_refresh_xrootds", lambda: False)
+    tracker._xrootd_procs = [psutil.Process(), psutil.Process(os.getppid())]
+
+    def read_cgroup_limit(proc):
+        # a concurrent rescan clears the known limits
+        tracker._memory_limits.clear()
+        return 1024
+
+    monkeypatch.setattr(xrd_load, "read_cgroup_limit", read_cgroup_limit)
+    assert tracker.memory_limit() == 1024
+
+
+def test_cached_tracker_concurrent(monkeypatch):
+    monkeypatch.setattr(xrd_load, "TRACKER_CACHE", {})
+    monkeypatch.setattr(xrd_load, "DISCOVERY_CACHE", {})
+    barrier = threading.Barrier(8)
+    trackers = []
+
+    def get_tracker(interval):
+        barrier.wait()
+        trackers.append(xrd_load.cached_tracker(interval))
+
+    # fields of several intervals may be evaluated at the same time
+    threads = [
+        threading.Thread(target=get_tracker, args=(interval,))
+        for interval in (1, 1, 1, 1, 600, 600, 600, 600)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(trackers) == 8
+    assert len({id(tracker) for tracker in trackers}) == 2
+    assert len({id(tracker.discovery) for tracker in trackers}) == 2
+
+
+def _write_tasks(proc_dir, tasks):
+    for tid, (state, ticks) in tasks.items():
+        task_dir = proc_dir / "task" / str(tid)
+        task_dir.mkdir(parents=True, exist_ok=True)
+        task_dir.joinpath("stat").write_text(
+            f"{tid} (xrd (worker)) {state} 1 2 3 4 5 6 7 8 9 10 {ticks} 0 0 0\n"
+        )
+
+
+@pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+def test_task_scanner(fake_proc):
+    proc, proc_dir = fake_proc
+    scanner = xrd_load.TaskScanner()
+    ticks = xrd_load.CLOCK_TICKS
+    _write_tasks(proc_dir, {1: ("R", 0), 2: ("S", 0), 3: ("D", 0), 4: ("S", 0)})
+    scan = scanner.scan([proc])
+    assert (scan.threads, scan.sampled, scan.active) == (4, 4, 2)
+    assert scan.cpu_usage == []
+    _write_tasks(proc_dir, {1: ("R", 10 * ticks), 2: ("S", 0)})
+    scan = scanner.scan([proc])
+    assert len(scan.cpu_usage) == 4
+    assert max(scan.cpu_usage) > 0 == min(scan.cpu_usage)
+
+
+@pytest.mark.skipif(not psutil.LINUX, reason="Requires procfs")
+def test_task_scanner_budget(fake_proc):
+    proc, proc_dir = fake_proc
+    scanner = xrd_load.TaskScanner(budget=3)
+    _write_tasks(proc_dir, {tid: ("R" if tid < 5 else "S", 0) for tid in range(10)})
+    scans = [scanner.scan([proc]) for _ in range(4)]
+    assert all((scan.threads, scan.sampled) == (10, 3) for scan in scans)
+    assert sum(scan.active for scan in scans[:3]) == 5
+    # every thread was inspected twice after the scans wrapped around
+    assert len(scans[3].cpu_usage) == 2
+
+
+@mimicry.skipif_unsuported
+def test_tracker_threads():
+    tracker = xrd_load.XrootdTracker(rescan_interval=1)
+    with mimicry.Process("xrootd", threads=20, files=20):
+        assert tracker.scan_threads().threads >= 20
+        scan = tracker.scan_threads()
+        assert scan.threads == scan.sampled >= 20
+        assert len(scan.cpu_usage) >= 20
@@ -0,0 +1,119 @@
+import socket
+import threading
+import time
+
+from cms_perf.setup import cli_parser
+from cms_perf.sensors import xrd_report
+
+SUMMARY = (
+    '<statistics tod="{tod}" ver="v5.6.0" src="localhost:1094" tos="1700000000"'
+    ' pgm="xrootd" ins="anon" pid="1234" site="TEST">'
+    '<stats id="info"><host>localhost</host><port>1094</port><name>anon</name></stats>'
+    '<stats id="link"><num>{num}</num><maxn>20</maxn><tot>40</tot>'
+    "<in>1024</in><out>{out}</out><ctime>5</ctime><tmo>0</tmo><stall>0</stall>"
+    "<sfps>0</sfps></stats>"
+    '<stats id="proc"><usr><s>3</s><u>1200</u></usr><sys><s>1</s><u>0</u></sys></stats>'
+    '<stats id="sched"><jobs>12</jobs><inq>0</inq><maxinq>2</maxinq>'
+    "<threads>{threads}</threads><idle>{idle}</idle><tcr>4</tcr><tde>0</tde>"
+    "<tlimr>0</tlimr></stats>"
+    "</statistics>"
+)
+
+
+def send_summaries(listener: xrd_report.SummaryListener, *summaries: str):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        for summary in summaries:
+            sender.sendto(summary.encode(), listener.address)
+    deadline = time.monotonic() + 5
+    while len(listener._summaries) == 0 or listener.values["nconn"] != 8:
+        assert time.monotonic() < deadline, "listener did not digest summaries"
+        time.sleep(0.01)
+
+
+def test_flatten():
+    root = xrd_report.ET.fromstring(
+        SUMMARY.format(tod=1, num=8, out=2048, threads=10, idle=4)
+    )
+    stats = xrd_report.flatten_stats(root)
+    assert stats["link.num"] == 8
+    assert stats["sched.threads"] == 10
+    assert stats["proc.usr.s"] == 3
+    assert "info.host" not in stats
+
+
+def test_listener():
+    listener = xrd_report.SummaryListener(port=0)
+    try:
+        send_summaries(
+            listener,
+            SUMMARY.format(tod=100, num=2, out=1000, threads=10, idle=4),
+            "<not xml",
+            SUMMARY.format(tod=110, num=8, out=21000, threads=10, idle=4),
+        )
+        assert listener.values == {"nconn": 8, "pthreads": 60, "bytesout": 2000}
+    finally:
+        listener.close()
+
+
+def test_listener_expire():
+    listener = xrd_report.SummaryListener(port=0, expire=0.2)
+    try:
+        send_summaries(
+            listener, SUMMARY.format(tod=100, num=8, out=1000, threads=10, idle=4)
+        )
+        assert listener.values["nconn"] == 8
+        # values expire even if no more summaries arrive
+        time.sleep(0.3)
+        assert listener.values == {"nconn": 0, "pthreads": 0.0, "bytesout": 0}
+    finally:
+        listener.close()
+
+
+def test_sensors():
+    listener = xrd_report.SummaryListener(port=0)
+    port = listener.address[1]
+    xrd_report.LISTENER_CACHE[port] = listener
+    try:
+        send_summaries(
+            listener, SUMMARY.format(tod=100, num=8, out=1000, threads=8, idle=6)
+        )
+        for expected, source in (
+            (8, f"xrd.nconn({port})"),
+            (25, f"xrd.pthreads({port})"),
+            (0, f"xrd.bytesout({port})"),
+        ):
+            (sensor,) = cli_parser.compile_sensors(
+                0.01, cli_parser.parse_sensor(source)
+            )
+            assert sensor() == expected
+    finally:
+        del xrd_report.LISTENER_CACHE[port]
+        listener.close()
+
+
+def test_cached_listener_concurrent():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    barrier = threading.Barrier(8)
+    listeners, errors = [], []
+
+    def get_listener():
+        barrier.wait()
+        try:
+            listeners.append(xrd_report.cached_listener(port))
+        except Exception as err:
+            errors.append(err)
+
+    # fields using the same port may be evaluated at the same time
+    threads = [threading.Thread(target=get_listener) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert errors == []
+        assert len(listeners) == 8
+        assert all(listener is listeners[0] for listener in listeners)
+    finally:
+        xrd_report.LISTENER_CACHE.pop(port).close()